@@ -1,3 +1,9 @@
+import numpy as np
+
+# relative difference of priority scores below which children are tied
+TIE_TOLERANCE = 0.00001
+
+
 class CP_Child:
     """
     --------------------
@@ -20,16 +26,30 @@ class CP_Child:
     --------------------
     Additional Attributes
     --------------------
-    projected_preference_id_list : list[int]
+    projected_preference_id_list : tuple[int]
         induced from family.pref later
 
-    all_daycare_ids : list[int]
+    all_daycare_ids : tuple[int]
         induced from self.projected_preference_id_list
 
     assigned_daycare_id : int = Daycare.id
         assignment by CP algorithm
+
+    preference tuples are immutable and may be shared with other agents (see intern)
     """
 
+    __slots__ = (
+        "id",
+        "age",
+        "family",
+        "initial_daycare",
+        "actual_daycare",
+        "pref",
+        "projected_pref",
+        "all_daycare_ids",
+        "assigned_daycare",
+    )
+
     def __init__(
         self,
         c_id: int,
@@ -45,12 +65,12 @@ class CP_Child:
         self.family = family_id
         self.initial_daycare = initial_daycare_id
         self.actual_daycare = actual_daycare_id
-        self.pref = [
+        self.pref = tuple(
             d_id if d_id is not None else 9999 for d_id in preference_list
-        ]  # replace None with 9999
+        )  # replace None with 9999
         # additional attributes
-        self.projected_pref = []
-        self.all_daycare_ids = []  # notation D(\succ_c)
+        self.projected_pref = ()
+        self.all_daycare_ids = ()  # notation D(\succ_c)
         self.assigned_daycare = None
 
     def __str__(self):
@@ -96,16 +116,40 @@ class CP_Daycare:
     all_shared_ages = []
         merge share_ages_list (a list of lists) into a list of ages
 
-    total_numbers_list: list[int]
-        the number of children who prefer transfers by age
+    total_numbers_list: tuple[int]
+        recruiting_numbers_list plus the number of children who prefer transfers by age
 
-    total_numbers_share_list: list[int]
+    total_numbers_share_list: tuple[int]
+        total_numbers_list summed over each group of share_ages_list
 
     priority_age_dic = {}
 
     priority_age_share_dic = {}
+
+    rank_index: dict[bool, dict[int, RankIndex]]
+        rank index of priority_age_share_dic (True) / priority_age_dic (False) by age
+
+    related_ages: tuple[tuple[int]]
+        return_related_ages of each age
+
+    lists from the dictionary are stored as tuples
     """
 
+    __slots__ = (
+        "id",
+        "recruiting_numbers",
+        "share_ages_list",
+        "priority",
+        "score_list",
+        "all_shared_ages",
+        "total_numbers",
+        "total_numbers_share",
+        "priority_age_dic",
+        "priority_age_share_dic",
+        "rank_index",
+        "related_ages",
+    )
+
     def __init__(
         self,
         d_id: int,
@@ -116,16 +160,26 @@ class CP_Daycare:
     ):
         # attributes from dictionary
         self.id = d_id
-        self.recruiting_numbers = recruiting_numbers_list
-        self.share_ages_list = share_ages_list
-        self.priority = priority_child_id_list
-        self.score_list = priority_score_list
+        self.recruiting_numbers = tuple(recruiting_numbers_list)
+        self.share_ages_list = (
+            None
+            if share_ages_list is None
+            else tuple(tuple(ages) for ages in share_ages_list)
+        )
+        self.priority = tuple(priority_child_id_list)
+        self.score_list = tuple(priority_score_list)
         # additional attributes
-        self.all_shared_ages = [age for ages in self.share_ages_list for age in ages]
-        self.total_numbers = [x for x in self.recruiting_numbers]
-        self.total_numbers_share = [x for x in self.recruiting_numbers]
+        self.all_shared_ages = tuple(
+            age for ages in self.share_ages_list or () for age in ages
+        )
+        self.total_numbers = self.recruiting_numbers
+        self.total_numbers_share = self.recruiting_numbers
         self.priority_age_dic = {}
         self.priority_age_share_dic = {}
+        self.rank_index = {}
+        self.related_ages = tuple(
+            self._related_ages(age) for age in range(6)
+        )  # notation \hat{G}(d, g)
 
     def __str__(self):
         return f"daycare {self.id}"
@@ -136,60 +190,76 @@ class CP_Daycare:
     def update_priority_age_dic(self, children):
         """
         create a priority dictionary by age from self.priority_list
-        """
-        self.priority_age_dic = {}
-        for age in range(6):
-            self.priority_age_dic[age] = []
-        for c_id in self.priority:
-            child = next((c for c in children if c.id == c_id), None)
 
-            if c_id not in self.priority_age_dic[child.age]:
-                self.priority_age_dic[child.age].append(c_id)
+        children: AgentRegistry or all children list
+        """
+        registry = as_registry(children)
+        self.rank_index = {}
+        self.priority_age_dic = split_priority_by_age(
+            self.priority, [registry.age_of[c_id] for c_id in self.priority]
+        )
 
     def update_priority_age_share_dic(self, children):
         """
         create a priority dictionary by age that allows for flexible quotas from self.priority_list
+
+        children: AgentRegistry or all children list
         """
+        self.rank_index = {}
         if self.share_ages_list is None:
             self.priority_age_share_dic = self.priority_age_dic
         else:
-            self.priority_age_share_dic = {}
-            for age in range(6):
-                self.priority_age_share_dic[age] = []
-            # traversing the children in self.priority_child_id_list once
-            for c_id in self.priority:
-                c = next((c for c in children if c.id == c_id), None)
-                if c.age in self.all_shared_ages:
-                    for ages in self.share_ages_list:
-                        if (
-                            c.age in ages
-                        ):  # if c belongs to some group`ages` in self.share_ages_list
-                            for (
-                                age
-                            ) in (
-                                ages
-                            ):  # add child to each priority_age_share_dic[age] with age in group`ages`
-                                if (
-                                    c.id not in self.priority_age_share_dic[age]
-                                ):  # caution : use `age` instead of `c.age`
-                                    self.priority_age_share_dic[age].append(c.id)
-                else:
-                    if c.id not in self.priority_age_share_dic[c.age]:
-                        self.priority_age_share_dic[c.age].append(c.id)
+            registry = as_registry(children)
+            self.priority_age_share_dic = reuse_equal_lists(
+                split_priority_by_age(
+                    self.priority,
+                    [registry.age_of[c_id] for c_id in self.priority],
+                    self.share_ages_list,
+                ),
+                self.priority_age_dic,
+            )
+
+    def update_rank_index(self, children, tolerance=TIE_TOLERANCE):
+        """
+        create a rank index by age for both priority_age_dic and priority_age_share_dic
+
+        children: AgentRegistry or all children list
+        tolerance: relative difference of scores below which children are tied
+        """
+        registry = as_registry(children)
+        score_of = {}
+        for c_id, score in zip(self.priority, self.score_list):
+            score_of.setdefault(c_id, score)
+        self.rank_index = build_rank_index(
+            self.priority_age_dic,
+            self.priority_age_share_dic,
+            score_of,
+            registry.family_of,
+            tolerance,
+        )
+
+    def return_rank_index(self, age, allow_share_bool, children):
+        """
+        return the RankIndex for the given age, building the rank index on first use
+        """
+        if allow_share_bool not in self.rank_index:
+            self.update_rank_index(children)
+        return self.rank_index[allow_share_bool][age]
 
     # notation \hat{G}(d, g)
     def return_related_ages(self, age):
         """
-        return a list of ages belonging to the same group as the given age
+        return a tuple of ages belonging to the same group as the given age
         """
+        return self.related_ages[age]
+
+    def _related_ages(self, age):
         if age in self.all_shared_ages:
             for ages in self.share_ages_list:
                 if age in ages:
                     return ages
         else:
-            ralted_ages = []
-            ralted_ages.append(age)
-            return ralted_ages
+            return (age,)
 
     # notation C_{better}(d, c, bool)
     def return_better_children_than_child_excluding_siblings(
@@ -198,7 +268,7 @@ class CP_Daycare:
         """
         Input:
             child_id: given child_id
-            children: all children list
+            children: AgentRegistry or all children list
             allow_share_bool: bool
         Output:
             all children who
@@ -206,27 +276,14 @@ class CP_Daycare:
                 ii) have the same age / related age as the given child
                 iii) are not siblings of the given child (when exclude_bool=True)
         """
-        better_children_id = []
-        rank_dic = (
-            self.priority_age_share_dic
-            if allow_share_bool is True
-            else self.priority_age_dic
-        )
-        child = next((c for c in children if c.id == child_id), None)
-        pos = rank_dic[child.age].index(
-            child_id
-        )  # find the position of child_id in rank_dic
-        for index in range(pos):  # update better_children_id
-            c = next((c for c in children if c.id == rank_dic[child.age][index]), None)
-            if exclude_bool is True:
-                if (
-                    c.family != child.family and c.id not in better_children_id
-                ):  # exclude child's siblings
-                    better_children_id.append(c.id)
-            else:
-                if c.id not in better_children_id:  # include child's siblings
-                    better_children_id.append(c.id)
-        return better_children_id
+        registry = as_registry(children)
+        child = registry.children[child_id]
+        index = self.return_rank_index(child.age, allow_share_bool, registry)
+        pos = index.rank[child_id]  # find the position of child_id in rank_dic
+        better = index.ids[:pos]
+        if exclude_bool is True:  # exclude child's siblings
+            better = better[index.families[:pos] != child.family]
+        return better.tolist()
 
     # notation C^{weak}_{better}(d, c, bool)
     def return_weak_better_children_than_child_excluding_siblings(
@@ -240,7 +297,7 @@ class CP_Daycare:
         """
         Input:
             child_id: given child_id
-            children: all children list
+            children: AgentRegistry or all children list
             allow_share_bool: bool
         Output:
             all children who
@@ -248,49 +305,50 @@ class CP_Daycare:
                 ii) have the same age / related age as the given child
                 iii) are not siblings of the given child
         """
-        better_children_id = []
-        rank_dic = (
-            self.priority_age_share_dic
-            if allow_share_bool is True
-            else self.priority_age_dic
+        index, end, excluded = self.return_weak_better_prefix(
+            child_id, children, allow_share_bool, exclude_bool, search_depth
         )
-        child = next((c for c in children if c.id == child_id), None)
-        pos = rank_dic[child.age].index(
-            child_id
-        )  # find the position of child_id in rank_dic
-        # determine how many children with the same priority score but lower priority need to be searched
-        end = min(pos + search_depth, len(rank_dic[child.age]))
-        for index in range(end):
-            c = next((c for c in children if c.id == rank_dic[child.age][index]), None)
-            if index < pos:
-                if exclude_bool is True:
-                    if (
-                        c.family != child.family and c.id not in better_children_id
-                    ):  # exclude child's siblings
-                        better_children_id.append(c.id)
-                else:
-                    if c.id not in better_children_id:  # include child's siblings
-                        better_children_id.append(c.id)
-            else:
-                child_score = self.score_list[self.priority.index(child.id)]
-                c_score = self.score_list[self.priority.index(c.id)]
-                if exclude_bool is True:
-                    if (
-                        abs(c_score / child_score - 1) <= 0.00001
-                        and c.id != child.id
-                        and c.family != child.family
-                        and c.id not in better_children_id
-                    ):
-                        better_children_id.append(c.id)
-                else:
-                    if (
-                        abs(c_score / child_score - 1) <= 0.00001
-                        and c.id != child.id
-                        and c.id not in better_children_id
-                    ):
-                        better_children_id.append(c.id)
+        better = index.ids[:end]
+        if exclude_bool is True:  # exclude child's siblings and the child
+            better = better[
+                index.families[:end] != index.families[index.rank[child_id]]
+            ]
+        else:
+            better = better[better != child_id]
+        return better.tolist()
+
+    def return_weak_better_prefix(
+        self,
+        child_id,
+        children,
+        allow_share_bool=True,
+        exclude_bool=True,
+        search_depth=5,
+    ):
+        """
+        C^{weak}_{better}(d, c, bool) as a prefix of a priority list: the children ranked
+        before child_id and the children of its tie class (equal scores, see
+        RankIndex.tie_end) up to search_depth positions from child_id, or all of them
+        when search_depth is None
 
-        return better_children_id
+        Output:
+            index: RankIndex of the age of child_id
+            end: end of the prefix
+            excluded: list[int=Child.id], child_id and, when exclude_bool=True, its
+                siblings among index.ids[:end]
+            such that C^{weak}_{better}(d, c, bool) = index.ids[:end] - excluded
+        """
+        registry = as_registry(children)
+        child = registry.children[child_id]
+        index = self.return_rank_index(child.age, allow_share_bool, registry)
+        pos = index.rank[child_id]  # find the position of child_id in rank_dic
+        end = int(index.tie_end[pos])
+        if search_depth is not None:
+            end = max(pos, min(end, pos + search_depth))
+        excluded = [child_id] if end > pos else []
+        if exclude_bool is True:  # exclude child's siblings
+            excluded = index.ids[:end][index.families[:end] == child.family].tolist()
+        return index, end, excluded
 
 
 class CP_Family:
@@ -308,8 +366,22 @@ class CP_Family:
     assignment: tuple[int=Daycare.id]
 
     has_siblings: bool
+
+    sibling_table: dict[bool, dict[(int=Daycare.id, tuple[int=Child.id]), tuple]]
+        for families with siblings, return_sibling_groups by share_bool of every daycare
+        d of self.pref and the siblings C(f, p, d) applying to it, which positions with
+        the same daycare and siblings share (see update_sibling_table); None otherwise
     """
 
+    __slots__ = (
+        "id",
+        "children",
+        "pref",
+        "assignment",
+        "has_siblings",
+        "sibling_table",
+    )
+
     def __init__(
         self,
         f_id: int,
@@ -318,10 +390,11 @@ class CP_Family:
         assignment_daycare_id_list=None,
     ):
         self.id = f_id
-        self.children = children_id_list
+        self.children = tuple(children_id_list)
         self.pref = pref_list
         self.assignment = assignment_daycare_id_list
         self.has_siblings = len(self.children) > 1
+        self.sibling_table = None
 
     def __str__(self):
         return f"family {self.id}"
@@ -357,51 +430,320 @@ class CP_Family:
 
     # notation C(f,p,d,g,bool)
     def return_siblings_for_certain_position_daycare_age(
-        self, position, daycare_id, age, share_bool, children, daycares
+        self, position, daycare_id, age, share_bool, children, daycares=None
     ):
         """
         return a set of siblings who i) apply to daycare_id at given position and ii) belong to the same age or age group
+
+        children: AgentRegistry, or all children list together with all daycares list
         """
-        children_id_age = []
-        children_id = self.return_children_for_certain_position_and_daycare(
-            position, daycare_id
-        )
-        used_ages = []
-        if share_bool is True:
-            daycare = next((d for d in daycares if d.id == daycare_id), None)
-            used_ages = daycare.return_related_ages(age)
-        else:
-            used_ages = [age]
-        # update children_id_age
-        if len(children_id) != 0:
-            for c_id in children_id:
-                child = next((c for c in children if c.id == c_id), None)
-                if child.age in used_ages and child.id not in children_id_age:
-                    children_id_age.append(child.id)
-        return children_id_age
+        for g, siblings, worst_id in self.return_sibling_groups(
+            position, daycare_id, share_bool, children, daycares
+        ):
+            if g == age:
+                return list(siblings)
+        return []
 
     # function C_{worst}(f, p, d, g, bool)
     def return_lowest_sibling_for_certain_position_daycare_age(
-        self, position, daycare_id, age, share_bool, children_list, daycare_list
+        self, position, daycare_id, age, share_bool, children_list, daycare_list=None
     ):
         """
         return the worst sibling who i) apply to daycare_id at given position and ii) belong to the same age or age group
+
+        children_list: AgentRegistry, or all children list together with all daycares list
+        """
+        for g, siblings, worst_id in self.return_sibling_groups(
+            position, daycare_id, share_bool, children_list, daycare_list
+        ):
+            if g == age:
+                return worst_id
+        return -1
+
+    def return_sibling_groups(
+        self, position, daycare_id, share_bool, children, daycares=None
+    ):
         """
-        children_id_age = self.return_siblings_for_certain_position_daycare_age(
-            position, daycare_id, age, share_bool, children_list, daycare_list
+        return C(f,p,d,g,bool) and C_{worst}(f,p,d,g,bool) of the ages g for which
+        C(f,p,d,g,bool) is not empty, read from self.sibling_table when it is built
+
+        children: AgentRegistry, or all children list together with all daycares list
+        Output:
+            tuple of (g, tuple[int=Child.id], int=Child.id) in increasing order of g
+        """
+        applicants = tuple(
+            c_id
+            for c_id, d_id in zip(self.children, self.pref[position])
+            if d_id == daycare_id
+        )  # C(f, p, d)
+        if self.sibling_table is not None:
+            groups = self.sibling_table[share_bool].get((daycare_id, applicants))
+            if groups is not None:
+                return groups
+        registry = as_registry(children, daycares)
+        return self._sibling_groups(daycare_id, applicants, share_bool, registry)
+
+    def update_sibling_table(self, children, daycares=None, interned=None):
+        """
+        build self.sibling_table for both values of share_bool; only children keep
+        None, their single entry being as cheap to compute as to look up
+
+        children: AgentRegistry, or all children list together with all daycares list
+        interned: dict used to store equal tuples of the table once (see intern)
+        """
+        if self.has_siblings is False:
+            self.sibling_table = None
+            return
+        registry = as_registry(children, daycares)
+        interned = {} if interned is None else interned
+        self.sibling_table = {True: {}, False: {}}
+        for tup_p in dict.fromkeys(self.pref):
+            for daycare_id in dict.fromkeys(tup_p):
+                applicants = intern(
+                    interned,
+                    tuple(
+                        c_id
+                        for c_id, d_id in zip(self.children, tup_p)
+                        if d_id == daycare_id
+                    ),
+                )
+                key = (daycare_id, applicants)
+                if key in self.sibling_table[False]:
+                    continue
+                groups = self._sibling_groups(
+                    daycare_id, applicants, False, registry, interned
+                )
+                if len(registry.daycares[daycare_id].all_shared_ages) == 0:
+                    share_groups = groups
+                else:
+                    share_groups = self._sibling_groups(
+                        daycare_id, applicants, True, registry, interned
+                    )
+                self.sibling_table[False][key] = groups
+                self.sibling_table[True][key] = share_groups
+
+    def _sibling_groups(
+        self, daycare_id, applicants, share_bool, registry, interned=None
+    ):
+        interned = {} if interned is None else interned
+        daycare = registry.daycares[daycare_id]
+        applicant_ages = [registry.age_of[c_id] for c_id in applicants]
+        groups = []
+        for g in range(6):
+            ages = daycare.related_ages[g] if share_bool is True else (g,)
+            siblings = tuple(
+                c_id for c_id, age in zip(applicants, applicant_ages) if age in ages
+            )
+            if len(siblings) == 0:
+                continue
+            if len(siblings) == 1:
+                worst_id = siblings[0]
+            else:
+                rank = daycare.return_rank_index(g, share_bool, registry).rank
+                # the worst sibling has the largest position in the priority list of g
+                worst_id = max(siblings, key=rank.__getitem__)
+            groups.append(intern(interned, (g, intern(interned, siblings), worst_id)))
+        return intern(interned, tuple(groups))
+
+
+class RankIndex:
+    """
+    rank index of one priority list (one age) of a daycare
+
+    Attributes
+    ----------
+    rank: dict[int=Child.id, int]
+        position of each child in the priority list
+
+    ids: np.ndarray[int=Child.id]
+        the priority list
+
+    scores: np.ndarray[float]
+        priority scores in the order of ids
+
+    families: np.ndarray[int=Family.id]
+        families in the order of ids
+
+    tie_end: np.ndarray[int]
+        end (exclusive) of the tie class of each position: the run of children from
+        that position whose scores differ from its own score by at most tolerance
+        (relative), as in the original abs(c_score / child_score - 1) <= tolerance.
+        Each position is compared with its own score, so near-equal scores are not
+        chained: 1, 1 - 0.8 * tolerance, 1 - 1.6 * tolerance ties the first child with
+        the second only
+    """
+
+    __slots__ = ("rank", "ids", "scores", "families", "tie_end")
+
+    def __init__(
+        self, priority_child_id_list, score_of, family_of, tolerance=TIE_TOLERANCE
+    ):
+        n = len(priority_child_id_list)
+        self.rank = {c_id: pos for pos, c_id in enumerate(priority_child_id_list)}
+        self.ids = np.array(priority_child_id_list, dtype=np.int64)
+        self.scores = np.fromiter(
+            map(score_of.__getitem__, priority_child_id_list), np.float64, n
         )
-        daycare = next((d for d in daycare_list if d.id == daycare_id), None)
-        # determine which priority_dic will be used controlled by share_bool
-        rank_dic = (
-            daycare.priority_age_share_dic
-            if share_bool is True
-            else daycare.priority_age_dic
+        self.families = np.fromiter(
+            map(family_of.__getitem__, priority_child_id_list), np.int64, n
         )
-        # find the worst child_id
-        worst_index = -1
-        worst_child_id = -1
-        for c_id in children_id_age:
-            if rank_dic[age].index(c_id) > worst_index:
-                worst_index = rank_dic[age].index(c_id)
-                worst_child_id = c_id
-        return worst_child_id
+        self.tie_end = _tie_end(self.scores, tolerance)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def _tie_end(scores, tolerance):
+    """
+    RankIndex.tie_end of scores: for each position pos, the first position after pos
+    whose score differs from scores[pos] by more than tolerance * abs(scores[pos])
+
+    priority lists are sorted by score, so that the end of every position is found by
+    a binary search; unsorted lists are scanned position by position
+    """
+    n = len(scores)
+    margin = tolerance * np.abs(scores)
+    if np.all(scores[1:] <= scores[:-1]):
+        return np.searchsorted(-scores, -scores + margin, side="right")
+    if np.all(scores[1:] >= scores[:-1]):
+        return np.searchsorted(scores, scores + margin, side="right")
+    tie_end = np.empty(n, dtype=np.int64)
+    for pos in range(n):
+        end = pos + 1
+        while end < n and abs(scores[end] - scores[pos]) <= margin[pos]:
+            end += 1
+        tie_end[pos] = end
+    return tie_end
+
+
+class AgentRegistry:
+    """
+    index of CP agents by id, replacing linear scans over agent lists
+
+    Attributes
+    ----------
+    children: dict[int=Child.id, CP_Child]
+
+    daycares: dict[int=Daycare.id, CP_Daycare]
+
+    families: dict[int=Family.id, CP_Family]
+
+    family_of: dict[int=Child.id, int=Family.id]
+
+    age_of: dict[int=Child.id, int]
+    """
+
+    def __init__(self, children=(), daycares=(), families=()):
+        self.children = {c.id: c for c in children}
+        self.daycares = {d.id: d for d in daycares}
+        self.families = {f.id: f for f in families}
+        self.family_of = {c.id: c.family for c in self.children.values()}
+        self.age_of = {c.id: c.age for c in self.children.values()}
+
+    def __str__(self):
+        return (
+            f"registry of {len(self.children)} children, "
+            f"{len(self.daycares)} daycares, {len(self.families)} families"
+        )
+
+    def __repr__(self):
+        return self.__str__()
+
+    def as_lists(self):
+        """
+        return (children, daycares, families) as lists in insertion order
+        """
+        return (
+            list(self.children.values()),
+            list(self.daycares.values()),
+            list(self.families.values()),
+        )
+
+
+def split_priority_by_age(priority, ages, share_ages_list=None):
+    """
+    split a priority list into one priority list by age, in a single pass
+
+    Input:
+        priority: list[int=Child.id], the priority list of a daycare
+        ages: list[int], the age of each child of priority
+        share_ages_list: share_ages_list of the daycare; a child of a shared age is
+            listed under every age of its group(s) (priority_age_share_dic), otherwise
+            only under its own age (priority_age_dic)
+    Output:
+        dict[int, tuple[int=Child.id]] for ages 0-5, keeping the first occurrence of
+        each child
+    """
+    # ages under which a child of each age is listed
+    listed_under = {age: [] for age in range(6)}
+    for ages_group in share_ages_list or ():
+        for age in ages_group:
+            for other in ages_group:
+                if other not in listed_under[age]:
+                    listed_under[age].append(other)
+    for age in range(6):
+        if len(listed_under[age]) == 0:
+            listed_under[age].append(age)
+    priority_dic = {age: [] for age in range(6)}
+    seen = set()
+    for c_id, c_age in zip(priority, ages):
+        if c_id in seen:
+            continue
+        seen.add(c_id)
+        for age in listed_under[c_age]:
+            priority_dic[age].append(c_id)
+    return {age: tuple(ids) for age, ids in priority_dic.items()}
+
+
+def reuse_equal_lists(priority_dic, reference_dic):
+    """
+    return priority_dic with the lists equal to those of reference_dic (ages without
+    shared quotas) replaced by the lists of reference_dic, so that they are stored once
+    """
+    return {
+        age: reference_dic[age] if ids == reference_dic.get(age) else ids
+        for age, ids in priority_dic.items()
+    }
+
+
+def build_rank_index(
+    priority_age_dic,
+    priority_age_share_dic,
+    score_of,
+    family_of,
+    tolerance=TIE_TOLERANCE,
+):
+    """
+    return the rank_index of a daycare: dict[bool, dict[int, RankIndex]] for
+    priority_age_share_dic (True) and priority_age_dic (False); equal priority lists
+    (the ages of a group of share_ages_list, the ages without shared quotas in both
+    dictionaries) share their RankIndex, so that a RankIndex identifies a priority list
+    """
+    rank_index = {True: {}, False: {}}
+    indexes = {}
+    for share_bool, priority_dic in (
+        (False, priority_age_dic),
+        (True, priority_age_share_dic),
+    ):
+        for age, priority in priority_dic.items():
+            if priority not in indexes:
+                indexes[priority] = RankIndex(priority, score_of, family_of, tolerance)
+            rank_index[share_bool][age] = indexes[priority]
+    return rank_index
+
+
+def intern(table, value):
+    """
+    return the object equal to value stored in table (a dict), storing value if there is
+    none, so that equal immutable values (preference tuples) are kept once
+    """
+    return table.setdefault(value, value)
+
+
+def as_registry(children, daycares=None, families=None):
+    """
+    return children if it is already an AgentRegistry, otherwise index the given agent lists
+    """
+    if isinstance(children, AgentRegistry):
+        return children
+    return AgentRegistry(children, daycares or (), families or ())
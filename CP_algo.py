@@ -1,5 +1,25 @@
+import asyncio
+import logging
+import queue
+import threading
+
 from ortools.sat.python import cp_model
-from helper_functions import create_agents, get_agent
+from CP_agents import TIE_TOLERANCE, as_registry
+from deferred_acceptance import deferred_acceptance, unmatched_transfer_families
+from helper_functions import create_agent_registry
+from model_cache import instance_fingerprint
+from prefix_occupancy import PrefixOccupancy
+from presolve import create_presolve_report
+from problem_arrays import create_problem_arrays
+from run_report import phase
+from solution_stream import SolutionStreamer
+from solver_config import SolverConfig
+from stability import check_blocking_coalitions
+
+logger = logging.getLogger(__name__)
+
+# encodings of alpha[f, p] == sum(xfp[f, k] for k in range(p + 1)) in creat_variables_alpha
+ALPHA_ENCODINGS = ("sums", "chain", "implications")
 
 
 def CP(
@@ -11,77 +31,738 @@ def CP(
     solver_time=360,
     exclude_bool=True,
     search_depth=5,
+    cache=None,
+    solver_config=None,
+    hint=None,
+    warm_start=False,
+    presolve=False,
+    shared_prefix=False,
+    alpha_encoding="sums",
+    tie_tolerance=TIE_TOLERANCE,
+    run_report=None,
+    solution_callback=None,
 ):
-    model = cp_model.CpModel()
-    children, daycares, families = create_agents(
-        children_dic, daycares_dic, families_dic
+    """
+    cache: ModelCache (optional)
+        reuse the model of an identical instance built with the same share_bool,
+        exclude_bool and search_depth; only the bound of sum(beta) <= bp_num is updated
+
+    solver_config: SolverConfig (optional)
+        CP-SAT parameters, default SolverConfig() (8 workers)
+
+    hint: dict (optional)
+        prior assignment given to CP-SAT as a hint of every xfp, either an outcome_fp
+        dict[(Family.id, position), 0 / 1] of a previous run or a child assignment
+        dict[Child.id, Daycare.id], e.g. {c_id: c["actual_daycare_id"]}
+
+    warm_start: bool
+        if True and no hint is given, hint the outcome of deferred_acceptance
+
+    presolve: bool
+        build the model without unreachable positions and with fixed gamma as constants
+        (see create_model)
+
+    shared_prefix: bool
+        reference prefix occupancy variables in gamma constraints (see create_model);
+        off by default, as the shared variables make the model smaller only when the
+        priority lists are long
+
+    alpha_encoding: str
+        encoding of alpha and of the channeling of xcd, one of ALPHA_ENCODINGS (see
+        creat_variables_alpha)
+
+    search_depth: int or None
+        number of positions from a child searched for children with the same priority
+        score (its tie class, see RankIndex.tie_end) counted as weakly better; None
+        counts the whole tie class
+
+    tie_tolerance: float
+        relative difference of priority scores below which children are tied, default
+        TIE_TOLERANCE (the original 0.00001)
+
+    run_report: RunReport (optional)
+        filled with the time, memory and model size of each phase and the solver
+        statistics, then logged and written to run_report.json_path if set
+
+    solution_callback: function or SolutionStreamer (optional)
+        called with an IntermediateSolution for each improving solution found during the
+        search; the search stops (keeping the best solution) when it returns True.
+        See also CP_stream / CP_stream_async
+
+    if CP-SAT stops without a solution (UNKNOWN), the outcome of deferred_acceptance is
+    returned instead; if it proves that no solution exists (INFEASIBLE, e.g. when no
+    assignment matching every transfer family has at most bp_num blocking coalitions)
+    or rejects the model (MODEL_INVALID), a ValueError naming the status is raised
+    """
+    model, problem, xfp, xcd, beta, bp_index = load_or_create_model(
+        children_dic,
+        daycares_dic,
+        families_dic,
+        share_bool,
+        bp_num,
+        exclude_bool,
+        search_depth,
+        cache,
+        presolve,
+        shared_prefix,
+        alpha_encoding,
+        tie_tolerance,
+        run_report,
     )
-    xfp, xcd, alpha, gamma_fp, gamma_fpd, gamma_fpdg, age_fpd, beta = create_variables(
-        children, daycares, families, share_bool, model, exclude_bool, search_depth
+    outcome_da = None
+    with phase(run_report, "hint"):
+        if hint is None and warm_start is True:
+            outcome_da = deferred_acceptance(problem, share_bool)
+            hint = outcome_da
+        if hint is not None:
+            add_hint(model, problem, xfp, hint)
+    streamer = solution_callback
+    if solution_callback is not None:
+        if not isinstance(solution_callback, SolutionStreamer):
+            streamer = SolutionStreamer(solution_callback)
+        streamer.attach(problem, xfp)
+    solver, status, tim = solve_model(
+        model, solver_time, solver_config, run_report, streamer
+    )
+    check_status(solver, status, bp_num)
+    # outcome
+    with phase(run_report, "outcome"):
+        if status == cp_model.UNKNOWN:
+            logger.warning("no solution found, falling back to deferred acceptance")
+            if outcome_da is None:
+                outcome_da = deferred_acceptance(problem, share_bool)
+            warn_unmatched_transfer_families(problem, outcome_da)
+            outcome_fp = outcome_da
+        else:
+            outcome_fp = {}
+            for f_p, x in xfp.items():
+                outcome_fp[f_p] = solver.Value(x)
+        outcome_children_dic = problem.outcome_children_dic(outcome_fp)
+    finish_report(run_report)
+    return outcome_children_dic, outcome_fp
+
+
+def CP_stream(children_dic, daycares_dic, families_dic, share_bool, **kwargs):
+    """
+    generator version of CP yielding an IntermediateSolution for each improving solution
+    as soon as CP-SAT finds it; kwargs are the keyword arguments of CP
+
+    CP runs in a background thread; closing the generator (e.g. leaving a for loop with
+    break once the gap is small enough) stops the search. The generator returns the
+    output of CP (outcome_children_dic, outcome_fp), i.e. the value of StopIteration
+    """
+    solutions = queue.Queue()
+    run = _StreamedRun(
+        children_dic,
+        daycares_dic,
+        families_dic,
+        share_bool,
+        kwargs,
+        solutions.put,
+    )
+    run.start()
+    try:
+        while True:
+            item = solutions.get()
+            if item is run:
+                break
+            yield item
+    finally:
+        run.stop()
+        run.join()
+    return run.result()
+
+
+async def CP_stream_async(
+    children_dic, daycares_dic, families_dic, share_bool, **kwargs
+):
+    """
+    asynchronous iterator version of CP_stream, for use in an event loop:
+    async for solution in CP_stream_async(...)
+    """
+    loop = asyncio.get_running_loop()
+    solutions = asyncio.Queue()
+    run = _StreamedRun(
+        children_dic,
+        daycares_dic,
+        families_dic,
+        share_bool,
+        kwargs,
+        lambda item: loop.call_soon_threadsafe(solutions.put_nowait, item),
+    )
+    run.start()
+    try:
+        while True:
+            item = await solutions.get()
+            if item is run:
+                break
+            yield item
+    finally:
+        run.stop()
+        await loop.run_in_executor(None, run.join)
+    run.result()
+
+
+class _StreamedRun(threading.Thread):
+    """
+    thread running CP with a solution callback passing each IntermediateSolution to put;
+    put(self) signals the end of the run
+    """
+
+    def __init__(
+        self, children_dic, daycares_dic, families_dic, share_bool, kwargs, put
+    ):
+        threading.Thread.__init__(self, daemon=True)
+        self.args = (children_dic, daycares_dic, families_dic, share_bool)
+        self.kwargs = kwargs
+        self.put = put
+        self.streamer = SolutionStreamer(self.on_solution)
+        self.output = None
+        self.error = None
+
+    def run(self):
+        try:
+            self.output = CP(*self.args, **self.kwargs, solution_callback=self.streamer)
+        except Exception as error:
+            self.error = error
+        finally:
+            self.put(self)
+
+    def on_solution(self, solution):
+        self.put(solution)
+
+    def stop(self):
+        self.streamer.stop()
+
+    def result(self):
+        if self.error is not None:
+            raise self.error
+        return self.output
+
+
+def check_status(solver, status, bp_num):
+    """
+    raise a ValueError naming the status if CP-SAT proved that the model has no
+    solution or rejected it, i.e. for any status but OPTIMAL, FEASIBLE and UNKNOWN
+    """
+    if status in (cp_model.OPTIMAL, cp_model.FEASIBLE, cp_model.UNKNOWN):
+        return
+    if status == cp_model.INFEASIBLE:
+        raise ValueError(
+            f"CP-SAT status INFEASIBLE: no assignment matches every transfer family "
+            f"within the capacities with at most bp_num={bp_num} blocking coalitions"
+        )
+    raise ValueError(f"CP-SAT status {solver.StatusName(status)}")
+
+
+def warn_unmatched_transfer_families(problem, outcome_fp):
+    """
+    log a warning if outcome_fp (e.g. of deferred_acceptance) leaves transfer families
+    unmatched, as it then violates the feasibility constraints of the CP model
+    """
+    unmatched = unmatched_transfer_families(problem, outcome_fp)
+    if len(unmatched) > 0:
+        logger.warning(
+            "%d transfer families unmatched, e.g. family %s: the outcome is not a "
+            "feasible solution of the CP model",
+            len(unmatched),
+            unmatched[0],
+        )
+
+
+def finish_report(run_report):
+    """
+    log run_report and write it to run_report.json_path if set
+    """
+    if run_report is None:
+        return
+    logger.info("%s", run_report)
+    if run_report.json_path is not None:
+        run_report.write_json()
+
+
+def CP_sweep(
+    children_dic,
+    daycares_dic,
+    families_dic,
+    share_bool,
+    bp_values,
+    solver_time=360,
+    exclude_bool=True,
+    search_depth=5,
+    cache=None,
+    solver_config=None,
+    presolve=False,
+    shared_prefix=False,
+    alpha_encoding="sums",
+    tie_tolerance=TIE_TOLERANCE,
+    run_report=None,
+):
+    """
+    solve one instance for every bp_num in bp_values (e.g. 0, 1, 2, ...) with a single model
+
+    between solves only the bound of sum(beta) <= bp_num is updated; the previous solution
+    is given as a solution hint, and when bp_num does not decrease its number of matched
+    children is a lower bound of the objective (the previous solution stays feasible);
+    the other parameters are those of CP
+
+    Output:
+        pareto_table: list[dict] with keys "bp_num", "matched", "status", "wall_time"
+        outcomes: dict[bp_num, (outcome_children_dic, outcome_fp)] for solved bp_num
+    """
+    model, problem, xfp, xcd, beta, bp_index = load_or_create_model(
+        children_dic,
+        daycares_dic,
+        families_dic,
+        share_bool,
+        bp_values[0] if len(bp_values) > 0 else 0,
+        exclude_bool,
+        search_depth,
+        cache,
+        presolve,
+        shared_prefix,
+        alpha_encoding,
+        tie_tolerance,
+        run_report,
     )
-    feasibility_constraints(children, daycares, families, share_bool, xfp, xcd, model)
-    # blocking coalition constraints
-    bp = [beta[f.id, p] for f in families for p in range(len(f.pref))]
-    model.Add(sum(bp) <= bp_num)
-    # objective: maximize the number of matched children
-    all_xcd = [
-        xcd[c.id, d_id] for c in children for d_id in c.all_daycare_ids if d_id != 9999
-    ]
-    model.Maximize(sum(all_xcd))
-    # solver
+    lower_bound_index = model.Add(objective_expression(xcd) >= 0).Index()
+    pareto_table = []
+    outcomes = {}
+    previous = None  # (bp_num, matched, solution)
+    for bp_num in bp_values:
+        set_bp_num(model, bp_index, bp_num)
+        model.ClearHints()
+        lower_bound = cp_model.INT_MIN
+        if previous is not None:
+            hint = model.Proto().solution_hint
+            hint.vars.extend(range(len(previous[2])))
+            hint.values.extend(previous[2])
+            if bp_num >= previous[0]:
+                lower_bound = previous[1]
+        set_domain(model, lower_bound_index, lower_bound, cp_model.INT_MAX)
+        solver, status, tim = solve_model(model, solver_time, solver_config, run_report)
+        matched = None
+        if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            matched = int(round(solver.ObjectiveValue()))
+            previous = (bp_num, matched, list(solver.ResponseProto().solution))
+            outcome_fp = {}
+            for f_p, x in xfp.items():
+                outcome_fp[f_p] = solver.Value(x)
+            outcomes[bp_num] = (problem.outcome_children_dic(outcome_fp), outcome_fp)
+        pareto_table.append(
+            {
+                "bp_num": bp_num,
+                "matched": matched,
+                "status": solver.StatusName(status),
+                "wall_time": tim,
+            }
+        )
+    finish_report(run_report)
+    return pareto_table, outcomes
+
+
+def CP_lazy(
+    children_dic,
+    daycares_dic,
+    families_dic,
+    share_bool,
+    bp_num=0,
+    solver_time=360,
+    exclude_bool=True,
+    search_depth=5,
+    solver_config=None,
+    max_iterations=100,
+    shared_prefix=False,
+    tie_tolerance=TIE_TOLERANCE,
+    run_report=None,
+):
+    """
+    solve an instance by generating blocking coalition constraints lazily
+
+    the model starts with the feasibility constraints only; after each solve,
+    check_blocking_coalitions finds the positions (f, p) blocking the solution and
+    alpha / gamma / beta are created for the new ones only, until no new position blocks.
+    The check counts strictly better children, so it finds every position whose beta
+    could be 1 in the full model: the last solution is optimal for the full model of CP
+
+    solver_time is the total time limit of all solves; the previous solution is given as
+    a hint to the next solve. shared_prefix: reference prefix occupancy variables in the
+    gamma constraints (see create_model). tie_tolerance: relative difference of priority
+    scores below which children are tied (see CP)
+    Output:
+        outcome_children_dic, outcome_fp as returned by CP
+    """
+    import time
+
+    time_sta = time.time()
+    model = cp_model.CpModel()
+    with phase(run_report, "create_agents"):
+        registry = create_agent_registry(
+            children_dic, daycares_dic, families_dic, tie_tolerance
+        )
+    with phase(run_report, "create_problem_arrays"):
+        problem = create_problem_arrays(children_dic, daycares_dic, families_dic)
+    children, daycares, families = registry.as_lists()
+    with phase(run_report, "creat_variables_xfp", model):
+        xfp = creat_variables_xfp(families, model)
+    with phase(run_report, "creat_variables_xcd", model):
+        xcd = creat_variables_xcd(children, daycares, families, xfp, model, registry)
+    with phase(run_report, "feasibility_constraints", model):
+        feasibility_constraints(
+            children, daycares, families, share_bool, xfp, xcd, model, problem
+        )
+    # sum(beta) <= bp_num, with the beta added by the iterations
+    bp_index = len(model.Proto().constraints)
+    model.Proto().constraints.add().linear.domain.extend([cp_model.INT_MIN, bp_num])
+    model.Maximize(objective_expression(xcd))
+    prefix = PrefixOccupancy(model, xcd) if shared_prefix is True else None
+    capacity = problem.capacity(share_bool)
+    alpha, gamma_fp, gamma_fpd, gamma_fpdg, age_fpd, beta = {}, {}, {}, {}, {}, {}
+
+    outcome_fp = None
+    stable = False
+    for iteration in range(max_iterations):
+        remaining = solver_time - (time.time() - time_sta)
+        if remaining <= 0:
+            break
+        solver, status, tim = solve_model(model, remaining, solver_config, run_report)
+        check_status(solver, status, bp_num)
+        if status == cp_model.UNKNOWN:
+            break
+        outcome_fp = {f_p: solver.Value(x) for f_p, x in xfp.items()}
+        with phase(run_report, "check_blocking_coalitions"):
+            bp_dic = check_blocking_coalitions(
+                problem, outcome_fp, share_bool, exclude_bool, capacity
+            )
+        new = [
+            (f_id, p)
+            for f_id, ps in bp_dic.items()
+            for p in ps
+            if (f_id, p) not in beta
+        ]
+        logger.info(
+            "iteration %d: %d new blocking positions, %d in the model",
+            iteration,
+            len(new),
+            len(beta),
+        )
+        if len(new) == 0:
+            stable = True
+            break
+        with phase(run_report, "blocking_constraints", model):
+            for f_id, p in new:
+                f = registry.families[f_id]
+                creat_variables_gamma_position(
+                    children,
+                    daycares,
+                    share_bool,
+                    f,
+                    p,
+                    xcd,
+                    alpha,
+                    gamma_fp,
+                    gamma_fpd,
+                    gamma_fpdg,
+                    age_fpd,
+                    model,
+                    exclude_bool,
+                    search_depth,
+                    registry,
+                    problem,
+                    None,
+                    prefix,
+                )
+                alpha[f_id, p] = model.NewBoolVar(f"alpha_[{f_id}, {p}]")
+                model.Add(alpha[f_id, p] == sum(xfp[f_id, k] for k in range(p + 1)))
+                beta[f_id, p] = model.NewBoolVar(f"beta_[{f_id}, {p}]")
+                model.Add(beta[f_id, p] == 0).OnlyEnforceIf(alpha[f_id, p])
+                model.Add(beta[f_id, p] == gamma_fp[f_id, p]).OnlyEnforceIf(
+                    alpha[f_id, p].Not()
+                )
+                # add beta[f, p] to sum(beta) <= bp_num
+                linear = model.Proto().constraints[bp_index].linear
+                linear.vars.append(beta[f_id, p].Index())
+                linear.coeffs.append(1)
+        # the previous solution satisfies all constraints but the new ones
+        model.ClearHints()
+        hint = model.Proto().solution_hint
+        hint.vars.extend(range(len(solver.ResponseProto().solution)))
+        hint.values.extend(solver.ResponseProto().solution)
+
+    if outcome_fp is not None and stable is False:
+        logger.warning(
+            "stopped before convergence: blocking coalitions may exceed bp_num"
+        )
+    if outcome_fp is None:
+        logger.warning("no solution found, falling back to deferred acceptance")
+        outcome_fp = deferred_acceptance(problem, share_bool)
+        warn_unmatched_transfer_families(problem, outcome_fp)
+    logger.info("lazy time elapsed %.3f", time.time() - time_sta)
+    finish_report(run_report)
+    return problem.outcome_children_dic(outcome_fp), outcome_fp
+
+
+def load_or_create_model(
+    children_dic,
+    daycares_dic,
+    families_dic,
+    share_bool,
+    bp_num=0,
+    exclude_bool=True,
+    search_depth=5,
+    cache=None,
+    presolve=False,
+    shared_prefix=False,
+    alpha_encoding="sums",
+    tie_tolerance=TIE_TOLERANCE,
+    run_report=None,
+):
+    """
+    return the output of create_model, restored from cache (ModelCache) when possible
+    """
+    cached = None
+    if cache is not None:
+        key = instance_fingerprint(
+            children_dic,
+            daycares_dic,
+            families_dic,
+            share_bool,
+            exclude_bool,
+            search_depth,
+            presolve,
+            shared_prefix,
+            alpha_encoding,
+            tie_tolerance,
+        )
+        with phase(run_report, "load_model"):
+            cached = cache.load(key)
+    if cached is None:
+        model, problem, xfp, xcd, beta, bp_index = create_model(
+            children_dic,
+            daycares_dic,
+            families_dic,
+            share_bool,
+            bp_num,
+            exclude_bool,
+            search_depth,
+            presolve,
+            shared_prefix,
+            alpha_encoding,
+            tie_tolerance,
+            run_report,
+        )
+        if cache is not None:
+            cache.store(key, model, problem, xfp, xcd, beta, bp_index)
+    else:
+        model, problem, xfp, xcd, beta, bp_index = cached
+        set_bp_num(model, bp_index, bp_num)
+    return model, problem, xfp, xcd, beta, bp_index
+
+
+def solve_model(
+    model, solver_time, solver_config=None, run_report=None, solution_callback=None
+):
+    """
+    solve model and log its status
+    solver_config: SolverConfig, default SolverConfig()
+    run_report: RunReport (optional), records the solve phase and the solver statistics
+    solution_callback: CpSolverSolutionCallback (optional), e.g. SolutionStreamer
+    Output:
+        solver, status, elapsed wall time (seconds)
+    """
     import time
 
     time_sta = time.time()
 
     solver = cp_model.CpSolver()
-    solver.parameters.num_search_workers = 8
-    solver.parameters.max_time_in_seconds = solver_time
-    status = solver.Solve(model)
-    print(solver.StatusName(status))
-    print("Totally matched:", solver.ObjectiveValue())
+    if solver_config is None:
+        solver_config = SolverConfig()
+    solver_config.apply(solver, solver_time)
+    with phase(run_report, "solve"):
+        status = solver.Solve(model, solution_callback)
+    logger.info(solver.StatusName(status))
+    logger.info("Totally matched: %s", solver.ObjectiveValue())
+    if run_report is not None:
+        run_report.add_solver(solver, status)
 
     time_end = time.time()
     tim = time_end - time_sta
-    print("solver time elapsed", tim)
-    # outcome
-    outcome_fp = {}
-    for f in families:
-        for p in range(len(f.pref)):
-            outcome_fp[f.id, p] = solver.Value(xfp[f.id, p])
-            if outcome_fp[f.id, p] == 1:
-                for c_id in f.children:
-                    c = get_agent(c_id, children)
-                    c.assigned_daycare = c.projected_pref[p]
-    outcome_children_dic = {}
-    for c in children:
-        outcome_children_dic[c.id] = {}
-        if c.assigned_daycare is None:
-            c.assigned_daycare = 9999
-        outcome_children_dic[c.id]["CP"] = c.assigned_daycare
-    return outcome_children_dic, outcome_fp
+    logger.info("solver time elapsed %.3f", tim)
+    return solver, status, tim
+
+
+def create_model(
+    children_dic,
+    daycares_dic,
+    families_dic,
+    share_bool,
+    bp_num=0,
+    exclude_bool=True,
+    search_depth=5,
+    presolve=False,
+    shared_prefix=False,
+    alpha_encoding="sums",
+    tie_tolerance=TIE_TOLERANCE,
+    run_report=None,
+):
+    """
+    build the CP model of an instance
+    presolve: if True, positions that can never be assigned get no variables (their xfp
+        and beta are the constant 0) and gamma determined by the capacities alone are
+        replaced by constants; the removed variables / constraints are logged
+    shared_prefix: if True, gamma constraints reference one prefix occupancy variable per
+        daycare / age / rank (PrefixOccupancy) instead of summing xcd over better children
+    alpha_encoding: one of ALPHA_ENCODINGS, how alpha[f, p] and xcd are linked to xfp
+        (see creat_variables_alpha)
+    tie_tolerance: relative difference of priority scores below which children are
+        tied (see RankIndex.tie_end)
+    run_report: RunReport (optional), records each phase of the construction
+    Output:
+        model, problem (ProblemArrays), xfp, xcd, beta,
+        bp_index: index of the constraint sum(beta) <= bp_num in model.Proto()
+    """
+    model = cp_model.CpModel()
+    with phase(run_report, "create_agents"):
+        registry = create_agent_registry(
+            children_dic, daycares_dic, families_dic, tie_tolerance
+        )
+    with phase(run_report, "create_problem_arrays"):
+        problem = create_problem_arrays(children_dic, daycares_dic, families_dic)
+    children, daycares, families = registry.as_lists()
+    report = None
+    if presolve is True:
+        with phase(run_report, "presolve"):
+            report = create_presolve_report(problem, share_bool)
+    xfp, xcd, alpha, gamma_fp, gamma_fpd, gamma_fpdg, age_fpd, beta = create_variables(
+        children,
+        daycares,
+        families,
+        share_bool,
+        model,
+        exclude_bool,
+        search_depth,
+        registry,
+        problem,
+        report,
+        shared_prefix,
+        alpha_encoding,
+        run_report,
+    )
+    if report is not None:
+        logger.info("%s", report)
+    with phase(run_report, "feasibility_constraints", model):
+        feasibility_constraints(
+            children, daycares, families, share_bool, xfp, xcd, model, problem
+        )
+    with phase(run_report, "objective", model):
+        # blocking coalition constraints
+        bp = [beta[f.id, p] for f in families for p in range(len(f.pref))]
+        bp_index = model.Add(sum(bp) <= bp_num).Index()
+        # objective: maximize the number of matched children
+        model.Maximize(objective_expression(xcd))
+    return model, problem, xfp, xcd, beta, bp_index
+
+
+def objective_expression(xcd):
+    """
+    return the number of matched children, i.e. the sum of xcd over real daycares
+    """
+    return sum(x for (c_id, d_id), x in xcd.items() if d_id != 9999)
+
+
+def add_hint(model, problem, xfp, hint):
+    """
+    replace the solution hint of model by a value for every xfp
+    hint: outcome_fp dict[(Family.id, position), 0 / 1] or dict[Child.id, Daycare.id]
+    """
+    if len(hint) > 0 and not isinstance(next(iter(hint)), tuple):
+        hint = problem.outcome_fp_from_assignment(hint)
+    model.ClearHints()
+    hinted = set()
+    for f_p, x in xfp.items():
+        # positions removed by presolve share the constant 0
+        if x.Index() not in hinted:
+            hinted.add(x.Index())
+            model.AddHint(x, hint.get(f_p, 0))
+
+
+def set_bp_num(model, bp_index, bp_num):
+    """
+    update the bound of the constraint sum(beta) <= bp_num at bp_index
+    """
+    set_domain(model, bp_index, cp_model.INT_MIN, bp_num)
+
+
+def set_domain(model, index, lower_bound, upper_bound):
+    """
+    replace the domain of the linear constraint at index by [lower_bound, upper_bound]
+    """
+    domain = model.Proto().constraints[index].linear.domain
+    del domain[:]
+    domain.extend([lower_bound, upper_bound])
+
+
+def _is_constant(value, constant):
+    """
+    whether a variable of the model has been replaced by the constant by presolve
+    """
+    return isinstance(value, int) and value == constant
 
 
 # create xfp
-def creat_variables_xfp(families, model):
+def creat_variables_xfp(families, model, presolve=None):
     xfp = {}
     for f in families:
         for p in range(len(f.pref)):
-            xfp[f.id, p] = model.NewBoolVar(f"xfp_[{f.id}, {p}]")
+            if presolve is not None and (f.id, p) in presolve.unreachable:
+                xfp[f.id, p] = model.NewConstant(0)
+                presolve.remove(1, 0)
+            else:
+                xfp[f.id, p] = model.NewBoolVar(f"xfp_[{f.id}, {p}]")
     return xfp
 
 
 # create xcd
-def creat_variables_xcd(children, daycares, families, xfp, model):
+def creat_variables_xcd(
+    children,
+    daycares,
+    families,
+    xfp,
+    model,
+    registry=None,
+    presolve=None,
+    alpha_encoding="sums",
+):
+    registry = (
+        as_registry(children, daycares, families) if registry is None else registry
+    )
     xcd = {}
     for c in children:
         if len(c.projected_pref) != 0:  # ignore children who do not have preferences
             # only consider daycares which are listed in c.projected_pref, denoted by c.all_daycare_ids
             for d_id in c.all_daycare_ids:
-                xcd[c.id, d_id] = model.NewBoolVar(f"xcd_[{c.id}, {d_id}]")
-                f_c = get_agent(c.family, families)
+                f_c = registry.families[c.family]
                 all_positions = (
                     c.return_all_positions_of_certain_dacyare_in_projected_pref(d_id)
                 )
+                if presolve is not None:
+                    all_positions = [
+                        p
+                        for p in all_positions
+                        if (f_c.id, p) not in presolve.unreachable
+                    ]
+                    if len(all_positions) == 0:
+                        xcd[c.id, d_id] = model.NewConstant(0)
+                        presolve.remove(1, 1)
+                        continue
+                xcd[c.id, d_id] = model.NewBoolVar(f"xcd_[{c.id}, {d_id}]")
+                if alpha_encoding == "implications":
+                    # xcd[c, d] <=> xfp[f, p] for some p, as at most one xfp[f, p] is 1
+                    literals = [xfp[f_c.id, p] for p in all_positions]
+                    for x in literals:
+                        model.AddImplication(x, xcd[c.id, d_id])
+                    model.AddBoolOr(literals + [xcd[c.id, d_id].Not()])
+                    continue
                 model.Add(
                     (xcd[c.id, d_id] == (sum(xfp[f_c.id, p] for p in all_positions)))
                 )
@@ -89,12 +770,46 @@ def creat_variables_xcd(children, daycares, families, xfp, model):
 
 
 # create alpha
-def creat_variables_alpha(families, xfp, model):
+def creat_variables_alpha(
+    families, xfp, model, presolve=None, gamma_fp=None, alpha_encoding="sums"
+):
+    """
+    alpha[f, p] = 1 iff f is assigned to one of its first p + 1 positions
+
+    alpha_encoding:
+        "sums": alpha[f, p] == sum(xfp[f, k] for k <= p), quadratic in len(f.pref)
+        "chain": alpha[f, p] == alpha[f, q] + sum(xfp[f, k] for q < k <= p), q the
+            previous position with an alpha, linear in len(f.pref)
+        "implications": alpha[f, p] <=> alpha[f, q] or xfp[f, k] for q < k <= p, as
+            implications and one clause; the same as "chain" because at most one
+            xfp[f, k] is 1. creat_variables_xcd links xcd to xfp in the same way
+    """
     alpha = {}
     for f in families:
+        previous = None  # (q, alpha[f, q]) of the previous alpha of f
         for p in range(len(f.pref)):
+            # beta[f, p] = 0 does not depend on alpha when gamma[f, p] is fixed to 0
+            if presolve is not None and _is_constant(gamma_fp[f.id, p], 0):
+                presolve.remove(1, 1)
+                continue
             alpha[f.id, p] = model.NewBoolVar(f"alpha_[{f.id}, {p}]")
-            model.Add((alpha[f.id, p] == (sum(xfp[f.id, k] for k in range(p + 1)))))
+            if alpha_encoding == "sums":
+                model.Add((alpha[f.id, p] == (sum(xfp[f.id, k] for k in range(p + 1)))))
+                continue
+            start = 0 if previous is None else previous[0] + 1
+            literals = [] if previous is None else [previous[1]]
+            literals += [
+                xfp[f.id, k]
+                for k in range(start, p + 1)
+                if presolve is None or (f.id, k) not in presolve.unreachable
+            ]
+            if alpha_encoding == "chain":
+                model.Add(alpha[f.id, p] == sum(literals))
+            else:
+                for x in literals:
+                    model.AddImplication(x, alpha[f.id, p])
+                model.AddBoolOr(literals + [alpha[f.id, p].Not()])
+            previous = (p, alpha[f.id, p])
     return alpha
 
 
@@ -113,79 +828,183 @@ def creat_variables_gamma_siblings(
     model,
     exclude_bool,
     search_depth,
+    registry=None,
+    problem=None,
+    presolve=None,
+    prefix=None,
 ):
+    registry = as_registry(children, daycares) if registry is None else registry
     for p in range(
         len(f.pref)
     ):  # for each position p, add one constraint for gamma[f, p]
-        for d_id in f.return_daycare_id_for_certain_position(p):  # D(f, p)
-            d = get_agent(d_id, daycares)
-            age_fpd[f.id, p, d_id] = []  # a list of ages that will be used  later
+        creat_variables_gamma_position(
+            children,
+            daycares,
+            share_bool,
+            f,
+            p,
+            xcd,
+            alpha,
+            gamma_fp,
+            gamma_fpd,
+            gamma_fpdg,
+            age_fpd,
+            model,
+            exclude_bool,
+            search_depth,
+            registry,
+            problem,
+            presolve,
+            prefix,
+        )
+
+
+# create gamma[f, p], gamma[f, p, d] and gamma[f, p, d, g] for one position p of family f
+def creat_variables_gamma_position(
+    children,
+    daycares,
+    share_bool,
+    f,
+    p,
+    xcd,
+    alpha,
+    gamma_fp,
+    gamma_fpd,
+    gamma_fpdg,
+    age_fpd,
+    model,
+    exclude_bool,
+    search_depth,
+    registry=None,
+    problem=None,
+    presolve=None,
+    prefix=None,
+):
+    registry = as_registry(children, daycares) if registry is None else registry
+    # with presolve, every gamma of an unreachable position is fixed to 0
+    unreachable = presolve is not None and (f.id, p) in presolve.unreachable
+    for d_id in f.return_daycare_id_for_certain_position(p):  # D(f, p)
+        d = registry.daycares[d_id]
+        age_fpd[f.id, p, d_id] = []  # a list of ages that will be used  later
+        if problem is None:
             capacity = d.total_numbers_share if share_bool is True else d.total_numbers
-            for g in range(6):
-                # calculate the number of children who i) are from family f ii) have grade related to g iii) apply to d at \succ_{f, p}
-                number_fpdg = len(
-                    f.return_siblings_for_certain_position_daycare_age(
-                        p, d_id, g, share_bool, children, daycares
+        else:
+            capacity = problem.capacity(share_bool)[
+                problem.daycare_index[d_id]
+            ].tolist()
+        # ages g whose children i) are from family f ii) have grade related to g iii) apply to d at \succ_{f, p}
+        for g, siblings_fpdg, worst_id in f.return_sibling_groups(
+            p, d_id, share_bool, registry
+        ):
+            number_fpdg = len(siblings_fpdg)
+            age_fpd[f.id, p, d_id].append(g)
+            # worst_id: the child c* with the lowest priority who i) is from family f ii) has grade related to g iii) applies to d at \succ_{c, p}
+            # find all children who i) are not from family f ii) have higher priority than c*
+
+            if prefix is None:
+                children_better = (
+                    d.return_weak_better_children_than_child_excluding_siblings(
+                        worst_id,
+                        registry,
+                        share_bool,
+                        exclude_bool,
+                        search_depth,
                     )
                 )
-                if number_fpdg != 0:
-                    gamma_fpdg[f.id, p, d_id, g] = model.NewBoolVar(
-                        f"gamma_fpdg_[{f.id}, {p}, {d_id}, {g}]"
-                    )
-                    age_fpd[f.id, p, d_id].append(g)
-                    # find the child c* with the lowest priority who i) is from family f ii) has grade related to g iii) applies to d at \succ_{c, p}
-                    worst_id = f.return_lowest_sibling_for_certain_position_daycare_age(
-                        p, d_id, g, share_bool, children, daycares
-                    )
-                    # find all children who i) are not from family f ii) have higher priority than c*
+                number_better = len(children_better)
+            else:
+                # children_better = index.ids[:end] - excluded
+                index, end, excluded = d.return_weak_better_prefix(
+                    worst_id, registry, share_bool, exclude_bool, search_depth
+                )
+                number_better = end - len(excluded)
 
-                    children_better = (
-                        d.return_weak_better_children_than_child_excluding_siblings(
-                            worst_id, children, share_bool, exclude_bool, search_depth
-                        )
-                    )
+            if presolve is not None:
+                # gamma[f, p, d, g] is constant if capacity[g] is exceeded by the
+                # siblings alone, or not even by all better children
+                if unreachable is True:
+                    fixed = 0
+                elif number_better == 0:
+                    fixed = 1 if capacity[g] >= number_fpdg else 0
+                elif number_fpdg > capacity[g]:
+                    fixed = 0
+                elif number_better + number_fpdg <= capacity[g]:
+                    fixed = 1
+                else:
+                    fixed = None
+                if fixed is not None:
+                    gamma_fpdg[f.id, p, d_id, g] = fixed
+                    presolve.fixed_gamma += 1
+                    presolve.remove(1, 1 if number_better == 0 else 2)
+                    continue
 
-                    if len(children_better) == 0:  # when no child better than c* exists
-                        if capacity[g] >= number_fpdg:
-                            model.Add(gamma_fpdg[f.id, p, d_id, g] == 1)
-                        else:
-                            model.Add(gamma_fpdg[f.id, p, d_id, g] == 0)
-                    else:  # Channeling constraints
-                        model.Add(
-                            (
-                                sum(xcd[c_id, d.id] for c_id in children_better)
-                                + number_fpdg
-                            )
-                            <= capacity[g]
-                        ).OnlyEnforceIf(gamma_fpdg[f.id, p, d_id, g])
-                        model.Add(
-                            (
-                                sum(xcd[c_id, d.id] for c_id in children_better)
-                                + number_fpdg
-                            )
-                            > capacity[g]
-                        ).OnlyEnforceIf(gamma_fpdg[f.id, p, d_id, g].Not())
-            # variable \gamma[f,p,d]
-            gamma_fpd[f.id, p, d_id] = model.NewBoolVar(
-                f"gamma_fpd_[{f.id}, {p}, {d_id}]"
+            gamma_fpdg[f.id, p, d_id, g] = model.NewBoolVar(
+                f"gamma_fpdg_[{f.id}, {p}, {d_id}, {g}]"
+            )
+            if number_better == 0:  # when no child better than c* exists
+                if capacity[g] >= number_fpdg:
+                    model.Add(gamma_fpdg[f.id, p, d_id, g] == 1)
+                else:
+                    model.Add(gamma_fpdg[f.id, p, d_id, g] == 0)
+            else:  # Channeling constraints
+                if prefix is None:
+                    occupancy_better = sum(xcd[c_id, d.id] for c_id in children_better)
+                else:
+                    occupancy_better = prefix.occupancy(d, index, end) - sum(
+                        xcd[c_id, d.id] for c_id in excluded
+                    )
+                model.Add(
+                    (occupancy_better + number_fpdg) <= capacity[g]
+                ).OnlyEnforceIf(gamma_fpdg[f.id, p, d_id, g])
+                model.Add((occupancy_better + number_fpdg) > capacity[g]).OnlyEnforceIf(
+                    gamma_fpdg[f.id, p, d_id, g].Not()
+                )
+        # variable \gamma[f,p,d]
+        if presolve is not None:
+            fixed = _conjunction(
+                [gamma_fpdg[f.id, p, d_id, g] for g in age_fpd[f.id, p, d_id]]
             )
-            model.Add(
-                sum(gamma_fpdg[f.id, p, d_id, g] for g in age_fpd[f.id, p, d_id])
-                == len(age_fpd[f.id, p, d_id])
-            ).OnlyEnforceIf(gamma_fpd[f.id, p, d_id])
-            model.Add(
-                sum(gamma_fpdg[f.id, p, d_id, g] for g in age_fpd[f.id, p, d_id])
-                < len(age_fpd[f.id, p, d_id])
-            ).OnlyEnforceIf(gamma_fpd[f.id, p, d_id].Not())
-        # variable \gamma[f,p]
-        gamma_fp[f.id, p] = model.NewBoolVar(f"gamma_fp_[{f.id}, {p}]")
-        id_fp = f.return_daycare_id_for_certain_position(p)
+            if fixed is not None:
+                gamma_fpd[f.id, p, d_id] = fixed
+                presolve.fixed_gamma += 1
+                presolve.remove(1, 2)
+                continue
+        gamma_fpd[f.id, p, d_id] = model.NewBoolVar(f"gamma_fpd_[{f.id}, {p}, {d_id}]")
         model.Add(
-            sum(gamma_fpd[f.id, p, d_id] for d_id in id_fp) == len(id_fp)
-        ).OnlyEnforceIf(gamma_fp[f.id, p])
+            sum(gamma_fpdg[f.id, p, d_id, g] for g in age_fpd[f.id, p, d_id])
+            == len(age_fpd[f.id, p, d_id])
+        ).OnlyEnforceIf(gamma_fpd[f.id, p, d_id])
         model.Add(
-            sum(gamma_fpd[f.id, p, d_id] for d_id in id_fp) < len(id_fp)
-        ).OnlyEnforceIf(gamma_fp[f.id, p].Not())
+            sum(gamma_fpdg[f.id, p, d_id, g] for g in age_fpd[f.id, p, d_id])
+            < len(age_fpd[f.id, p, d_id])
+        ).OnlyEnforceIf(gamma_fpd[f.id, p, d_id].Not())
+    # variable \gamma[f,p]
+    id_fp = f.return_daycare_id_for_certain_position(p)
+    if presolve is not None:
+        fixed = _conjunction([gamma_fpd[f.id, p, d_id] for d_id in id_fp])
+        if fixed is not None:
+            gamma_fp[f.id, p] = fixed
+            presolve.fixed_gamma += 1
+            presolve.remove(1, 2)
+            return
+    gamma_fp[f.id, p] = model.NewBoolVar(f"gamma_fp_[{f.id}, {p}]")
+    model.Add(
+        sum(gamma_fpd[f.id, p, d_id] for d_id in id_fp) == len(id_fp)
+    ).OnlyEnforceIf(gamma_fp[f.id, p])
+    model.Add(
+        sum(gamma_fpd[f.id, p, d_id] for d_id in id_fp) < len(id_fp)
+    ).OnlyEnforceIf(gamma_fp[f.id, p].Not())
+
+
+def _conjunction(values):
+    """
+    return 0 if some value is fixed to 0, 1 if all values are fixed to 1, None otherwise
+    """
+    if any(_is_constant(value, 0) for value in values):
+        return 0
+    if all(_is_constant(value, 1) for value in values):
+        return 1
+    return None
 
 
 # creat gamma
@@ -199,7 +1018,14 @@ def creat_variables_gamma(
     model,
     exclude_bool,
     search_depth,
+    registry=None,
+    problem=None,
+    presolve=None,
+    prefix=None,
 ):
+    registry = (
+        as_registry(children, daycares, families) if registry is None else registry
+    )
     gamma_fpdg = {}
     gamma_fpd = {}
     gamma_fp = {}
@@ -220,17 +1046,30 @@ def creat_variables_gamma(
             model,
             exclude_bool,
             search_depth,
+            registry,
+            problem,
+            presolve,
+            prefix,
         )
 
     return gamma_fp, gamma_fpd, gamma_fpdg, age_fpd
 
 
 # create beta
-def creat_variables_beta(families, alpha, gamma_fp, model):
+def creat_variables_beta(families, alpha, gamma_fp, model, presolve=None):
     beta = {}
     for f in families:
         for p in range(len(f.pref)):
+            if presolve is not None and _is_constant(gamma_fp[f.id, p], 0):
+                beta[f.id, p] = model.NewConstant(0)
+                presolve.remove(1, 2)
+                continue
             beta[f.id, p] = model.NewBoolVar(f"beta_[{f.id}, {p}]")
+            if presolve is not None and _is_constant(gamma_fp[f.id, p], 1):
+                # beta[f, p] = 1 - alpha[f, p]
+                model.Add(beta[f.id, p] + alpha[f.id, p] == 1)
+                presolve.remove(0, 1)
+                continue
             model.Add((beta[f.id, p] == 0)).OnlyEnforceIf(alpha[f.id, p])
             model.Add((beta[f.id, p] == gamma_fp[f.id, p])).OnlyEnforceIf(
                 alpha[f.id, p].Not()
@@ -240,33 +1079,104 @@ def creat_variables_beta(families, alpha, gamma_fp, model):
 
 # create all variables
 def create_variables(
-    children, daycares, families, share_bool, model, exclude_bool, search_depth
+    children,
+    daycares,
+    families,
+    share_bool,
+    model,
+    exclude_bool,
+    search_depth,
+    registry=None,
+    problem=None,
+    presolve=None,
+    shared_prefix=False,
+    alpha_encoding="sums",
+    run_report=None,
 ):
-    xfp = creat_variables_xfp(families, model)
-    xcd = creat_variables_xcd(children, daycares, families, xfp, model)
-    alpha = creat_variables_alpha(families, xfp, model)
-    gamma_fp, gamma_fpd, gamma_fpdg, age_fpd = creat_variables_gamma(
-        children,
-        daycares,
-        families,
-        share_bool,
-        xcd,
-        alpha,
-        model,
-        exclude_bool,
-        search_depth,
+    """
+    presolve: PresolveReport (optional)
+        skip unreachable positions and replace fixed gamma by constants, recording the
+        removed variables and constraints in presolve
+
+    shared_prefix: bool
+        express the occupancy of better children in gamma constraints through the
+        prefix occupancy variables of PrefixOccupancy instead of sums of xcd
+
+    alpha_encoding: str
+        one of ALPHA_ENCODINGS, the encoding of alpha and of the channeling of xcd
+        (see creat_variables_alpha)
+
+    run_report: RunReport (optional)
+        records the time and the variables / constraints of each creat_variables_*
+    """
+    if alpha_encoding not in ALPHA_ENCODINGS:
+        raise ValueError(f"unknown alpha_encoding {alpha_encoding!r}")
+    registry = (
+        as_registry(children, daycares, families) if registry is None else registry
     )
-    beta = creat_variables_beta(families, alpha, gamma_fp, model)
+    if presolve is not None:
+        # the variables replaced by the constant 0 all share one fixed variable
+        model.NewConstant(0)
+        presolve.remove(-1, 0)
+    with phase(run_report, "creat_variables_xfp", model):
+        xfp = creat_variables_xfp(families, model, presolve)
+    with phase(run_report, "creat_variables_xcd", model):
+        xcd = creat_variables_xcd(
+            children,
+            daycares,
+            families,
+            xfp,
+            model,
+            registry,
+            presolve,
+            alpha_encoding,
+        )
+    if presolve is None:
+        with phase(run_report, "creat_variables_alpha", model):
+            alpha = creat_variables_alpha(
+                families, xfp, model, alpha_encoding=alpha_encoding
+            )
+    else:
+        # alpha is only needed where gamma[f, p] is not fixed to 0, known after gamma
+        alpha = None
+    with phase(run_report, "creat_variables_gamma", model):
+        gamma_fp, gamma_fpd, gamma_fpdg, age_fpd = creat_variables_gamma(
+            children,
+            daycares,
+            families,
+            share_bool,
+            xcd,
+            alpha,
+            model,
+            exclude_bool,
+            search_depth,
+            registry,
+            problem,
+            presolve,
+            PrefixOccupancy(model, xcd) if shared_prefix is True else None,
+        )
+    if presolve is not None:
+        with phase(run_report, "creat_variables_alpha", model):
+            alpha = creat_variables_alpha(
+                families, xfp, model, presolve, gamma_fp, alpha_encoding
+            )
+    with phase(run_report, "creat_variables_beta", model):
+        beta = creat_variables_beta(families, alpha, gamma_fp, model, presolve)
     return xfp, xcd, alpha, gamma_fp, gamma_fpd, gamma_fpdg, age_fpd, beta
 
 
 #  feasibility constraints for families and daycares
-def feasibility_constraints(children, daycares, families, share_bool, xfp, xcd, model):
+def feasibility_constraints(
+    children, daycares, families, share_bool, xfp, xcd, model, problem=None
+):
+    if problem is not None:
+        feasibility_constraints_arrays(families, share_bool, xfp, xcd, model, problem)
+        return
     # find a set of families with children who prefer to transfer
-    f_transfer = []
+    f_transfer = set()
     for c in children:
-        if c.initial_daycare != 9999 and c.family not in f_transfer:
-            f_transfer.append(c.family)
+        if c.initial_daycare != 9999:
+            f_transfer.add(c.family)
     #  feasibility constraints for families
     for f in families:
         if f.id in f_transfer:
@@ -290,3 +1200,24 @@ def feasibility_constraints(children, daycares, families, share_bool, xfp, xcd,
                         sum(xcd[c_id, d.id] for c_id in rank_dic[g])
                         <= d.total_numbers_share[g]
                     )
+
+
+#  feasibility constraints for families and daycares read from ProblemArrays
+def feasibility_constraints_arrays(families, share_bool, xfp, xcd, model, problem):
+    transfer = problem.transfer_families()
+    #  feasibility constraints for families
+    for f in families:
+        if transfer[problem.family_index[f.id]]:
+            model.Add(sum(xfp[f.id, p] for p in range(len(f.pref))) == 1)
+        else:
+            model.Add(sum(xfp[f.id, p] for p in range(len(f.pref))) <= 1)
+    #  feasibility constraints for daycares
+    capacity = problem.capacity(share_bool).tolist()
+    child_ids = problem.child_ids.tolist()
+    for d_row, d_id in enumerate(problem.daycare_ids.tolist()):
+        for g in range(6):
+            rank_g = problem.age_priority(d_row, g, share_bool).tolist()
+            if len(rank_g) != 0:
+                model.Add(
+                    sum(xcd[child_ids[c], d_id] for c in rank_g) <= capacity[d_row][g]
+                )
@@ -0,0 +1,338 @@
+import argparse
+import datetime
+import json
+import os
+import pickle
+import subprocess
+import time
+import tracemalloc
+
+from CP_algo import ALPHA_ENCODINGS, create_model, solve_model
+from deferred_acceptance import deferred_acceptance
+from helper_functions import create_agent_registry
+from instance_generator import generate_instance
+from run_report import RunReport
+from solver_config import SolverConfig
+from stability import check_blocking_coalitions
+
+# number of children of each size tier
+TIERS = (1000, 10000, 50000, 100000)
+# relative slowdown of a phase reported by compare_results
+REGRESSION_THRESHOLD = 0.2
+# example instance of compare_encodings
+EXAMPLE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "example_data.pkl"
+)
+
+
+def run_benchmark(
+    tiers=TIERS,
+    output_path="benchmark_results.jsonl",
+    share_bool=True,
+    exclude_bool=True,
+    search_depth=5,
+    solve=False,
+    solver_time=60,
+    seed=0,
+    generator_options=None,
+    memory=False,
+):
+    """
+    time each phase of the pipeline on generated instances of every size tier and append
+    one JSON line per tier to output_path
+
+    phases: create_agents, create_problem_arrays and the model construction phases of
+    create_model (see RunReport), deferred_acceptance and check_blocking_coalitions on
+    its outcome, and the solve itself if solve is True (with a single CP-SAT worker)
+    Input:
+        generator_options: dict of keyword arguments of generate_instance
+        memory: also record agent_bytes_per_child (see agent_memory)
+    Output:
+        list of result dictionaries
+    """
+    generator_options = {} if generator_options is None else generator_options
+    version = code_version()
+    results = []
+    for n_children in tiers:
+        instance = generate_instance(n_children, seed=seed, **generator_options)
+        run_report = RunReport()
+        model, problem, xfp, xcd, beta, bp_index = create_model(
+            *instance,
+            share_bool,
+            0,
+            exclude_bool,
+            search_depth,
+            run_report=run_report,
+        )
+        with run_report.phase("deferred_acceptance"):
+            outcome_fp = deferred_acceptance(problem, share_bool)
+        with run_report.phase("check_blocking_coalitions"):
+            check_blocking_coalitions(
+                problem,
+                outcome_fp,
+                share_bool,
+                exclude_bool,
+                problem.capacity(share_bool),
+            )
+        if solve is True:
+            solve_model(
+                model,
+                solver_time,
+                SolverConfig(num_search_workers=1, random_seed=seed),
+                run_report,
+            )
+        result = {
+            "version": version,
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "n_children": n_children,
+            "n_daycares": len(instance[1]),
+            "n_families": len(instance[2]),
+            **model_size(model),
+            "options": {
+                "share_bool": share_bool,
+                "exclude_bool": exclude_bool,
+                "search_depth": search_depth,
+                "seed": seed,
+                **generator_options,
+            },
+            **run_report.to_dict(),
+        }
+        if memory is True:
+            result["agent_bytes_per_child"] = agent_memory(instance) / n_children
+        with open(output_path, "a") as fp:
+            fp.write(json.dumps(result) + "\n")
+        print(f"{n_children} children:")
+        print(run_report)
+        if memory is True:
+            print(f"agents: {result['agent_bytes_per_child']:.0f} bytes per child")
+        results.append(result)
+    return results
+
+
+def agent_memory(instance):
+    """
+    return the number of bytes held by the agents of instance, as created by CP with
+    create_agent_registry (agents, their tuples and rank indexes, and the registry
+    dictionaries), measured with tracemalloc
+    """
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        registry = create_agent_registry(*instance)
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del registry
+    return after - before
+
+
+def compare_encodings(
+    tiers=(1000, 10000),
+    output_path="benchmark_encodings.jsonl",
+    example_path=EXAMPLE_PATH,
+    encodings=ALPHA_ENCODINGS,
+    share_bool=True,
+    exclude_bool=True,
+    search_depth=5,
+    solver_time=60,
+    seed=0,
+    generator_options=None,
+):
+    """
+    compare the encodings of alpha / xcd (see creat_variables_alpha) on the example
+    instance at example_path (skipped if None) and on generated instances of every tier,
+    appending one JSON line per instance and encoding to output_path
+
+    each line records the model size (see model_size), the build time of create_model
+    and of creat_variables_xcd / creat_variables_alpha, and the status, objective and
+    wall time of a solve with a single CP-SAT worker
+    Output:
+        list of result dictionaries
+    """
+    generator_options = {} if generator_options is None else generator_options
+    instances = []
+    if example_path is not None:
+        with open(example_path, "rb") as fp:
+            instances.append(("example", pickle.load(fp)))
+    for n_children in tiers:
+        instances.append(
+            (
+                f"generated_{n_children}",
+                generate_instance(n_children, seed=seed, **generator_options),
+            )
+        )
+    version = code_version()
+    results = []
+    for name, instance in instances:
+        print(f"{name}: {len(instance[0])} children")
+        for alpha_encoding in encodings:
+            run_report = RunReport()
+            time_sta = time.perf_counter()
+            model, problem, xfp, xcd, beta, bp_index = create_model(
+                *instance,
+                share_bool,
+                0,
+                exclude_bool,
+                search_depth,
+                alpha_encoding=alpha_encoding,
+                run_report=run_report,
+            )
+            build_time = time.perf_counter() - time_sta
+            size = model_size(model)
+            solver, status, solve_time = solve_model(
+                model,
+                solver_time,
+                SolverConfig(num_search_workers=1, random_seed=seed),
+                run_report,
+            )
+            result = {
+                "version": version,
+                "date": datetime.datetime.now().isoformat(timespec="seconds"),
+                "instance": name,
+                "n_children": len(instance[0]),
+                "alpha_encoding": alpha_encoding,
+                **size,
+                "build_time": build_time,
+                "xcd_time": run_report.phases["creat_variables_xcd"]["wall"],
+                "alpha_time": run_report.phases["creat_variables_alpha"]["wall"],
+                "status": run_report.solver[-1]["status"],
+                "objective": run_report.solver[-1]["objective"],
+                "solve_time": solve_time,
+                "options": {
+                    "share_bool": share_bool,
+                    "exclude_bool": exclude_bool,
+                    "search_depth": search_depth,
+                    "seed": seed,
+                    **generator_options,
+                },
+            }
+            with open(output_path, "a") as fp:
+                fp.write(json.dumps(result) + "\n")
+            print(
+                f"  {alpha_encoding}: {size['variables']} variables, "
+                f"{size['constraints']} constraints, {size['terms']} terms, "
+                f"build {build_time:.3f} s "
+                f"(alpha {result['alpha_time']:.3f} s), {result['status']} "
+                f"{result['objective']} in {solve_time:.3f} s"
+            )
+            results.append(result)
+    return results
+
+
+def model_size(model):
+    """
+    return a dictionary of model size statistics: numbers of variables, constraints and
+    terms (variables of linear constraints, literals of clauses and enforcement
+    literals), and the size of the serialized model in bytes
+    """
+    proto = model.Proto()
+    terms = 0
+    for constraint in proto.constraints:
+        terms += len(constraint.enforcement_literal)
+        terms += len(constraint.linear.vars)
+        terms += len(constraint.bool_or.literals)
+        terms += len(constraint.bool_and.literals)
+    return {
+        "variables": len(proto.variables),
+        "constraints": len(proto.constraints),
+        "terms": terms,
+        "bytes": proto.ByteSize(),
+    }
+
+
+def compare_results(output_path="benchmark_results.jsonl", threshold=None):
+    """
+    compare the wall time of each phase between the last two versions recorded in
+    output_path, tier by tier, and print the phases slower by more than threshold
+    (default REGRESSION_THRESHOLD, relative)
+    Output:
+        list of (n_children, phase, previous wall time, latest wall time)
+    """
+    threshold = REGRESSION_THRESHOLD if threshold is None else threshold
+    with open(output_path) as fp:
+        results = [json.loads(line) for line in fp if line.strip() != ""]
+    versions = list(dict.fromkeys(result["version"] for result in results))
+    if len(versions) < 2:
+        print("fewer than two versions to compare")
+        return []
+    previous_version, latest_version = versions[-2:]
+    # the last result of each (version, tier, options)
+    latest = {}
+    for result in results:
+        key = (result["version"], result["n_children"], json.dumps(result["options"]))
+        latest[key] = result
+    regressions = []
+    for (version, n_children, options), result in latest.items():
+        if version != latest_version:
+            continue
+        previous = latest.get((previous_version, n_children, options))
+        if previous is None:
+            continue
+        for name, stats in result["phases"].items():
+            if name not in previous["phases"]:
+                continue
+            before = previous["phases"][name]["wall"]
+            after = stats["wall"]
+            if after > before * (1 + threshold) and after - before > 0.01:
+                regressions.append((n_children, name, before, after))
+                print(
+                    f"{n_children} children, {name}: {before:.3f} s -> {after:.3f} s "
+                    f"({previous_version} -> {latest_version})"
+                )
+    return regressions
+
+
+def code_version():
+    """
+    return the current git commit (with "-dirty" for uncommitted changes), or "unknown"
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=directory,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return commit
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="benchmark the CP pipeline")
+    parser.add_argument("--tiers", type=int, nargs="+", default=list(TIERS))
+    parser.add_argument("--output", default="benchmark_results.jsonl")
+    parser.add_argument("--no-share", action="store_true")
+    parser.add_argument("--search-depth", type=int, default=5)
+    parser.add_argument("--solve", action="store_true")
+    parser.add_argument("--solver-time", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--memory", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--encodings", action="store_true")
+    parser.add_argument("--encodings-output", default="benchmark_encodings.jsonl")
+    args = parser.parse_args()
+    if args.encodings is True:
+        compare_encodings(
+            args.tiers,
+            args.encodings_output,
+            share_bool=not args.no_share,
+            search_depth=args.search_depth,
+            solver_time=args.solver_time,
+            seed=args.seed,
+        )
+    else:
+        if args.compare is False:
+            run_benchmark(
+                args.tiers,
+                args.output,
+                share_bool=not args.no_share,
+                search_depth=args.search_depth,
+                solve=args.solve,
+                solver_time=args.solver_time,
+                seed=args.seed,
+                memory=args.memory,
+            )
+        compare_results(args.output)
@@ -0,0 +1,359 @@
+import csv
+import json
+import os
+
+# fields of each record, as in children_dic / daycares_dic / families_dic
+CHILD_FIELDS = (
+    "id",
+    "age",
+    "family_id",
+    "initial_daycare_id",
+    "actual_daycare_id",
+    "preference_list",
+)
+DAYCARE_FIELDS = (
+    "id",
+    "recruiting_numbers_list",
+    "share_ages_list",
+    "priority_child_id_list",
+    "priority_score_list",
+)
+FAMILY_FIELDS = ("id", "children", "pref")
+
+# fields holding lists, stored as JSON arrays in CSV cells
+LIST_FIELDS = {
+    "preference_list",
+    "recruiting_numbers_list",
+    "share_ages_list",
+    "priority_child_id_list",
+    "priority_score_list",
+    "children",
+    "pref",
+}
+
+
+def load_instance(children_path, daycares_path, families_path, chunk_size=10000):
+    """
+    read an instance from CSV / Parquet / JSONL files (by extension), validating every
+    record while streaming
+
+    CSV files have one column per field, lists as JSON arrays (e.g. "[[20, 20], [9, 9]]")
+    and empty cells for None; JSONL files have one record per line; Parquet files use
+    list columns and are read in batches of chunk_size rows (requires pyarrow)
+    Output:
+        children_dic, daycares_dic, families_dic as expected by CP
+    """
+    return instance_from_records(
+        iter_records(children_path, CHILD_FIELDS, chunk_size),
+        iter_records(daycares_path, DAYCARE_FIELDS, chunk_size),
+        iter_records(families_path, FAMILY_FIELDS, chunk_size),
+    )
+
+
+def instance_from_records(children_records, daycares_records, families_records):
+    """
+    validate records (iterables of (location, dictionary) as yielded by
+    normalize_records) and collect them into children_dic, daycares_dic, families_dic
+    """
+    validator = InstanceValidator()
+    children_dic = {}
+    for location, record in children_records:
+        validator.check_child(record, location)
+        children_dic[record["id"]] = record
+    daycares_dic = {}
+    for location, record in daycares_records:
+        validator.check_daycare(record, location)
+        daycares_dic[record["id"]] = record
+    families_dic = {}
+    for location, record in families_records:
+        validator.check_family(record, location)
+        families_dic[record["id"]] = record
+    validator.check_references()
+    return children_dic, daycares_dic, families_dic
+
+
+def save_instance(
+    children_dic, daycares_dic, families_dic, directory, file_format="jsonl"
+):
+    """
+    write an instance to children / daycares / families files readable by load_instance
+    file_format: "jsonl" or "csv"
+    Output:
+        the paths of the three files
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for name, dic, fields in (
+        ("children", children_dic, CHILD_FIELDS),
+        ("daycares", daycares_dic, DAYCARE_FIELDS),
+        ("families", families_dic, FAMILY_FIELDS),
+    ):
+        path = os.path.join(directory, f"{name}.{file_format}")
+        with open(path, "w", newline="") as fp:
+            if file_format == "jsonl":
+                for record in dic.values():
+                    record = {k: record[k] for k in fields}
+                    fp.write(json.dumps(record, default=_to_json) + "\n")
+            elif file_format == "csv":
+                writer = csv.writer(fp)
+                writer.writerow(fields)
+                for record in dic.values():
+                    writer.writerow([_to_cell(k, record[k]) for k in fields])
+            else:
+                raise ValueError(f"unsupported file format {file_format}")
+        paths.append(path)
+    return paths
+
+
+def iter_records(path, fields, chunk_size=10000):
+    """
+    yield the records of a CSV / Parquet / JSONL file one by one, as (location, record)
+    with location "path:line" and record a dictionary of the given fields (see
+    normalize_records)
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        records = _iter_csv(path)
+    elif extension in (".jsonl", ".ndjson"):
+        records = _iter_jsonl(path)
+    elif extension == ".parquet":
+        records = _iter_parquet(path, chunk_size)
+    else:
+        raise ValueError(f"unsupported file format {path}")
+    return normalize_records(records, fields, path)
+
+
+def normalize_records(records, fields, source):
+    """
+    yield (location, record) for records: iterable of dictionaries or of
+    (line, dictionary), where location is "source:line" (line: index in records for
+    dictionaries) and record has the given fields, with siblings' preferences as tuples
+    and a share_ages_list of None as []
+    """
+    for line, record in enumerate(records):
+        if isinstance(record, tuple):
+            line, record = record
+        location = f"{source}:{line}"
+        missing = [k for k in fields if k not in record]
+        if len(missing) > 0:
+            raise ValueError(f"{location}: missing fields {missing}")
+        record = {k: record[k] for k in fields}
+        if "pref" in record:
+            record["pref"] = _normalize_pref(record["pref"], len(record["children"]))
+        if "share_ages_list" in record and record["share_ages_list"] is None:
+            record["share_ages_list"] = []
+        yield location, record
+
+
+class InstanceValidator:
+    """
+    schema checks of the records of an instance, applied while streaming; errors are
+    ValueError prefixed by the location ("path:line") of the offending record
+
+    references to daycares and children may precede them in the stream: they are
+    collected with the location of their first occurrence and checked by
+    check_references once all records are read
+
+    Attributes
+    ----------
+    child_age: dict[int=Child.id, int]
+
+    child_family: dict[int=Child.id, int=Family.id]
+        family_id of each child (its own id when None)
+
+    child_location: dict[int=Child.id, str]
+
+    daycare_ids: set[int=Daycare.id]
+
+    priority: dict[int=Daycare.id, set[int=Child.id]]
+        the children of the priority list of each daycare
+
+    family_children: dict[int=Family.id, list[int=Child.id]]
+
+    family_location: dict[int=Family.id, str]
+
+    daycare_references: dict[int=Daycare.id, str]
+        daycares referenced by preferences and initial daycares
+
+    child_references: dict[int=Child.id, str]
+        children referenced by priority lists
+
+    applications: dict[(int=Child.id, int=Daycare.id), str]
+        daycares listed in the preferences of a family for each of its children, which
+        must rank the child
+    """
+
+    def __init__(self):
+        self.child_age = {}
+        self.child_family = {}
+        self.child_location = {}
+        self.daycare_ids = set()
+        self.priority = {}
+        self.family_children = {}
+        self.family_location = {}
+        self.daycare_references = {}
+        self.child_references = {}
+        self.applications = {}
+
+    def check_child(self, record, location=None):
+        c_id = record["id"]
+        if c_id in self.child_age:
+            raise _error(location, f"duplicate child {c_id}")
+        if record["age"] not in range(6):
+            raise _error(location, f"child {c_id}: age {record['age']} is not in 0-5")
+        family_id = record["family_id"]
+        self.child_age[c_id] = record["age"]
+        self.child_family[c_id] = c_id if family_id is None else family_id
+        self.child_location[c_id] = location
+        for d_id in [record["initial_daycare_id"], *record["preference_list"]]:
+            self.daycare_references.setdefault(d_id, location)
+
+    def check_daycare(self, record, location=None):
+        d_id = record["id"]
+        if d_id in self.daycare_ids or d_id == 9999:
+            raise _error(location, f"duplicate or reserved daycare id {d_id}")
+        if len(record["recruiting_numbers_list"]) != 6:
+            raise _error(
+                location, f"daycare {d_id}: recruiting_numbers_list needs 6 ages"
+            )
+        if len(record["priority_child_id_list"]) != len(record["priority_score_list"]):
+            raise _error(
+                location, f"daycare {d_id}: priority ids and scores differ in length"
+            )
+        for ages in record["share_ages_list"] or []:
+            if not set(ages) <= set(range(6)):
+                raise _error(location, f"daycare {d_id}: shared ages {ages} not in 0-5")
+        self.daycare_ids.add(d_id)
+        self.priority[d_id] = set(record["priority_child_id_list"])
+        for c_id in self.priority[d_id]:
+            self.child_references.setdefault(c_id, location)
+
+    def check_family(self, record, location=None):
+        f_id = record["id"]
+        if f_id in self.family_children:
+            raise _error(location, f"duplicate family {f_id}")
+        k = len(record["children"])
+        if k == 0:
+            raise _error(location, f"family {f_id} has no children")
+        if k > 1:
+            for tup_p in record["pref"]:
+                if len(tup_p) != k:
+                    raise _error(
+                        location,
+                        f"family {f_id}: preference {tup_p} does not list one "
+                        f"daycare for each of its {k} children",
+                    )
+        self.family_children[f_id] = record["children"]
+        self.family_location[f_id] = location
+        for tup_p in record["pref"]:
+            if k == 1:
+                tup_p = (tup_p,)
+            for c_id, d_id in zip(record["children"], tup_p):
+                self.daycare_references.setdefault(d_id, location)
+                if d_id is not None and d_id != 9999:
+                    self.applications.setdefault((c_id, d_id), location)
+
+    def check_references(self):
+        """
+        check the references between children, daycares and families once all are read
+        """
+        for f_id, children_id_list in self.family_children.items():
+            for c_id in children_id_list:
+                if self.child_family.get(c_id) != f_id:
+                    raise _error(
+                        self.family_location[f_id],
+                        f"family {f_id}: child {c_id} is not in the family",
+                    )
+        for c_id, f_id in self.child_family.items():
+            if f_id not in self.family_children:
+                raise _error(
+                    self.child_location[c_id],
+                    f"child {c_id}: family {f_id} does not exist",
+                )
+        for d_id, location in self.daycare_references.items():
+            if d_id is not None and d_id != 9999 and d_id not in self.daycare_ids:
+                raise _error(location, f"daycare {d_id} does not exist")
+        for c_id, location in self.child_references.items():
+            if c_id not in self.child_age:
+                raise _error(location, f"priority list: child {c_id} does not exist")
+        for (c_id, d_id), location in self.applications.items():
+            if c_id not in self.priority[d_id]:
+                raise _error(
+                    location,
+                    f"child {c_id} applies to daycare {d_id}, which does not rank it",
+                )
+
+
+def _error(location, message):
+    """
+    ValueError for message, prefixed by the location of the record if known
+    """
+    if location is None:
+        return ValueError(message)
+    return ValueError(f"{location}: {message}")
+
+
+def _normalize_pref(pref, n_children):
+    """
+    siblings' preferences as tuples, an only child's preferences as Daycare.id (or None)
+    """
+    if n_children > 1:
+        return [tuple(tup_p) for tup_p in pref]
+    return [
+        tup_p[0] if isinstance(tup_p, (list, tuple)) and len(tup_p) == 1 else tup_p
+        for tup_p in pref
+    ]
+
+
+def _to_cell(field, value):
+    if value is None:
+        return ""
+    if field in LIST_FIELDS:
+        return json.dumps(value, default=_to_json)
+    return value
+
+
+def _to_json(value):
+    # numpy integers of generated instances
+    return int(value)
+
+
+def _from_cell(field, value):
+    if value == "":
+        return None
+    if field in LIST_FIELDS:
+        return json.loads(value)
+    return int(value)
+
+
+def _iter_csv(path):
+    with open(path, newline="") as fp:
+        reader = csv.DictReader(fp)
+        for line, row in enumerate(reader, start=2):
+            try:
+                yield line, {k: _from_cell(k, v) for k, v in row.items()}
+            except ValueError as error:
+                raise ValueError(f"{path}:{line}: {error}") from None
+
+
+def _iter_jsonl(path):
+    with open(path) as fp:
+        for line, text in enumerate(fp, start=1):
+            if text.strip() == "":
+                continue
+            try:
+                yield line, json.loads(text)
+            except json.JSONDecodeError as error:
+                raise ValueError(f"{path}:{line}: {error}") from None
+
+
+def _iter_parquet(path, chunk_size):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("reading Parquet files requires pyarrow") from None
+    line = 0
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+        for row in batch.to_pylist():
+            line += 1
+            yield line, row
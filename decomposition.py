@@ -0,0 +1,191 @@
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from CP_algo import CP
+from solver_config import SolverConfig
+
+logger = logging.getLogger(__name__)
+
+
+def find_components(children_dic, daycares_dic, families_dic):
+    """
+    find the connected components of the bipartite graph between families and the daycares
+    listed in their preferences or attended by their children (initial_daycare_id, whose
+    capacity counts the transfer); the dummy daycare 9999 is not a node
+
+    Output:
+        list of (family ids, daycare ids), largest first; daycares nobody applies to are
+        omitted and families listing only 9999 form components without daycares
+    """
+    family_ids = list(families_dic.keys())
+    parent = list(range(len(family_ids)))
+    daycare_node = {}
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for row, f_id in enumerate(family_ids):
+        for d_id in _family_daycares(families_dic[f_id], children_dic):
+            if d_id is None or d_id == 9999:
+                continue
+            node = daycare_node.get(d_id)
+            if node is None:
+                daycare_node[d_id] = row
+                continue
+            a, b = find(row), find(node)
+            if a != b:
+                parent[a] = b
+
+    components = {}
+    for row, f_id in enumerate(family_ids):
+        components.setdefault(find(row), ([], []))[0].append(f_id)
+    for d_id, node in daycare_node.items():
+        components[find(node)][1].append(d_id)
+    return sorted(components.values(), key=lambda c: len(c[0]), reverse=True)
+
+
+def _family_daycares(family, children_dic):
+    """
+    daycares a family applies to or its children attend
+    """
+    d_ids = {children_dic[c_id]["initial_daycare_id"] for c_id in family["children"]}
+    for tup_p in family["pref"]:
+        d_ids.update(tup_p if isinstance(tup_p, (tuple, list)) else (tup_p,))
+    return d_ids
+
+
+def split_instance(
+    children_dic, daycares_dic, families_dic, components, min_children=1
+):
+    """
+    return one (children_dic, daycares_dic, families_dic) sub-instance per group of
+    components; small components are merged until a sub-instance has min_children children
+
+    the priority lists of daycares are restricted to the children of the sub-instance
+    """
+    instances = []
+    group = ([], [])
+    n_children = 0
+    for f_ids, d_ids in components:
+        group[0].extend(f_ids)
+        group[1].extend(d_ids)
+        n_children += sum(len(families_dic[f_id]["children"]) for f_id in f_ids)
+        if n_children >= min_children:
+            instances.append(
+                _sub_instance(children_dic, daycares_dic, families_dic, *group)
+            )
+            group = ([], [])
+            n_children = 0
+    if len(group[0]) > 0:
+        instances.append(
+            _sub_instance(children_dic, daycares_dic, families_dic, *group)
+        )
+    return instances
+
+
+def _sub_instance(children_dic, daycares_dic, families_dic, f_ids, d_ids):
+    sub_families = {f_id: families_dic[f_id] for f_id in f_ids}
+    sub_children = {
+        c_id: children_dic[c_id]
+        for f_id in f_ids
+        for c_id in families_dic[f_id]["children"]
+    }
+    sub_daycares = {}
+    for d_id in d_ids:
+        daycare = dict(daycares_dic[d_id])
+        priority = [
+            (c_id, score)
+            for c_id, score in zip(
+                daycare["priority_child_id_list"], daycare["priority_score_list"]
+            )
+            if c_id in sub_children
+        ]
+        daycare["priority_child_id_list"] = [c_id for c_id, _ in priority]
+        daycare["priority_score_list"] = [score for _, score in priority]
+        sub_daycares[d_id] = daycare
+    return sub_children, sub_daycares, sub_families
+
+
+def CP_decomposed(
+    children_dic,
+    daycares_dic,
+    families_dic,
+    share_bool,
+    bp_num=0,
+    solver_time=360,
+    exclude_bool=True,
+    search_depth=5,
+    processes=None,
+    cores=None,
+    min_children=1000,
+):
+    """
+    solve each connected component of an instance with its own CP model in parallel and
+    stitch the outcomes together
+
+    only bp_num = 0 is supported: a global bound sum(beta) <= bp_num does not split into
+    independent per-component bounds; the quota 9999 of the dummy daycare applies to each
+    sub-instance separately
+
+    Input:
+        processes: number of concurrent solves (default: cores // 8, at least 1)
+        cores: number of cores to split between processes and CP-SAT workers
+            (default: os.cpu_count())
+        min_children: components are merged into sub-instances of at least this many
+            children, so that tiny components do not each pay for a process round-trip
+    Output:
+        outcome_children_dic, outcome_fp as returned by CP
+    """
+    if bp_num != 0:
+        raise ValueError("CP_decomposed only supports bp_num = 0")
+    time_sta = time.time()
+    components = find_components(children_dic, daycares_dic, families_dic)
+    instances = split_instance(
+        children_dic, daycares_dic, families_dic, components, min_children
+    )
+    logger.info("%d components in %d sub-instances", len(components), len(instances))
+
+    cores = os.cpu_count() if cores is None else cores
+    if processes is None:
+        processes = max(1, cores // 8)
+    processes = max(1, min(processes, len(instances)))
+    num_search_workers = max(1, cores // processes)
+    args = (share_bool, bp_num, solver_time, exclude_bool, search_depth)
+
+    merged_children_dic = {}
+    merged_fp = {}
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [
+            executor.submit(_solve_instance, instance, args, num_search_workers)
+            for instance in instances
+        ]
+        for future in futures:
+            sub_children_dic, sub_fp = future.result()
+            merged_children_dic.update(sub_children_dic)
+            merged_fp.update(sub_fp)
+    # stitch in the order of the input dictionaries, as CP does
+    outcome_children_dic = {c_id: merged_children_dic[c_id] for c_id in children_dic}
+    outcome_fp = {}
+    for f_id, family in families_dic.items():
+        for p in range(len(family["pref"])):
+            outcome_fp[f_id, p] = merged_fp[f_id, p]
+    logger.info("decomposed time elapsed %.3f", time.time() - time_sta)
+    return outcome_children_dic, outcome_fp
+
+
+def _solve_instance(instance, args, num_search_workers):
+    share_bool, bp_num, solver_time, exclude_bool, search_depth = args
+    return CP(
+        *instance,
+        share_bool,
+        bp_num,
+        solver_time,
+        exclude_bool,
+        search_depth,
+        solver_config=SolverConfig(num_search_workers=num_search_workers),
+    )
@@ -0,0 +1,110 @@
+import heapq
+from collections import deque
+
+import numpy as np
+from stability import _related_ages
+
+
+def deferred_acceptance(problem, share_bool=False):
+    """
+    family-proposing deferred acceptance over the sibling tuples of each family
+
+    each family proposes its positions in order; a position asks every daycare d in
+    D(f, p) to hold its children, and each (d, g) keeps the children of its priority
+    list age_priority_child[share_bool] up to capacity(share_bool)[d, g], rejecting the
+    lowest-priority children beyond it; a family with a rejected child leaves all the
+    daycares of its position and proposes its next position. Families never return to
+    earlier positions, so every position is proposed at most once and the running time
+    is O(L log L) for L preference entries. The result respects all capacities but, with
+    siblings, need not be free of blocking coalitions.
+
+    Transfer families are matched, as the CP model requires, when each of them lists the
+    position keeping its children at their initial daycares and they come first in the
+    priority lists there (their seats are part of capacity, see daycare_capacities).
+    Otherwise a transfer family may be rejected from every position; see
+    unmatched_transfer_families.
+
+    Input:
+        problem: ProblemArrays
+        share_bool: whether priorities / quotas are shared within age groups
+    Output:
+        outcome_fp: dict[(Family.id, position), 0 / 1] as returned by CP
+    """
+    n_daycares = len(problem.daycare_ids)
+    pos_ptr = problem.family_pos_ptr
+    pref_ptr = problem.pref_ptr
+    n_positions = len(pref_ptr) - 1
+
+    # (segment d * 6 + g, rank) pairs of each position; a sibling counts toward (d, g)
+    # for every age g related to its own age, if it is in the priority list of (d, g)
+    entry_pos = np.repeat(np.arange(n_positions), np.diff(pref_ptr))
+    entry_child = problem.pref_child.astype(np.int64)
+    entry_daycare = problem.pref_daycare.astype(np.int64)
+    entry_age = problem.child_age[entry_child].astype(np.int64)
+    related = _related_ages(problem, share_bool)[entry_daycare, entry_age]
+    e, g = np.nonzero(related)
+    seg = entry_daycare[e] * 6 + g
+    rank = problem.age_priority_rank(share_bool, seg, entry_child[e])
+    listed = rank >= 0
+    e, seg, rank = e[listed], seg[listed], rank[listed]
+    pair_ptr = np.concatenate(
+        ([0], np.cumsum(np.bincount(entry_pos[e], minlength=n_positions)))
+    ).tolist()
+    # np.nonzero enumerates e in increasing order, hence grouped by position
+    pair_seg = seg.tolist()
+    pair_rank = rank.tolist()
+
+    capacity = problem.capacity(share_bool).reshape(n_daycares * 6).tolist()
+    count = [0] * (n_daycares * 6)
+    # max-heaps of held children by rank: (-rank, family row, version)
+    held = [[] for _ in range(n_daycares * 6)]
+    n_pos = np.diff(pos_ptr).tolist()
+    pos_start = pos_ptr[:-1].tolist()
+    next_pos = [0] * len(n_pos)
+    holding = [-1] * len(n_pos)
+    # a heap entry is valid iff its version is the current version of the family
+    version = [0] * len(n_pos)
+
+    queue = deque(range(len(n_pos)))
+    while queue:
+        f = queue.popleft()
+        if next_pos[f] >= n_pos[f]:
+            continue
+        p = pos_start[f] + next_pos[f]
+        next_pos[f] += 1
+        version[f] += 1
+        holding[f] = p
+        segments = pair_seg[pair_ptr[p] : pair_ptr[p + 1]]
+        for s, r in zip(segments, pair_rank[pair_ptr[p] : pair_ptr[p + 1]]):
+            heapq.heappush(held[s], (-r, f, version[f]))
+            count[s] += 1
+        for s in segments:
+            heap = held[s]
+            while count[s] > capacity[s]:
+                _, f_rejected, v = heapq.heappop(heap)
+                if v != version[f_rejected]:
+                    continue
+                # the family leaves every daycare of its position
+                q = holding[f_rejected]
+                for s_rejected in pair_seg[pair_ptr[q] : pair_ptr[q + 1]]:
+                    count[s_rejected] -= 1
+                holding[f_rejected] = -1
+                version[f_rejected] += 1
+                queue.append(f_rejected)
+
+    outcome_fp = {}
+    for f, f_id in enumerate(problem.family_ids.tolist()):
+        for p in range(n_pos[f]):
+            outcome_fp[f_id, p] = int(pos_start[f] + p == holding[f])
+    return outcome_fp
+
+
+def unmatched_transfer_families(problem, outcome_fp):
+    """
+    return the ids of the families with a child who prefers to transfer that outcome_fp
+    leaves unmatched (CP requires them to be matched)
+    """
+    assignment = problem.family_assignment(outcome_fp)
+    n_pos = np.diff(problem.family_pos_ptr)
+    unmatched = problem.transfer_families() & (assignment == n_pos)
+    return problem.family_ids[unmatched].tolist()
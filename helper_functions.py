@@ -1,184 +1,242 @@
-from CP_agents import CP_Daycare, CP_Child, CP_Family
+from CP_agents import (
+    TIE_TOLERANCE,
+    CP_Daycare,
+    CP_Child,
+    CP_Family,
+    AgentRegistry,
+    as_registry,
+    intern,
+)
+from problem_arrays import daycare_capacities
 
 
 def get_agent(agent_id, agents):
     """
     return a CP_agent instance for given id (including child / daycare / families)
+
+    agents: a list of agents, or an id->agent dictionary of AgentRegistry (constant-time lookup)
     """
+    if isinstance(agents, dict):
+        return agents.get(agent_id)
     agent = next((x for x in agents if x.id == agent_id), None)
     return agent
 
 
+def create_child(record):
+    """
+    create a CP_Child instance from one record of children_dic
+    """
+    c_id = record["id"]
+    family_id = c_id if record["family_id"] is None else record["family_id"]
+    initial_daycare_id = (
+        9999 if record["initial_daycare_id"] is None else record["initial_daycare_id"]
+    )
+    actual_daycare_id = (
+        9999 if record["actual_daycare_id"] is None else record["actual_daycare_id"]
+    )
+    return CP_Child(
+        c_id,
+        record["age"],
+        family_id,
+        initial_daycare_id,
+        actual_daycare_id,
+        record["preference_list"],
+    )
+
+
 def create_children(children_dic):
     """
     create a list of CP_child instances from data stored in children_dic
     """
-    children = []
-    for c_id in children_dic.keys():
-        c_id = children_dic[c_id]["id"]
-        age = children_dic[c_id]["age"]
-        if children_dic[c_id]["family_id"] is None:
-            family_id = children_dic[c_id]["id"]
-        else:
-            family_id = children_dic[c_id]["family_id"]
-        initial_daycare_id = (
-            9999
-            if children_dic[c_id]["initial_daycare_id"] is None
-            else children_dic[c_id]["initial_daycare_id"]
-        )
-        actual_daycare_id = (
-            9999
-            if children_dic[c_id]["actual_daycare_id"] is None
-            else children_dic[c_id]["actual_daycare_id"]
-        )
-        preference_list = children_dic[c_id]["preference_list"]
-        # create a CP_Child instance
-        c = CP_Child(
-            c_id, age, family_id, initial_daycare_id, actual_daycare_id, preference_list
-        )
-        children.append(c)
-    return children
+    return [create_child(record) for record in children_dic.values()]
 
 
-def create_daycares(daycares_dic):
+def create_daycare(record):
     """
-    create a list of CP_Daycare instances from data stored in daycares_dic
+    create a CP_Daycare instance from one record of daycares_dic
+    """
+    return CP_Daycare(
+        record["id"],
+        record["recruiting_numbers_list"],
+        record["share_ages_list"],
+        record["priority_child_id_list"],
+        record["priority_score_list"],
+    )
+
+
+def create_dummy_daycare():
+    """
+    create the dummy daycare 9999 for being unmatched
     """
-    daycares = []
-    for d_id in daycares_dic.keys():
-        d_id = daycares_dic[d_id]["id"]
-        recruiting_numbers_list = daycares_dic[d_id]["recruiting_numbers_list"]
-        share_ages_list = daycares_dic[d_id]["share_ages_list"]
-        priority_child_id_list = daycares_dic[d_id]["priority_child_id_list"]
-        priority_score_list = daycares_dic[d_id]["priority_score_list"]
-        # create a CP_Daycare instance
-        d = CP_Daycare(
-            d_id,
-            recruiting_numbers_list,
-            share_ages_list,
-            priority_child_id_list,
-            priority_score_list,
-        )
-        daycares.append(d)
-    # create a dummy daycare for being unmatched
     dummy_id = 9999
     recruiting_numbers_list = [9999 for i in range(6)]
     share_ages_list = []
     priority_child_id_list = []
     priority_score_list = []
-    dummy = CP_Daycare(
+    return CP_Daycare(
         dummy_id,
         recruiting_numbers_list,
         share_ages_list,
         priority_child_id_list,
         priority_score_list,
     )
-    daycares.append(dummy)
+
+
+def create_daycares(daycares_dic):
+    """
+    create a list of CP_Daycare instances from data stored in daycares_dic
+    """
+    daycares = [create_daycare(record) for record in daycares_dic.values()]
+    # create a dummy daycare for being unmatched
+    daycares.append(create_dummy_daycare())
     return daycares
 
 
+def create_family(record):
+    """
+    create a CP_Family instance from one record of families_dic
+    """
+    assignment = None
+    return CP_Family(record["id"], record["children"], record["pref"], assignment)
+
+
 def create_families(families_dic):
     """
     create a list of CP_family instances from data stored in families_dic
     """
-    families = []
-    for f_id in families_dic.keys():
-        f_id = families_dic[f_id]["id"]
-        children_id_list = families_dic[f_id]["children"]
-        pref_list = families_dic[f_id]["pref"]
-        assignment = None
-        # create a CP_Family instance
-        f = CP_Family(f_id, children_id_list, pref_list, assignment)
-        families.append(f)
-    return families
+    return [create_family(record) for record in families_dic.values()]
 
 
-def update_families_attributes(families):
+def update_families_attributes(families, interned=None):
     """
     for families with an only child,
-        1) convert f.pref: list[int] into f.pref list[tuple(int)]
+        1) convert f.pref: list[int] into f.pref tuple[tuple(int)]
         2) convert None into 9999
+
+    interned: dict used to store equal preference tuples once (see intern)
     """
+    interned = {} if interned is None else interned
     for f in families:
         if f.has_siblings is False:
-            f.pref = [tuple([d_id]) for d_id in f.pref]
-        for pos in range(len(f.pref)):
-            new = []
-            tup_p = f.pref[pos]
-            for item in tup_p:
-                if item is None:
-                    new.append(9999)
-                else:
-                    new.append(item)
-            f.pref[pos] = tuple(new)
+            pref = ((9999 if d_id is None else d_id,) for d_id in f.pref)
+        else:
+            pref = (
+                tuple(9999 if d_id is None else d_id for d_id in tup_p)
+                for tup_p in f.pref
+            )
+        f.pref = intern(interned, tuple(intern(interned, tup_p) for tup_p in pref))
 
 
-def update_children_attributes(children, families):
+def update_children_attributes(children, families, interned=None):
     """
     1) c.projected_pref is induced from f.pref
     2) c.all_daycare_ids is calulated from c.projected_pref
+
+    children: AgentRegistry or all children list
+    interned: dict used to store equal preference tuples once (see intern)
     """
-    # update c.projected_pref
+    registry = as_registry(children)
+    interned = {} if interned is None else interned
     for f in families:
-        for pos in range(len(f.pref)):
-            tup_p = f.pref[pos]
-            for index, d_id in enumerate(tup_p):
-                f_c = get_agent(f.children[index], children)
-                f_c.projected_pref.append(tup_p[index])
-    # update c.all_daycare_ids
-    for c in children:
-        c_d_ids = []
-        for d_id in c.projected_pref:
-            if d_id not in c_d_ids:
-                c_d_ids.append(d_id)
-        c.all_daycare_ids = c_d_ids
-
-
-def update_daycares_attributes(children, daycares):
+        f_children = [registry.children[c_id] for c_id in f.children]
+        # update c.projected_pref, the index-th daycare of each position
+        for index, f_c in enumerate(f_children):
+            f_c.projected_pref = intern(
+                interned, tuple(tup_p[index] for tup_p in f.pref)
+            )
+    # update c.all_daycare_ids, keeping the order of first appearance
+    for c in registry.children.values():
+        c.pref = intern(interned, c.pref)
+        c.all_daycare_ids = intern(interned, tuple(dict.fromkeys(c.projected_pref)))
+
+
+def update_daycares_attributes(children, daycares, tie_tolerance=TIE_TOLERANCE):
     """
     1) update the priority ordering / score list of dummy daycare 9999
-    2) update d.priority_age_dic & d.priority_age_share_dic
+    2) update d.priority_age_dic & d.priority_age_share_dic & d.rank_index
     3）update d.total_numbers & d.total_numbers_share
+
+    children: AgentRegistry, or all children list together with all daycares list
+    tie_tolerance: relative difference of scores below which children are tied in the
+        rank indexes (see RankIndex.tie_end)
     """
+    registry = as_registry(children, daycares)
     # update dummy.priority
-    dummy = get_agent(9999, daycares)
-    for c in children:
-        if 9999 in c.projected_pref and c.id not in dummy.priority:
-            dummy.priority.append(c.id)
+    dummy = registry.daycares[9999]
+    listed = set(dummy.priority)
+    unmatched = [
+        c.id
+        for c in registry.children.values()
+        if 9999 in c.all_daycare_ids and c.id not in listed
+    ]
+    dummy.priority = dummy.priority + tuple(unmatched)
 
     # update dummy.score_list
-    dummy.score_list = [100 for x in range(len(dummy.priority))]
+    dummy.score_list = tuple(100 for x in range(len(dummy.priority)))
 
-    # update d.priority_age_dic & d.priority_age_share_dic & d.total_numbers
+    # update d.priority_age_dic & d.priority_age_share_dic & d.rank_index
     for d in daycares:
-        d.update_priority_age_dic(children)
-        d.update_priority_age_share_dic(children)
+        d.update_priority_age_dic(registry)
+        d.update_priority_age_share_dic(registry)
+        d.update_rank_index(registry, tie_tolerance)
+
+    # update d.total_numbers & d.total_numbers_share
+    transfers = {d_id: [0 for age in range(6)] for d_id in registry.daycares}
+    for c in registry.children.values():
+        transfers[c.initial_daycare][c.age] += 1
+    for d in daycares:
+        d.total_numbers, d.total_numbers_share = daycare_capacities(
+            d.recruiting_numbers, transfers[d.id], d.share_ages_list
+        )
 
-    # update d.total_numbers
-    for c in children:
-        initial = get_agent(c.initial_daycare, daycares)
-        initial.total_numbers[c.age] += 1
 
-    # update d.total_numbers_share
-    for d in daycares:
-        d.total_numbers_share = d.total_numbers
-        if len(d.all_shared_ages) > 0:
-            for ages in d.share_ages_list:
-                quota_ages = 0
-                for age in ages:
-                    quota_ages += d.total_numbers[age]
-                for age in ages:
-                    d.total_numbers_share[age] = quota_ages
+def update_families_sibling_tables(children, families):
+    """
+    build f.sibling_table of every family with siblings, once the daycares are updated
+
+    children: AgentRegistry
+    """
+    registry = as_registry(children)
+    interned = {}
+    for f in families:
+        f.update_sibling_table(registry, interned=interned)
 
 
-def create_agents(children_dic, daycares_dic, families_dic):
+def create_agent_registry(
+    children_dic, daycares_dic, families_dic, tie_tolerance=TIE_TOLERANCE
+):
     """
+    create an AgentRegistry indexing all CP_agents by id
     Don't change the order of the following functions
+
+    tie_tolerance: relative difference of scores below which children are tied
     """
     children = create_children(children_dic)
     daycares = create_daycares(daycares_dic)
     families = create_families(families_dic)
-    update_families_attributes(families)
-    update_children_attributes(children, families)
-    update_daycares_attributes(children, daycares)
-    return children, daycares, families
+    return build_agent_registry(children, daycares, families, tie_tolerance)
+
+
+def build_agent_registry(children, daycares, families, tie_tolerance=TIE_TOLERANCE):
+    """
+    index CP_agents created by create_child / create_daycare / create_family (daycares
+    including the dummy daycare) and compute their derived attributes
+    """
+    registry = AgentRegistry(children, daycares, families)
+    interned = {}
+    update_families_attributes(families, interned)
+    update_children_attributes(registry, families, interned)
+    update_daycares_attributes(registry, daycares, tie_tolerance=tie_tolerance)
+    update_families_sibling_tables(registry, families)
+    return registry
+
+
+def create_agents(
+    children_dic, daycares_dic, families_dic, tie_tolerance=TIE_TOLERANCE
+):
+    """
+    create lists of CP_agents (children, daycares, families)
+    """
+    return create_agent_registry(
+        children_dic, daycares_dic, families_dic, tie_tolerance
+    ).as_lists()
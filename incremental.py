@@ -0,0 +1,204 @@
+import logging
+import time
+
+from CP_algo import CP
+from decomposition import _family_daycares, _sub_instance, find_components
+
+logger = logging.getLogger(__name__)
+
+
+class InstanceDelta:
+    """
+    changes to an instance after a matching round
+
+    Attributes
+    ----------
+    add_children: list[dict]
+        records of new children (schema of children_dic)
+
+    add_families: list[dict]
+        records of new families (schema of families_dic), whose children are in
+        add_children or already in the instance
+
+    remove_families: list[int=Family.id]
+        withdrawn families; their children are removed from the instance and from all
+        priority lists
+
+    recruiting_numbers: dict[int=Daycare.id, list[int]]
+        new recruiting_numbers_list of daycares
+
+    priority_updates: dict[int=Daycare.id, list[(int=Child.id, score)]]
+        children (re)inserted into the priority list of a daycare with a new score, after
+        the children with the same score; new children must be inserted into the priority
+        lists of the daycares they apply to
+    """
+
+    def __init__(
+        self,
+        add_children=(),
+        add_families=(),
+        remove_families=(),
+        recruiting_numbers=None,
+        priority_updates=None,
+    ):
+        self.add_children = list(add_children)
+        self.add_families = list(add_families)
+        self.remove_families = list(remove_families)
+        self.recruiting_numbers = recruiting_numbers or {}
+        self.priority_updates = priority_updates or {}
+
+    def __str__(self):
+        return (
+            f"delta: {len(self.add_families)} families added, "
+            f"{len(self.remove_families)} removed, "
+            f"{len(self.recruiting_numbers)} capacity changes, "
+            f"{len(self.priority_updates)} priority lists edited"
+        )
+
+    def __repr__(self):
+        return self.__str__()
+
+
+def apply_delta(children_dic, daycares_dic, families_dic, delta):
+    """
+    return the instance changed by delta (InstanceDelta) without modifying the input;
+    records that do not change are shared with the input dictionaries
+    Output:
+        (children_dic, daycares_dic, families_dic), touched: set[int=Daycare.id]
+        the daycares whose priority list, capacity or applicants changed
+    """
+    touched = set()
+    children_dic = dict(children_dic)
+    families_dic = dict(families_dic)
+    removed_children = set()
+    for f_id in delta.remove_families:
+        family = families_dic.pop(f_id)
+        touched.update(_family_daycares(family, children_dic))
+        for c_id in family["children"]:
+            del children_dic[c_id]
+            removed_children.add(c_id)
+    for record in delta.add_children:
+        if record["id"] in children_dic:
+            raise ValueError(f"child {record['id']} is already in the instance")
+        children_dic[record["id"]] = record
+    for record in delta.add_families:
+        if record["id"] in families_dic:
+            raise ValueError(f"family {record['id']} is already in the instance")
+        families_dic[record["id"]] = record
+        touched.update(_family_daycares(record, children_dic))
+
+    daycares_dic = dict(daycares_dic)
+    for d_id, daycare in daycares_dic.items():
+        changed = d_id in delta.recruiting_numbers or d_id in delta.priority_updates
+        if not changed and removed_children.isdisjoint(
+            daycare["priority_child_id_list"]
+        ):
+            continue
+        daycare = dict(daycare)
+        if d_id in delta.recruiting_numbers:
+            daycare["recruiting_numbers_list"] = list(delta.recruiting_numbers[d_id])
+        priority = [
+            (c_id, score)
+            for c_id, score in zip(
+                daycare["priority_child_id_list"], daycare["priority_score_list"]
+            )
+            if c_id not in removed_children
+        ]
+        for c_id, score in delta.priority_updates.get(d_id, []):
+            priority = [item for item in priority if item[0] != c_id]
+            # after the children with the same or a higher score
+            index = 0
+            while index < len(priority) and priority[index][1] >= score:
+                index += 1
+            priority.insert(index, (c_id, score))
+        daycare["priority_child_id_list"] = [c_id for c_id, _ in priority]
+        daycare["priority_score_list"] = [score for _, score in priority]
+        daycares_dic[d_id] = daycare
+        touched.add(d_id)
+    touched.discard(9999)
+    touched.discard(None)
+    return (children_dic, daycares_dic, families_dic), touched
+
+
+def rematch(
+    children_dic,
+    daycares_dic,
+    families_dic,
+    previous,
+    delta,
+    share_bool,
+    bp_num=0,
+    solver_time=360,
+    exclude_bool=True,
+    search_depth=5,
+    solver_config=None,
+):
+    """
+    re-solve an instance after a delta, reusing the outcome of the previous run
+
+    with bp_num = 0 the connected components of the new instance (see find_components)
+    without a touched daycare or a new family are unchanged components of the previous
+    instance, so they keep their previous assignment; only the touched components are
+    built into a CP model, warm-started from the previous assignment of their children.
+    With bp_num > 0 the bound couples all components and the whole new instance is
+    re-solved with the previous assignment as a hint
+
+    Input:
+        children_dic, daycares_dic, families_dic: the instance of the previous run
+        previous: (outcome_children_dic, outcome_fp) returned by CP for that instance,
+            with an optimal (or at least stable) outcome
+        delta: InstanceDelta
+    Output:
+        instance: the new (children_dic, daycares_dic, families_dic)
+        outcome_children_dic, outcome_fp as returned by CP for the new instance
+    """
+    time_sta = time.time()
+    previous_children_dic, previous_fp = previous
+    instance, touched = apply_delta(children_dic, daycares_dic, families_dic, delta)
+    new_children_dic, new_daycares_dic, new_families_dic = instance
+    hint = {
+        c_id: outcome["CP"]
+        for c_id, outcome in previous_children_dic.items()
+        if c_id in new_children_dic
+    }
+    options = (share_bool, bp_num, solver_time, exclude_bool, search_depth)
+
+    if bp_num != 0:
+        outcome_children_dic, outcome_fp = CP(
+            *instance, *options, solver_config=solver_config, hint=hint
+        )
+        return instance, outcome_children_dic, outcome_fp
+
+    added = {record["id"] for record in delta.add_families}
+    f_ids, d_ids = [], []
+    for component_f_ids, component_d_ids in find_components(*instance):
+        if touched.isdisjoint(component_d_ids) and added.isdisjoint(component_f_ids):
+            continue
+        f_ids.extend(component_f_ids)
+        d_ids.extend(component_d_ids)
+    logger.info(
+        "%s: re-solving %d of %d families",
+        delta,
+        len(f_ids),
+        len(new_families_dic),
+    )
+    sub_children_dic, sub_fp = {}, {}
+    if len(f_ids) > 0:
+        sub_instance = _sub_instance(*instance, f_ids, d_ids)
+        sub_children_dic, sub_fp = CP(
+            *sub_instance,
+            *options,
+            solver_config=solver_config,
+            hint={c_id: d_id for c_id, d_id in hint.items() if c_id in sub_instance[0]},
+        )
+    # stitch in the order of the new dictionaries, as CP does
+    outcome_children_dic = {
+        c_id: sub_children_dic.get(c_id, previous_children_dic.get(c_id))
+        for c_id in new_children_dic
+    }
+    outcome_fp = {}
+    for f_id, family in new_families_dic.items():
+        for p in range(len(family["pref"])):
+            outcome_fp[f_id, p] = sub_fp.get((f_id, p), previous_fp.get((f_id, p)))
+    logger.info("rematch time elapsed %.3f", time.time() - time_sta)
+    return instance, outcome_children_dic, outcome_fp
@@ -0,0 +1,197 @@
+import itertools
+
+import numpy as np
+
+# sibling family sizes 2, 3, 4 in the proportions of example_data.pkl
+SIBLING_SIZES = ([2, 3, 4], [0.9, 0.08, 0.02])
+# pairs / triples of ages sharing quotas at daycares with transferable quotas
+SHARE_AGE_GROUPS = [[1, 2], [3, 4, 5], [0, 1], [4, 5]]
+
+
+def generate_instance(
+    n_children,
+    n_daycares=None,
+    sibling_ratio=0.16,
+    share_ratio=0.2,
+    pref_length=3.0,
+    tie_rate=0.25,
+    transfer_ratio=0.1,
+    capacity_ratio=0.8,
+    district_size=30,
+    max_positions=64,
+    seed=0,
+):
+    """
+    generate a random instance in the schema of example_data.pkl
+
+    daycares are grouped into districts of district_size and families apply to daycares
+    of their own district, more often to popular ones; siblings have distinct ages and
+    the same preference list; applicants who prefer to transfer list their initial
+    daycare last. Priority lists contain the children listing the daycare ordered by
+    score, siblings with the same score
+
+    Input:
+        n_children: number of children (families are created until it is reached)
+        n_daycares: number of daycares, default n_children // 18 (as in example_data.pkl)
+        sibling_ratio: fraction of children who have siblings
+        share_ratio: fraction of daycares with transferable quotas (share_ages_list)
+        pref_length: mean length of preference lists
+        tie_rate: probability that a family has the same score as the previous family
+            in a priority list
+        transfer_ratio: fraction of families who currently attend a daycare
+        capacity_ratio: total recruiting numbers / n_children
+        max_positions: maximum length of the preferences of sibling families
+        seed: seed of numpy.random.default_rng
+    Output:
+        children_dic, daycares_dic, families_dic
+    """
+    rng = np.random.default_rng(seed)
+    if n_daycares is None:
+        n_daycares = max(2, n_children // 18)
+    daycares_dic = _generate_daycares(
+        rng, n_children, n_daycares, share_ratio, capacity_ratio
+    )
+    district_size = min(district_size, n_daycares)
+    n_districts = max(1, n_daycares // district_size)
+    districts = np.array_split(np.arange(n_daycares), n_districts)
+    # popularity of each daycare within its district
+    popularity = rng.pareto(1.5, n_daycares) + 1
+    # probability that a family has siblings, so that sibling_ratio of children do
+    mean_size = np.dot(*SIBLING_SIZES)
+    sibling_family_ratio = sibling_ratio / (
+        mean_size * (1 - sibling_ratio) + sibling_ratio
+    )
+
+    children_dic = {}
+    families_dic = {}
+    while len(children_dic) < n_children:
+        k = 1
+        if rng.random() < sibling_family_ratio:
+            k = int(rng.choice(SIBLING_SIZES[0], p=SIBLING_SIZES[1]))
+        k = min(k, n_children - len(children_dic))
+        f_id = len(children_dic)
+        district = districts[rng.integers(len(districts))]
+        weights = popularity[district] / popularity[district].sum()
+        length = min(len(district), rng.geometric(1 / pref_length))
+        pref = rng.choice(district, size=length, replace=False, p=weights)
+        pref = [int(d_id) for d_id in pref]
+        initial = None
+        if rng.random() < transfer_ratio:
+            initial = int(rng.choice(district))
+            if initial in pref:
+                pref.remove(initial)
+            pref.append(initial)
+        ages = rng.choice(6, size=k, replace=False)
+        children_id_list = list(range(f_id, f_id + k))
+        for c_id, age in zip(children_id_list, ages.tolist()):
+            children_dic[c_id] = {
+                "id": c_id,
+                "age": age,
+                "family_id": f_id,
+                "initial_daycare_id": initial,
+                "actual_daycare_id": None,
+                "preference_list": list(pref),
+            }
+        families_dic[f_id] = {
+            "id": f_id,
+            "children": children_id_list,
+            "pref": _family_pref(pref, k, initial is not None, max_positions),
+        }
+
+    _generate_priorities(rng, children_dic, daycares_dic, families_dic, tie_rate)
+    return children_dic, daycares_dic, families_dic
+
+
+def _generate_daycares(rng, n_children, n_daycares, share_ratio, capacity_ratio):
+    """
+    daycares with recruiting numbers split over ages (more seats for older ages) and,
+    with probability share_ratio, one group of ages sharing quotas
+    """
+    seats = rng.multinomial(
+        int(n_children * capacity_ratio), np.full(n_daycares, 1 / n_daycares)
+    )
+    age_weights = np.array([0.5, 1.0, 1.0, 1.2, 1.2, 1.2])
+    daycares_dic = {}
+    for d_id in range(n_daycares):
+        recruiting = rng.multinomial(seats[d_id], age_weights / age_weights.sum())
+        share_ages_list = []
+        if rng.random() < share_ratio:
+            share_ages_list = [SHARE_AGE_GROUPS[rng.integers(len(SHARE_AGE_GROUPS))]]
+        daycares_dic[d_id] = {
+            "id": d_id,
+            "recruiting_numbers_list": recruiting.tolist(),
+            "share_ages_list": share_ages_list,
+            "priority_child_id_list": [],
+            "priority_score_list": [],
+        }
+    return daycares_dic
+
+
+def _family_pref(pref, k, transfer, max_positions):
+    """
+    preferences of a family whose k children share the preference list pref: all
+    children at the same daycare first, then split over daycares, then (unless the
+    family prefers to transfer) some children unmatched, truncated to max_positions
+    """
+    if k == 1:
+        return list(pref)
+    positions = [(d_id,) * k for d_id in pref]
+    for tup_p in itertools.product(pref, repeat=k):
+        if len(positions) >= max_positions:
+            return positions
+        if len(set(tup_p)) > 1:
+            positions.append(tup_p)
+    if transfer is False:
+        for tup_p in itertools.product(pref + [9999], repeat=k):
+            if len(positions) >= max_positions:
+                break
+            if 9999 in tup_p and tup_p != (9999,) * k:
+                positions.append(tup_p)
+    return positions
+
+
+def _generate_priorities(rng, children_dic, daycares_dic, families_dic, tie_rate):
+    """
+    fill in the priority lists of the daycares with the children who list them, ordered
+    by a decreasing score; families appear as blocks of siblings with the same score,
+    and the score drops by 1 between consecutive families with probability 1 - tie_rate.
+    Children who attend the daycare (initial_daycare_id) come first with the top score
+    """
+    applicants = {d_id: [] for d_id in daycares_dic}
+    for f_id, family in families_dic.items():
+        listed = set()
+        for c_id in family["children"]:
+            listed.update(children_dic[c_id]["preference_list"])
+        for d_id in listed:
+            applicants[d_id].append(f_id)
+    # global family points, perturbed at each daycare
+    points = {f_id: rng.random() for f_id in families_dic}
+    for d_id, family_ids in applicants.items():
+        incumbent = [
+            children_dic[families_dic[f_id]["children"][0]]["initial_daycare_id"]
+            == d_id
+            for f_id in family_ids
+        ]
+        noise = rng.random(len(family_ids)) * 0.5
+        order = np.argsort(
+            [
+                -(points[f_id] + e + 2 * i)
+                for f_id, e, i in zip(family_ids, noise, incumbent)
+            ]
+        )
+        drops = rng.random(len(family_ids)) >= tie_rate
+        score = int(drops.sum())
+        child_ids = []
+        scores = []
+        previous = None
+        for i, drop in zip(order.tolist(), drops.tolist()):
+            # incumbents share the top score, strictly above the other applicants
+            if previous is not None and not incumbent[i]:
+                if drop or incumbent[previous]:
+                    score -= 1
+            previous = i
+            for c_id in families_dic[family_ids[i]]["children"]:
+                child_ids.append(c_id)
+                scores.append(score)
+        daycares_dic[d_id]["priority_child_id_list"] = child_ids
+        daycares_dic[d_id]["priority_score_list"] = scores
@@ -0,0 +1,122 @@
+import json
+import os
+
+import numpy as np
+
+from problem_arrays import ProblemArrays
+
+FORMAT_VERSION = 2
+MAGIC = b"DAYCARE\0"
+# array data starts at multiples of ALIGNMENT bytes so that memmap views are aligned
+ALIGNMENT = 64
+
+
+def save_problem_arrays(problem, path):
+    """
+    write a ProblemArrays to path in the binary instance format read by load_problem_arrays
+
+    layout: MAGIC, the header length (uint64, little endian), a JSON header
+    {"version", "arrays": {name: [dtype, shape, offset]}, "share_ages_list"} and the
+    raw arrays in C order, each starting at a multiple of ALIGNMENT bytes
+    """
+    arrays = _problem_arrays(problem)
+    table = {}
+    offset = 0
+    for name, array in arrays.items():
+        offset = _align(offset)
+        table[name] = [array.dtype.str, list(array.shape), offset]
+        offset += array.nbytes
+    header = json.dumps(
+        {
+            "version": FORMAT_VERSION,
+            "arrays": table,
+            "share_ages_list": problem.share_ages_list,
+        },
+        default=int,
+    ).encode()
+    data_start = _align(len(MAGIC) + 8 + len(header))
+    with open(path + ".tmp", "wb") as fp:
+        fp.write(MAGIC)
+        fp.write(np.uint64(len(header)).tobytes())
+        fp.write(header)
+        for name, array in arrays.items():
+            fp.seek(data_start + table[name][2])
+            fp.write(np.ascontiguousarray(array).tobytes())
+    os.replace(path + ".tmp", path)
+
+
+def load_problem_arrays(path, mmap_mode="r"):
+    """
+    open a ProblemArrays written by save_problem_arrays
+
+    the arrays are numpy.memmap views of the file (mmap_mode="r"), so opening costs only
+    the id -> row dictionaries and processes opening the same file share its pages;
+    mmap_mode=None reads the arrays into memory instead
+    """
+    with open(path, "rb") as fp:
+        if fp.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a binary instance file")
+        header_length = int(np.frombuffer(fp.read(8), dtype=np.uint64)[0])
+        header = json.loads(fp.read(header_length))
+    if header["version"] != FORMAT_VERSION:
+        raise ValueError(
+            f"{path} has format version {header['version']}, expected {FORMAT_VERSION}"
+        )
+    data_start = _align(len(MAGIC) + 8 + header_length)
+    problem = ProblemArrays.__new__(ProblemArrays)
+    problem.age_priority_ptr = {}
+    problem.age_priority_child = {}
+    for name, (dtype, shape, offset) in header["arrays"].items():
+        if mmap_mode is None:
+            array = np.fromfile(
+                path, dtype=dtype, count=int(np.prod(shape)), offset=data_start + offset
+            ).reshape(shape)
+        elif int(np.prod(shape)) == 0:
+            # memmap cannot map empty arrays
+            array = np.empty(shape, dtype=dtype)
+        else:
+            array = np.memmap(
+                path,
+                dtype=dtype,
+                mode=mmap_mode,
+                offset=data_start + offset,
+                shape=tuple(shape),
+            )
+        if name.startswith("age_priority_"):
+            attribute, share = name.rsplit("_", 1)
+            getattr(problem, attribute)[share == "share"] = array
+        else:
+            setattr(problem, name, array)
+    problem.share_ages_list = header["share_ages_list"]
+    problem.child_index = {
+        c_id: row for row, c_id in enumerate(problem.child_ids.tolist())
+    }
+    problem.daycare_index = {
+        d_id: row for row, d_id in enumerate(problem.daycare_ids.tolist())
+    }
+    problem.family_index = {
+        f_id: row for row, f_id in enumerate(problem.family_ids.tolist())
+    }
+    problem._age_priority_keys = {}
+    return problem
+
+
+def _problem_arrays(problem):
+    """
+    return dict[name, np.ndarray] of the arrays of a ProblemArrays, the per-share_bool
+    dictionaries flattened to <attribute>_share / <attribute>_noshare
+    """
+    arrays = {}
+    for name, value in vars(problem).items():
+        if name.startswith("_"):
+            continue
+        if isinstance(value, np.ndarray):
+            arrays[name] = value
+        elif name in ("age_priority_ptr", "age_priority_child"):
+            arrays[f"{name}_share"] = value[True]
+            arrays[f"{name}_noshare"] = value[False]
+    return arrays
+
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
@@ -0,0 +1,446 @@
+import asyncio
+import collections
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from CP_algo import CP
+from data_loader import (
+    CHILD_FIELDS,
+    DAYCARE_FIELDS,
+    FAMILY_FIELDS,
+    instance_from_records,
+    normalize_records,
+)
+from model_cache import instance_fingerprint
+from run_report import RunReport
+from solver_config import SolverConfig
+
+# default options of a job, following CP
+JOB_DEFAULTS = {
+    "share_bool": True,
+    "bp_num": 0,
+    "solver_time": 360,
+    "exclude_bool": True,
+    "search_depth": 5,
+    "seed": 0,
+}
+
+# seconds a finished or failed job (with its result) is kept by MatchingService
+JOB_TTL = 3600
+
+# progress queue of a worker process, set by _init_worker
+_progress = None
+
+
+class Job:
+    """
+    a matching job of MatchingService
+
+    Attributes
+    ----------
+    id: str
+
+    key: str
+        hash of the instance and the options; jobs with the same key are deduplicated
+
+    status: str
+        "queued", "running", "done" or "failed"
+
+    events: list[dict]
+        intermediate solutions found so far: wall_time, objective, bound
+
+    result: dict
+        when done: CP-SAT status, matched, wall_time and the assignment
+        {str(Child.id): Daycare.id}
+
+    error: str
+        when failed
+    """
+
+    def __init__(self, job_id, key, instance, options):
+        self.id = job_id
+        self.key = key
+        self.instance = instance
+        self.options = options
+        self.status = "queued"
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.events = []
+        self.result = None
+        self.error = None
+        self.changed = asyncio.Event()
+
+    def __str__(self):
+        return f"job {self.id} ({self.status})"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def to_dict(self):
+        """
+        status of the job (without the assignment)
+        """
+        return {
+            "id": self.id,
+            "status": self.status,
+            "options": self.options,
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished,
+            "events": len(self.events),
+            "best": self.events[-1] if len(self.events) > 0 else None,
+            "error": self.error,
+        }
+
+    def notify(self):
+        # wake up the current waiters, later waiters wait for the next change
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+class MatchingService:
+    """
+    asyncio service running CP on submitted instances in a bounded process pool
+
+    submitted jobs wait in a queue until one of the processes is free; a job identical to
+    a queued, running or finished one (same instance hash and options) is not solved
+    again. Intermediate solutions of running jobs are streamed back from the worker
+    processes and can be followed with events(). Use as
+    async with MatchingService(processes=2) as service: ...
+
+    processes: number of concurrent solves
+    cores: number of cores split between processes and CP-SAT workers
+        (default: os.cpu_count())
+    job_ttl: seconds a finished or failed job is kept after it ends (default JOB_TTL);
+        expired jobs are evicted on the next request, their ids answer 404 and an
+        identical submission is solved again
+    """
+
+    def __init__(self, processes=1, cores=None, job_ttl=JOB_TTL):
+        self.processes = processes
+        cores = os.cpu_count() if cores is None else cores
+        self.num_search_workers = max(1, cores // processes)
+        self.job_ttl = job_ttl
+        self.jobs = {}
+        self.jobs_by_key = {}
+        # ended jobs in the order they ended, for evict_jobs
+        self._ended = collections.deque()
+        self._ids = itertools.count(1)
+        self._queue = None
+        self._executor = None
+        self._progress = None
+        self._tasks = []
+        self._reader = None
+
+    def __str__(self):
+        return f"matching service of {self.processes} processes, {len(self.jobs)} jobs"
+
+    def __repr__(self):
+        return self.__str__()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._progress = multiprocessing.Queue()
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.processes,
+            initializer=_init_worker,
+            initargs=(self._progress,),
+        )
+        self._tasks = [
+            asyncio.create_task(self._worker()) for _ in range(self.processes)
+        ]
+        # the progress queue is read by a thread, handing the events to the loop
+        self._reader = threading.Thread(
+            target=self._read_progress, args=(loop,), daemon=True
+        )
+        self._reader.start()
+
+    async def close(self):
+        """
+        finish the submitted jobs, then shut down the process pool
+        """
+        for _ in self._tasks:
+            await self._queue.put(None)
+        await asyncio.gather(*self._tasks)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._executor.shutdown)
+        self._progress.put(None)
+        await loop.run_in_executor(None, self._reader.join)
+
+    async def submit(self, children_dic, daycares_dic, families_dic, options=None):
+        """
+        queue a job solving the instance with options (keys of JOB_DEFAULTS)
+        Output:
+            Job (an existing one for a duplicate submission)
+        """
+        self.evict_jobs()
+        options = dict(JOB_DEFAULTS, **(options or {}))
+        unknown = set(options) - set(JOB_DEFAULTS)
+        if len(unknown) > 0:
+            raise ValueError(f"unknown options {sorted(unknown)}")
+        key = job_key(children_dic, daycares_dic, families_dic, options)
+        job = self.jobs_by_key.get(key)
+        if job is not None and job.status != "failed":
+            return job
+        job = Job(
+            str(next(self._ids)),
+            key,
+            (children_dic, daycares_dic, families_dic),
+            options,
+        )
+        self.jobs[job.id] = job
+        self.jobs_by_key[key] = job
+        await self._queue.put(job)
+        return job
+
+    def evict_jobs(self):
+        """
+        forget the jobs that ended more than job_ttl seconds ago
+        """
+        expiry = time.time() - self.job_ttl
+        while len(self._ended) > 0 and self._ended[0].finished <= expiry:
+            job = self._ended.popleft()
+            del self.jobs[job.id]
+            if self.jobs_by_key.get(job.key) is job:
+                del self.jobs_by_key[job.key]
+
+    async def wait(self, job_id):
+        """
+        wait until the job is done or failed
+        Output:
+            Job
+        """
+        job = self.jobs[job_id]
+        while job.status in ("queued", "running"):
+            await job.changed.wait()
+        return job
+
+    async def events(self, job_id):
+        """
+        asynchronous iterator over the intermediate solutions of a job, past ones first,
+        until the job ends
+        """
+        job = self.jobs[job_id]
+        sent = 0
+        while True:
+            changed = job.changed
+            while sent < len(job.events):
+                yield job.events[sent]
+                sent += 1
+            if job.status not in ("queued", "running"):
+                return
+            await changed.wait()
+
+    async def handle(self, method, path, body=None):
+        """
+        answer an HTTP-style request with (status code, JSON-serializable body):
+            POST /jobs: body {"children": [...], "daycares": [...], "families": [...],
+                "options": {...}} with records in the schema of data_loader
+            GET /jobs/<id>: status of the job
+            GET /jobs/<id>/events: intermediate solutions so far
+            GET /jobs/<id>/result: result of a finished job (409 if not finished)
+        """
+        self.evict_jobs()
+        parts = [part for part in path.split("/") if part != ""]
+        if method == "POST" and parts == ["jobs"]:
+            try:
+                instance = instance_from_records(
+                    normalize_records(body["children"], CHILD_FIELDS, "children"),
+                    normalize_records(body["daycares"], DAYCARE_FIELDS, "daycares"),
+                    normalize_records(body["families"], FAMILY_FIELDS, "families"),
+                )
+                job = await self.submit(*instance, body.get("options"))
+            except (KeyError, TypeError, ValueError) as error:
+                return 400, {"error": str(error)}
+            return 202, job.to_dict()
+        if method != "GET" or len(parts) < 2 or parts[0] != "jobs":
+            return 404, {"error": f"no route {method} {path}"}
+        job = self.jobs.get(parts[1])
+        if job is None:
+            return 404, {"error": f"no job {parts[1]}"}
+        if len(parts) == 2:
+            return 200, job.to_dict()
+        if parts[2:] == ["events"]:
+            return 200, {"events": job.events}
+        if parts[2:] == ["result"]:
+            if job.status == "failed":
+                return 500, {"error": job.error}
+            if job.status != "done":
+                return 409, {"error": f"job {job.id} is {job.status}"}
+            return 200, job.result
+        return 404, {"error": f"no route {method} {path}"}
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._queue.get()
+            if job is None:
+                return
+            job.status = "running"
+            job.started = time.time()
+            job.notify()
+            try:
+                job.result = await loop.run_in_executor(
+                    self._executor,
+                    _run_job,
+                    job.id,
+                    job.instance,
+                    job.options,
+                    self.num_search_workers,
+                )
+                # all events, including those still in the progress queue
+                job.events = job.result.pop("events")
+                job.status = "done"
+            except Exception as error:
+                job.error = f"{type(error).__name__}: {error}"
+                job.status = "failed"
+            job.finished = time.time()
+            job.instance = None
+            self._ended.append(job)
+            job.notify()
+
+    def _read_progress(self, loop):
+        while True:
+            message = self._progress.get()
+            if message is None:
+                return
+            loop.call_soon_threadsafe(self._add_event, *message)
+
+    def _add_event(self, job_id, event):
+        job = self.jobs.get(job_id)
+        if job is not None and job.status == "running":
+            job.events.append(event)
+            job.notify()
+
+
+class LocalClient:
+    """
+    in-process client of a MatchingService, sending requests through
+    MatchingService.handle with JSON-encoded bodies as an HTTP client would
+    """
+
+    def __init__(self, service):
+        self.service = service
+
+    async def request(self, method, path, body=None):
+        if body is not None:
+            body = json.loads(json.dumps(body, default=_to_json))
+        code, answer = await self.service.handle(method, path, body)
+        return code, json.loads(json.dumps(answer))
+
+    async def submit(self, children_dic, daycares_dic, families_dic, options=None):
+        """
+        submit an instance given as dictionaries
+        Output:
+            status code, job status
+        """
+        body = {
+            "children": list(children_dic.values()),
+            "daycares": list(daycares_dic.values()),
+            "families": list(families_dic.values()),
+            "options": options or {},
+        }
+        return await self.request("POST", "/jobs", body)
+
+    async def status(self, job_id):
+        return await self.request("GET", f"/jobs/{job_id}")
+
+    async def result(self, job_id):
+        """
+        wait for the job and return its result
+        """
+        await self.service.wait(job_id)
+        return await self.request("GET", f"/jobs/{job_id}/result")
+
+    async def events(self, job_id):
+        """
+        asynchronous iterator over the intermediate solutions of a job
+        """
+        async for event in self.service.events(job_id):
+            yield json.loads(json.dumps(event))
+
+
+def job_key(children_dic, daycares_dic, families_dic, options):
+    """
+    return the hash identifying a job: the instance fingerprint and the options
+    """
+    fingerprint = instance_fingerprint(
+        children_dic,
+        daycares_dic,
+        families_dic,
+        options["share_bool"],
+        options["exclude_bool"],
+        options["search_depth"],
+    )
+    h = hashlib.sha256(fingerprint.encode())
+    h.update(json.dumps(options, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+def _run_job(job_id, instance, options, num_search_workers):
+    """
+    solve a job in a worker process, sending its intermediate solutions to _progress
+    """
+
+    events = []
+
+    def on_solution(solution):
+        event = {
+            "wall_time": solution.wall_time,
+            "objective": solution.objective,
+            "bound": solution.bound,
+        }
+        events.append(event)
+        _progress.put((job_id, event))
+
+    time_sta = time.time()
+    run_report = RunReport()
+    outcome_children_dic, outcome_fp = CP(
+        *instance,
+        options["share_bool"],
+        options["bp_num"],
+        options["solver_time"],
+        options["exclude_bool"],
+        options["search_depth"],
+        solver_config=SolverConfig(
+            num_search_workers=num_search_workers, random_seed=options["seed"]
+        ),
+        run_report=run_report,
+        solution_callback=on_solution,
+    )
+    return {
+        "status": run_report.solver[-1]["status"],
+        "matched": sum(
+            outcome["CP"] != 9999 for outcome in outcome_children_dic.values()
+        ),
+        "wall_time": time.time() - time_sta,
+        "events": events,
+        "assignment": {
+            str(c_id): outcome["CP"] for c_id, outcome in outcome_children_dic.items()
+        },
+    }
+
+
+def _init_worker(progress):
+    global _progress
+    _progress = progress
+
+
+def _to_json(value):
+    # numpy integers of generated instances
+    return int(value)
@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+from ortools.sat.python import cp_model
+
+from CP_agents import TIE_TOLERANCE
+from instance_store import load_problem_arrays, save_problem_arrays
+
+CACHE_VERSION = 8
+
+
+def instance_fingerprint(
+    children_dic,
+    daycares_dic,
+    families_dic,
+    share_bool,
+    exclude_bool,
+    search_depth,
+    presolve=False,
+    shared_prefix=False,
+    alpha_encoding="sums",
+    tie_tolerance=TIE_TOLERANCE,
+):
+    """
+    return a content hash (hex string) of an instance and the parameters that shape its model
+
+    family preferences are normalized (single options as tuples, None as 9999), the
+    form create_agents reads them in, so that equivalent instances share their models
+    """
+    h = hashlib.sha256()
+    header = [CACHE_VERSION, bool(share_bool), bool(exclude_bool), search_depth]
+    if presolve is True:
+        header.append("presolve")
+    if shared_prefix is True:
+        header.append("prefix")
+    if alpha_encoding != "sums":
+        header.append(alpha_encoding)
+    if tie_tolerance != TIE_TOLERANCE:
+        header.append(tie_tolerance)
+    h.update(json.dumps(header).encode())
+    for c in children_dic.values():
+        h.update(json.dumps(c, sort_keys=True, default=_json_default).encode())
+    h.update(b"|")
+    for d in daycares_dic.values():
+        h.update(json.dumps(d, sort_keys=True, default=_json_default).encode())
+    h.update(b"|")
+    for f in families_dic.values():
+        pref = [
+            [9999 if d_id is None else d_id for d_id in tup_p]
+            if isinstance(tup_p, (tuple, list))
+            else [9999 if tup_p is None else tup_p]
+            for tup_p in f["pref"]
+        ]
+        h.update(
+            json.dumps([f["id"], f["children"], pref], default=_json_default).encode()
+        )
+    return h.hexdigest()
+
+
+class ModelCache:
+    """
+    on-disk cache of CP-SAT models keyed by instance_fingerprint
+
+    each entry is a serialized CpModelProto (<key>.pb), the variable index maps of
+    xfp, xcd and beta plus the index of the constraint sum(beta) <= bp_num (<key>.npz)
+    and the ProblemArrays of the instance in the format of instance_store (<key>.inst);
+    entries are evicted in least-recently-used order once their total size exceeds max_bytes
+    """
+
+    def __init__(self, cache_dir, max_bytes=2**30):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def __str__(self):
+        return f"model cache {self.cache_dir}"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def _paths(self, key):
+        return (
+            os.path.join(self.cache_dir, f"{key}.pb"),
+            os.path.join(self.cache_dir, f"{key}.npz"),
+            os.path.join(self.cache_dir, f"{key}.inst"),
+        )
+
+    def load(self, key):
+        """
+        return (model, problem, xfp, xcd, beta, bp_index) for key, or None if it is not
+        cached; the arrays of problem are memory-mapped from the cache
+        """
+        paths = self._paths(key)
+        if not all(os.path.exists(path) for path in paths):
+            return None
+        model_path, index_path, problem_path = paths
+        model = cp_model.CpModel()
+        with open(model_path, "rb") as fp:
+            model.Proto().ParseFromString(fp.read())
+        with np.load(index_path) as index:
+            xfp = _restore_variables(model, index["xfp_keys"], index["xfp_index"])
+            xcd = _restore_variables(model, index["xcd_keys"], index["xcd_index"])
+            beta = _restore_variables(model, index["beta_keys"], index["beta_index"])
+            bp_index = int(index["bp_index"])
+        problem = load_problem_arrays(problem_path)
+        # mark as recently used
+        for path in paths:
+            os.utime(path)
+        return model, problem, xfp, xcd, beta, bp_index
+
+    def store(self, key, model, problem, xfp, xcd, beta, bp_index):
+        """
+        store a model, its ProblemArrays and its variable index maps under key, then
+        evict old entries
+        """
+        model_path, index_path, problem_path = self._paths(key)
+        save_problem_arrays(problem, problem_path)
+        with open(model_path + ".tmp", "wb") as fp:
+            fp.write(model.Proto().SerializeToString())
+        with open(index_path + ".tmp", "wb") as fp:
+            np.savez(
+                fp,
+                xfp_keys=np.array(list(xfp.keys()), dtype=np.int64).reshape(-1, 2),
+                xfp_index=np.array([v.Index() for v in xfp.values()], dtype=np.int64),
+                xcd_keys=np.array(list(xcd.keys()), dtype=np.int64).reshape(-1, 2),
+                xcd_index=np.array([v.Index() for v in xcd.values()], dtype=np.int64),
+                beta_keys=np.array(list(beta.keys()), dtype=np.int64).reshape(-1, 2),
+                beta_index=np.array([v.Index() for v in beta.values()], dtype=np.int64),
+                bp_index=np.array(bp_index, dtype=np.int64),
+            )
+        os.replace(model_path + ".tmp", model_path)
+        os.replace(index_path + ".tmp", index_path)
+        self.evict(keep=key)
+
+    def evict(self, keep=None):
+        """
+        remove least recently used entries (except keep) until the cache fits in max_bytes
+        """
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".pb"):
+                continue
+            key = name[: -len(".pb")]
+            paths = self._paths(key)
+            if not all(os.path.exists(path) for path in paths[1:]):
+                continue
+            size = sum(os.path.getsize(path) for path in paths)
+            entries.append((os.path.getmtime(paths[0]), key, size))
+            total += size
+        for _, key, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            for path in self._paths(key):
+                os.remove(path)
+            total -= size
+
+    def size(self):
+        """
+        return the total size of the cache in bytes
+        """
+        return sum(
+            os.path.getsize(os.path.join(self.cache_dir, name))
+            for name in os.listdir(self.cache_dir)
+            if name.endswith((".pb", ".npz", ".inst"))
+        )
+
+
+def _json_default(value):
+    """
+    serialize NumPy scalars and arrays found in instance dictionaries
+    """
+    if isinstance(value, (np.generic, np.ndarray)):
+        return value.tolist()
+    raise TypeError(f"cannot fingerprint {type(value).__name__}")
+
+
+def _restore_variables(model, keys, indices):
+    """
+    return dict[tuple, IntVar] referencing the Boolean variables at indices of model
+    """
+    return {
+        tuple(key): model.GetBoolVarFromProtoIndex(index)
+        for key, index in zip(keys.tolist(), indices.tolist())
+    }
@@ -0,0 +1,53 @@
+class PrefixOccupancy:
+    """
+    prefix occupancy variables of the priority lists of daycares, shared by all gamma
+    constraints of create_model
+
+    occupancy(d, index, pos) is an integer variable equal to
+    sum(xcd[c_id, d.id] for c_id in index.ids[:pos]); the variables of one priority list
+    are created on demand as the chain occ[k] = occ[k - 1] + xcd[index.ids[k - 1], d.id]
+    up to the largest position requested, so the model grows with the length of the
+    priority lists instead of with families x positions x daycares x ages
+
+    Attributes
+    ----------
+    chains: dict[RankIndex, list[IntVar]]
+        occ[1 ..] of each priority list, keyed by its RankIndex; ages with equal priority
+        lists share one RankIndex (see build_rank_index), hence one chain, while
+        overlapping groups of share_ages_list give different lists different chains
+    """
+
+    def __init__(self, model, xcd):
+        self.model = model
+        self.xcd = xcd
+        self.chains = {}
+
+    def __str__(self):
+        return (
+            f"prefix occupancy of {len(self.chains)} priority lists, "
+            f"{self.number_of_variables()} variables"
+        )
+
+    def __repr__(self):
+        return self.__str__()
+
+    def occupancy(self, d, index, pos):
+        """
+        return the number of children assigned to d among index.ids[:pos], where index is
+        a RankIndex of d
+        """
+        if pos == 0:
+            return 0
+        chain = self.chains.setdefault(index, [])
+        while len(chain) < pos:
+            c_id = int(index.ids[len(chain)])
+            previous = chain[-1] if len(chain) > 0 else 0
+            occ = self.model.NewIntVar(
+                0, len(chain) + 1, f"occ_[{d.id}, {len(chain) + 1}]"
+            )
+            self.model.Add(occ == previous + self.xcd[c_id, d.id])
+            chain.append(occ)
+        return chain[pos - 1]
+
+    def number_of_variables(self):
+        return sum(len(chain) for chain in self.chains.values())
@@ -0,0 +1,80 @@
+import numpy as np
+from stability import _related_ages
+
+
+class PresolveReport:
+    """
+    result of create_presolve_report, filled in further by create_model while building the model
+
+    Attributes
+    ----------
+    unreachable: set[(Family.id, position)]
+        positions that can never be assigned: for some daycare d in D(f, p) and age g, the
+        siblings of f counted in the quota of (d, g) already exceed capacity[d, g]
+
+    fixed_gamma: int
+        number of gamma_fpdg / gamma_fpd / gamma_fp replaced by constants 0 / 1
+
+    variables_removed, constraints_removed: int
+        number of variables and constraints not created compared with the model without presolve
+    """
+
+    def __init__(self, unreachable):
+        self.unreachable = unreachable
+        self.fixed_gamma = 0
+        self.variables_removed = 0
+        self.constraints_removed = 0
+
+    def __str__(self):
+        return (
+            f"presolve: {len(self.unreachable)} unreachable positions, "
+            f"{self.fixed_gamma} fixed gamma, "
+            f"{self.variables_removed} variables and "
+            f"{self.constraints_removed} constraints removed"
+        )
+
+    def __repr__(self):
+        return self.__str__()
+
+    def remove(self, variables, constraints):
+        self.variables_removed += variables
+        self.constraints_removed += constraints
+
+
+def create_presolve_report(problem, share_bool):
+    """
+    find the positions that can never be assigned under the daycare feasibility constraints
+
+    Input:
+        problem: ProblemArrays
+        share_bool: whether priorities / quotas are shared within age groups
+    Output:
+        PresolveReport
+    """
+    n_daycares = len(problem.daycare_ids)
+    pref_ptr = problem.pref_ptr
+    n_positions = len(pref_ptr) - 1
+    entry_pos = np.repeat(np.arange(n_positions), np.diff(pref_ptr))
+    entry_child = problem.pref_child.astype(np.int64)
+    entry_daycare = problem.pref_daycare.astype(np.int64)
+    entry_age = problem.child_age[entry_child].astype(np.int64)
+    # a sibling counts toward the quota of (d, g) iff it is in the priority list of (d, g)
+    related = _related_ages(problem, share_bool)[entry_daycare, entry_age]
+    e, g = np.nonzero(related)
+    seg = entry_daycare[e] * 6 + g
+    listed = problem.age_priority_rank(share_bool, seg, entry_child[e]) >= 0
+    group_keys, number = np.unique(
+        entry_pos[e[listed]] * (n_daycares * 6) + seg[listed], return_counts=True
+    )
+    group_seg = group_keys % (n_daycares * 6)
+    capacity = problem.capacity(share_bool).reshape(n_daycares * 6)
+    full = number > capacity[group_seg]
+    unreachable_pos = np.unique(group_keys[full] // (n_daycares * 6))
+
+    pos_family = np.repeat(
+        np.arange(len(problem.family_ids)), np.diff(problem.family_pos_ptr)
+    )
+    families = pos_family[unreachable_pos]
+    positions = unreachable_pos - problem.family_pos_ptr[families]
+    unreachable = set(zip(problem.family_ids[families].tolist(), positions.tolist()))
+    return PresolveReport(unreachable)
@@ -0,0 +1,437 @@
+import numpy as np
+
+DUMMY_ID = 9999
+
+
+class ProblemArrays:
+    """
+    compact array-backed representation of an instance, compiled once from
+    (children_dic, daycares_dic, families_dic)
+
+    child / daycare / family ids are mapped to rows 0..n-1 in dictionary order;
+    the dummy daycare 9999 is always the last daycare row
+
+    --------------------
+    Children
+    --------------------
+    child_ids: np.ndarray[int64] (children,)
+
+    child_age: np.ndarray[int8] (children,)
+
+    child_family: np.ndarray[int32] (children,)
+        family row, -1 for children without a family in families_dic
+
+    child_initial_daycare / child_actual_daycare: np.ndarray[int32] (children,)
+        daycare row
+
+    --------------------
+    Daycares
+    --------------------
+    daycare_ids: np.ndarray[int64] (daycares,)
+
+    priority_ptr, priority_child, priority_score:
+        CSR priority list of each daycare (child rows and scores)
+
+    age_priority_ptr, age_priority_child: dict[bool, np.ndarray]
+        CSR priority list of each (daycare, age), corresponding to
+        d.priority_age_share_dic (True) / d.priority_age_dic (False);
+        the list of (d, g) is age_priority_child[s][ptr[d * 6 + g] : ptr[d * 6 + g + 1]]
+
+    recruiting_numbers: np.ndarray[int64] (daycares, 6)
+        d.recruiting_numbers by age
+
+    share_ages_list: list[list[list[int]]]
+        d.share_ages_list of each daycare
+
+    total_numbers, total_numbers_share: np.ndarray[int64] (daycares, 6)
+        capacities by age, identical to d.total_numbers / d.total_numbers_share
+
+    --------------------
+    Families
+    --------------------
+    family_ids: np.ndarray[int64] (families,)
+
+    family_child_ptr, family_child:
+        CSR children (rows) of each family in the order of f.children
+
+    family_pos_ptr: np.ndarray[int64] (families + 1,)
+        positions of family f are family_pos_ptr[f] .. family_pos_ptr[f + 1] - 1
+
+    pref_ptr, pref_daycare:
+        CSR preference tuple (daycare rows, one per sibling) of each position
+
+    pref_child: np.ndarray[int32]
+        child row of each entry of pref_daycare, i.e. (pref_child, pref_daycare)
+        enumerates the projected preferences of all children
+    """
+
+    def __init__(self, children_dic, daycares_dic, families_dic):
+        self._create_children(children_dic)
+        self._create_families(families_dic)
+        self._create_daycares(daycares_dic)
+        self._create_capacities(daycares_dic)
+        self._create_age_priorities(daycares_dic)
+
+    def __str__(self):
+        return (
+            f"problem of {len(self.child_ids)} children, "
+            f"{len(self.daycare_ids)} daycares, {len(self.family_ids)} families"
+        )
+
+    def __repr__(self):
+        return self.__str__()
+
+    def _create_children(self, children_dic):
+        n = len(children_dic)
+        self.child_ids = np.empty(n, dtype=np.int64)
+        self.child_age = np.empty(n, dtype=np.int8)
+        self._child_family_ids = np.empty(n, dtype=np.int64)
+        self._child_initial_ids = np.empty(n, dtype=np.int64)
+        self._child_actual_ids = np.empty(n, dtype=np.int64)
+        for row, child in enumerate(children_dic.values()):
+            self.child_ids[row] = child["id"]
+            self.child_age[row] = child["age"]
+            family_id = child["family_id"]
+            self._child_family_ids[row] = (
+                child["id"] if family_id is None else family_id
+            )
+            initial = child["initial_daycare_id"]
+            actual = child["actual_daycare_id"]
+            self._child_initial_ids[row] = DUMMY_ID if initial is None else initial
+            self._child_actual_ids[row] = DUMMY_ID if actual is None else actual
+        self.child_index = {
+            c_id: row for row, c_id in enumerate(self.child_ids.tolist())
+        }
+
+    def _create_families(self, families_dic):
+        n = len(families_dic)
+        self.family_ids = np.empty(n, dtype=np.int64)
+        family_child_ptr = [0]
+        family_child = []
+        family_pos_ptr = [0]
+        pref_ptr = [0]
+        pref_daycare_ids = []
+        pref_child = []
+        for row, family in enumerate(families_dic.values()):
+            self.family_ids[row] = family["id"]
+            children_id_list = family["children"]
+            children_rows = [self.child_index[c_id] for c_id in children_id_list]
+            family_child.extend(children_rows)
+            family_child_ptr.append(len(family_child))
+            has_siblings = len(children_id_list) > 1
+            for tup_p in family["pref"]:
+                if has_siblings is False:
+                    tup_p = (tup_p,)
+                pref_daycare_ids.extend(
+                    DUMMY_ID if d_id is None else d_id for d_id in tup_p
+                )
+                pref_child.extend(children_rows)
+                pref_ptr.append(len(pref_daycare_ids))
+            family_pos_ptr.append(len(pref_ptr) - 1)
+        self.family_index = {
+            f_id: row for row, f_id in enumerate(self.family_ids.tolist())
+        }
+        self.family_child_ptr = np.array(family_child_ptr, dtype=np.int64)
+        self.family_child = np.array(family_child, dtype=np.int32)
+        self.family_pos_ptr = np.array(family_pos_ptr, dtype=np.int64)
+        self.pref_ptr = np.array(pref_ptr, dtype=np.int64)
+        self._pref_daycare_ids = np.array(pref_daycare_ids, dtype=np.int64)
+        self.pref_child = np.array(pref_child, dtype=np.int32)
+        self.child_family = np.array(
+            [
+                self.family_index.get(f_id, -1)
+                for f_id in self._child_family_ids.tolist()
+            ],
+            dtype=np.int32,
+        )
+        del self._child_family_ids
+
+    def _create_daycares(self, daycares_dic):
+        self.daycare_ids = np.array(
+            [daycare["id"] for daycare in daycares_dic.values()] + [DUMMY_ID],
+            dtype=np.int64,
+        )
+        self.daycare_index = {
+            d_id: row for row, d_id in enumerate(self.daycare_ids.tolist())
+        }
+        daycare_index = self.daycare_index
+        self.pref_daycare = np.array(
+            [daycare_index[d_id] for d_id in self._pref_daycare_ids.tolist()],
+            dtype=np.int32,
+        )
+        self.child_initial_daycare = np.array(
+            [daycare_index[d_id] for d_id in self._child_initial_ids.tolist()],
+            dtype=np.int32,
+        )
+        self.child_actual_daycare = np.array(
+            [daycare_index.get(d_id, -1) for d_id in self._child_actual_ids.tolist()],
+            dtype=np.int32,
+        )
+        del self._pref_daycare_ids, self._child_initial_ids, self._child_actual_ids
+        # priority lists; the dummy daycare ranks every child who lists 9999
+        priority_ptr = [0]
+        priority_child = []
+        priority_score = []
+        for daycare in daycares_dic.values():
+            priority_child.extend(
+                self.child_index[c_id] for c_id in daycare["priority_child_id_list"]
+            )
+            priority_score.extend(daycare["priority_score_list"])
+            priority_ptr.append(len(priority_child))
+        dummy_row = len(self.daycare_ids) - 1
+        dummy_children = np.zeros(len(self.child_ids), dtype=bool)
+        dummy_children[self.pref_child[self.pref_daycare == dummy_row]] = True
+        dummy_priority = np.flatnonzero(dummy_children)
+        priority_child.extend(dummy_priority.tolist())
+        priority_score.extend(100 for _ in range(len(dummy_priority)))
+        priority_ptr.append(len(priority_child))
+        self.priority_ptr = np.array(priority_ptr, dtype=np.int64)
+        self.priority_child = np.array(priority_child, dtype=np.int32)
+        self.priority_score = np.array(priority_score, dtype=np.float64)
+
+    def _create_capacities(self, daycares_dic):
+        n = len(self.daycare_ids)
+        self.recruiting_numbers = np.empty((n, 6), dtype=np.int64)
+        for row, daycare in enumerate(daycares_dic.values()):
+            self.recruiting_numbers[row] = daycare["recruiting_numbers_list"]
+        self.recruiting_numbers[n - 1] = DUMMY_ID
+        # children who prefer transfers keep their seat at their initial daycare
+        transfers = np.zeros((n, 6), dtype=np.int64)
+        np.add.at(transfers, (self.child_initial_daycare, self.child_age), 1)
+        self.share_ages_list = [
+            daycare["share_ages_list"] or [] for daycare in daycares_dic.values()
+        ] + [[]]
+        self.total_numbers = np.empty((n, 6), dtype=np.int64)
+        self.total_numbers_share = np.empty((n, 6), dtype=np.int64)
+        rows = zip(
+            self.recruiting_numbers.tolist(), transfers.tolist(), self.share_ages_list
+        )
+        for row, (recruiting, transfer, share_ages_list) in enumerate(rows):
+            total_numbers, total_numbers_share = daycare_capacities(
+                recruiting, transfer, share_ages_list
+            )
+            self.total_numbers[row] = total_numbers
+            self.total_numbers_share[row] = total_numbers_share
+
+    def _create_age_priorities(self, daycares_dic):
+        self.age_priority_ptr = {}
+        self.age_priority_child = {}
+        for share_bool in (True, False):
+            ptr = [0]
+            child = []
+            child_age = self.child_age.tolist()
+            for row, share_ages_list in enumerate(self.share_ages_list):
+                priority = self.priority_child[
+                    self.priority_ptr[row] : self.priority_ptr[row + 1]
+                ].tolist()
+                related_ages = {age: [age] for age in range(6)}
+                if share_bool is True:
+                    for ages in share_ages_list:
+                        for age in ages:
+                            related_ages[age] = ages
+                by_age = {age: {} for age in range(6)}
+                for c in priority:
+                    # group ages the child counts toward, deduplicated in priority order
+                    for age in related_ages[child_age[c]]:
+                        by_age[age].setdefault(c, None)
+                for age in range(6):
+                    child.extend(by_age[age])
+                    ptr.append(len(child))
+            self.age_priority_ptr[share_bool] = np.array(ptr, dtype=np.int64)
+            self.age_priority_child[share_bool] = np.array(child, dtype=np.int32)
+        # sorted (segment, child) keys of age_priority_rank, built on first use
+        self._age_priority_keys = {}
+
+    def capacity(self, share_bool):
+        """
+        return the (daycares, 6) capacity matrix used under share_bool
+        """
+        return self.total_numbers_share if share_bool is True else self.total_numbers
+
+    def age_priority(self, d_row, age, share_bool):
+        """
+        return the priority list (child rows) of daycare d_row for the given age
+        """
+        ptr = self.age_priority_ptr[share_bool]
+        return self.age_priority_child[share_bool][
+            ptr[d_row * 6 + age] : ptr[d_row * 6 + age + 1]
+        ]
+
+    def age_priority_rank(self, share_bool, segments, children):
+        """
+        return the flat position of each child (row) in the priority list of each
+        segment d * 6 + g, i.e. an index into age_priority_child[share_bool] (-1 if absent)
+        """
+        if share_bool not in self._age_priority_keys:
+            ptr = self.age_priority_ptr[share_bool]
+            lists = self.age_priority_child[share_bool]
+            seg = np.repeat(np.arange(len(ptr) - 1), np.diff(ptr))
+            keys = seg * len(self.child_ids) + lists
+            order = np.argsort(keys, kind="stable")
+            self._age_priority_keys[share_bool] = (keys[order], order)
+        sorted_keys, order = self._age_priority_keys[share_bool]
+        query = np.asarray(segments, dtype=np.int64) * len(self.child_ids) + children
+        if len(sorted_keys) == 0:
+            return np.full(len(query), -1, dtype=np.int64)
+        i = np.minimum(np.searchsorted(sorted_keys, query), len(sorted_keys) - 1)
+        return np.where(sorted_keys[i] == query, order[i], -1)
+
+    def family_children(self, f_row):
+        """
+        return the children (rows) of family f_row
+        """
+        return self.family_child[
+            self.family_child_ptr[f_row] : self.family_child_ptr[f_row + 1]
+        ]
+
+    def family_pref(self, f_row):
+        """
+        return the preference tuples of family f_row as a (positions, siblings) matrix of daycare rows
+        """
+        start = self.pref_ptr[self.family_pos_ptr[f_row]]
+        end = self.pref_ptr[self.family_pos_ptr[f_row + 1]]
+        k = self.family_child_ptr[f_row + 1] - self.family_child_ptr[f_row]
+        return self.pref_daycare[start:end].reshape(-1, k)
+
+    def transfer_families(self):
+        """
+        return a boolean array over family rows: True if some child prefers to transfer
+        """
+        transfer = np.zeros(len(self.family_ids), dtype=bool)
+        dummy_row = len(self.daycare_ids) - 1
+        has_family = self.child_family >= 0
+        transfer[
+            self.child_family[has_family & (self.child_initial_daycare != dummy_row)]
+        ] = True
+        return transfer
+
+    def family_assignment(self, outcome_fp):
+        """
+        return the assigned position of each family row (number of positions if unmatched)
+        from outcome_fp: dict[(Family.id, position), 0 / 1]
+        """
+        n_pos = np.diff(self.family_pos_ptr)
+        assignment = n_pos.copy()
+        family_index = self.family_index
+        for (f_id, p), x in outcome_fp.items():
+            if x == 1:
+                assignment[family_index[f_id]] = p
+        return assignment
+
+    def assigned_daycares(self, assignment):
+        """
+        return the assigned daycare row of each child row (-1 if unmatched)
+        from the family assignment returned by family_assignment
+        """
+        pos_ptr = self.family_pos_ptr
+        matched = np.flatnonzero(assignment < np.diff(pos_ptr))
+        position = pos_ptr[matched] + assignment[matched]
+        entries = concat_ranges(self.pref_ptr[position], self.pref_ptr[position + 1])
+        child_assigned = np.full(len(self.child_ids), -1, dtype=np.int64)
+        child_assigned[self.pref_child[entries]] = self.pref_daycare[entries]
+        return child_assigned
+
+    def outcome_fp_from_assignment(self, assignment):
+        """
+        return outcome_fp: dict[(Family.id, position), 0 / 1] selecting for each family the
+        first position whose tuple equals the daycares of its children in assignment
+        (dict[Child.id, Daycare.id], 9999 or None for unmatched); families without such
+        a position, or with a child missing from assignment, are unmatched
+        """
+        daycare_index = self.daycare_index
+        dummy_row = len(self.daycare_ids) - 1
+        target = np.full(len(self.child_ids), -2, dtype=np.int64)
+        for c_id, d_id in assignment.items():
+            row = self.child_index.get(c_id)
+            if row is None:
+                continue
+            target[row] = dummy_row if d_id is None else daycare_index.get(d_id, -2)
+        # a position matches iff all of its entries match
+        n_positions = len(self.pref_ptr) - 1
+        entry_pos = np.repeat(np.arange(n_positions), np.diff(self.pref_ptr))
+        mismatch = self.pref_daycare != target[self.pref_child]
+        match = np.bincount(entry_pos[mismatch], minlength=n_positions) == 0
+        pos_ptr = self.family_pos_ptr
+        pos_family = np.repeat(np.arange(len(self.family_ids)), np.diff(pos_ptr))
+        # first matching position of each family
+        first = np.full(len(self.family_ids), n_positions, dtype=np.int64)
+        np.minimum.at(first, pos_family[match], np.flatnonzero(match))
+        outcome_fp = {}
+        for f_row, f_id in enumerate(self.family_ids.tolist()):
+            for p in range(pos_ptr[f_row + 1] - pos_ptr[f_row]):
+                outcome_fp[f_id, p] = int(pos_ptr[f_row] + p == first[f_row])
+        return outcome_fp
+
+    def outcome_children_dic(self, outcome_fp):
+        """
+        return dict[Child.id, {"CP": Daycare.id}] for outcome_fp, 9999 for unmatched children
+        """
+        child_assigned = self.assigned_daycares(self.family_assignment(outcome_fp))
+        assigned_ids = np.where(
+            child_assigned >= 0, self.daycare_ids[child_assigned], DUMMY_ID
+        )
+        return {
+            c_id: {"CP": d_id}
+            for c_id, d_id in zip(self.child_ids.tolist(), assigned_ids.tolist())
+        }
+
+    @property
+    def nbytes(self):
+        """
+        total size of all arrays in bytes (excluding the id -> row dictionaries)
+        """
+        total = 0
+        for value in self.__dict__.values():
+            if isinstance(value, np.ndarray):
+                total += value.nbytes
+            elif isinstance(value, dict):
+                total += sum(
+                    v.nbytes for v in value.values() if isinstance(v, np.ndarray)
+                )
+        return total
+
+
+def daycare_capacities(recruiting_numbers, transfers, share_ages_list):
+    """
+    return the capacities by age of one daycare, shared by CP_Daycare and ProblemArrays
+
+    Input:
+        recruiting_numbers: recruiting numbers by age
+        transfers: number of children by age whose initial daycare it is (they keep
+            their seat while applying for a transfer)
+        share_ages_list: groups of ages sharing their quotas (None for no groups)
+    Output:
+        total_numbers: tuple[int], recruiting_numbers plus transfers, the capacities
+            with share_bool=False
+        total_numbers_share: tuple[int], total_numbers summed over each group of ages
+            in turn, the capacities with share_bool=True
+    """
+    total_numbers = tuple(x + y for x, y in zip(recruiting_numbers, transfers))
+    total_numbers_share = list(total_numbers)
+    for ages in share_ages_list or ():
+        quota_ages = sum(total_numbers_share[age] for age in ages)
+        for age in ages:
+            total_numbers_share[age] = quota_ages
+    return total_numbers, tuple(total_numbers_share)
+
+
+def concat_ranges(starts, ends):
+    """
+    concatenate np.arange(s, e) for all (s, e) in zip(starts, ends)
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    lengths = np.asarray(ends, dtype=np.int64) - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    offsets = np.repeat(
+        starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths
+    )
+    return offsets + np.arange(total)
+
+
+def create_problem_arrays(children_dic, daycares_dic, families_dic):
+    """
+    compile the dictionaries of an instance into a ProblemArrays
+    """
+    return ProblemArrays(children_dic, daycares_dic, families_dic)
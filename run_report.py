@@ -0,0 +1,142 @@
+import contextlib
+import json
+import logging
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+from ortools.sat.python import cp_model
+
+logger = logging.getLogger(__name__)
+
+
+class RunReport:
+    """
+    instrumentation of one run of CP, filled in by the functions it is passed to
+
+    Attributes
+    ----------
+    phases: dict[str, dict]
+        for each phase in the order it started: "wall" and "cpu" time (seconds) and
+        "peak_rss" (peak resident memory of the process in bytes at the end of the phase);
+        phases given the model also record the "variables" and "constraints" they created.
+        A phase run several times (e.g. solve in CP_sweep) accumulates its times and counts
+
+    solver: list[dict]
+        CP-SAT response statistics of each solve: status, objective, bound, gap, branches,
+        conflicts, wall_time, user_time
+
+    json_path: str (optional)
+        where write_json writes the report
+    """
+
+    def __init__(self, json_path=None):
+        self.phases = {}
+        self.solver = []
+        self.json_path = json_path
+
+    def __str__(self):
+        lines = ["run report"]
+        for name, stats in self.phases.items():
+            line = f"  {name}: {stats['wall']:.3f} s wall, {stats['cpu']:.3f} s cpu"
+            if "variables" in stats:
+                line += (
+                    f", {stats['variables']} variables, "
+                    f"{stats['constraints']} constraints"
+                )
+            lines.append(line)
+        for stats in self.solver:
+            lines.append(
+                f"  solver: {stats['status']}, objective {stats['objective']}, "
+                f"bound {stats['bound']}, {stats['branches']} branches, "
+                f"{stats['conflicts']} conflicts"
+            )
+        return "\n".join(lines)
+
+    def __repr__(self):
+        return self.__str__()
+
+    @contextlib.contextmanager
+    def phase(self, name, model=None):
+        """
+        context manager timing the enclosed code as phase name; if model (CpModel) is
+        given, the variables and constraints added to it are counted
+        """
+        if model is not None:
+            proto = model.Proto()
+            n_variables, n_constraints = len(proto.variables), len(proto.constraints)
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            stats = self.phases.setdefault(name, {"wall": 0.0, "cpu": 0.0})
+            stats["wall"] += time.perf_counter() - wall
+            stats["cpu"] += time.process_time() - cpu
+            stats["peak_rss"] = peak_rss()
+            if model is not None:
+                stats["variables"] = (
+                    stats.get("variables", 0) + len(proto.variables) - n_variables
+                )
+                stats["constraints"] = (
+                    stats.get("constraints", 0) + len(proto.constraints) - n_constraints
+                )
+            logger.debug("%s: %.3f s", name, stats["wall"])
+
+    def add_solver(self, solver, status):
+        """
+        record the response statistics of a CpSolver after Solve returned status
+        """
+        solution = status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+        objective = solver.ObjectiveValue() if solution else None
+        bound = solver.BestObjectiveBound()
+        self.solver.append(
+            {
+                "status": solver.StatusName(status),
+                "objective": objective,
+                "bound": bound,
+                "gap": (
+                    abs(bound - objective) / max(1.0, abs(objective))
+                    if solution
+                    else None
+                ),
+                "branches": solver.NumBranches(),
+                "conflicts": solver.NumConflicts(),
+                "wall_time": solver.WallTime(),
+                "user_time": solver.UserTime(),
+            }
+        )
+
+    def to_dict(self):
+        return {"phases": self.phases, "solver": self.solver}
+
+    def write_json(self, path=None):
+        """
+        write the report as JSON to path (default json_path)
+        """
+        path = self.json_path if path is None else path
+        with open(path, "w") as fp:
+            json.dump(self.to_dict(), fp, indent=2)
+
+
+def phase(run_report, name, model=None):
+    """
+    run_report.phase(name, model), or a context manager doing nothing if run_report is None
+    """
+    if run_report is None:
+        return contextlib.nullcontext()
+    return run_report.phase(name, model)
+
+
+def peak_rss():
+    """
+    return the peak resident memory of the process in bytes (None if unknown)
+    """
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, in kilobytes elsewhere
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
@@ -0,0 +1,206 @@
+import copy
+import json
+import logging
+import os
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from ortools.sat.python import cp_model
+
+from CP_algo import load_or_create_model, solve_model
+from solver_config import SolverConfig
+
+logger = logging.getLogger(__name__)
+
+# default values of a scenario spec, following CP
+SCENARIO_DEFAULTS = {
+    "share_bool": True,
+    "bp_num": 0,
+    "solver_time": 360,
+    "exclude_bool": True,
+    "search_depth": 5,
+    "recruiting_numbers": None,
+    "seed": None,
+}
+
+# instance shared by the scenarios of one worker process, set by _init_worker
+_instance = None
+
+
+def run_scenarios(
+    children_dic,
+    daycares_dic,
+    families_dic,
+    scenarios,
+    output_path,
+    processes=None,
+    cores=None,
+    resume=True,
+):
+    """
+    solve variants of one instance in parallel and stream the results to a JSONL file
+
+    Input:
+        scenarios: list[dict], each with a unique "name" and optionally the keys of
+            SCENARIO_DEFAULTS; "recruiting_numbers" maps Daycare.id to a list of 6
+            capacities replacing recruiting_numbers_list, "seed" is the CP-SAT
+            random_seed (default: derived from the name)
+        output_path: JSONL file, one line per finished scenario
+        processes: number of concurrent solves (default: cores // 8, at least 1)
+        cores: number of cores to split between processes and CP-SAT workers
+            (default: os.cpu_count())
+        resume: skip scenarios whose name already has a result in output_path, except
+            failed ones (status "ERROR"), which are run again
+    Output:
+        list of result dictionaries (previous results first when resuming); a scenario
+        raising an exception gets a result with status "ERROR" and the exception in
+        "error", without stopping the other scenarios
+    """
+    names = [spec["name"] for spec in scenarios]
+    if len(set(names)) != len(names):
+        raise ValueError("scenario names must be unique")
+    results = []
+    if resume is True:
+        results = [
+            result
+            for result in load_results(output_path)
+            if result["status"] != "ERROR"
+        ]
+    done = {result["name"] for result in results}
+    pending = [spec for spec in scenarios if spec["name"] not in done]
+    if len(pending) == 0:
+        return results
+
+    cores = os.cpu_count() if cores is None else cores
+    if processes is None:
+        processes = max(1, cores // 8)
+    processes = min(processes, len(pending))
+    num_search_workers = max(1, cores // processes)
+
+    # rewrite the previous results without a truncated last line (or failed results)
+    # into a temporary file replacing output_path, so that a crash leaves them intact
+    temporary_path = output_path + ".tmp"
+    with open(temporary_path, "w") as out:
+        for result in results:
+            out.write(json.dumps(result) + "\n")
+    os.replace(temporary_path, output_path)
+
+    with open(output_path, "a") as out, ProcessPoolExecutor(
+        max_workers=processes,
+        initializer=_init_worker,
+        initargs=(children_dic, daycares_dic, families_dic),
+    ) as executor:
+        futures = {
+            executor.submit(run_scenario, spec, num_search_workers): spec
+            for spec in pending
+        }
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as error:
+                logger.exception("scenario %s failed", futures[future]["name"])
+                result = failed_result(futures[future], error)
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            results.append(result)
+    return results
+
+
+def run_scenario(spec, num_search_workers=8, instance=None):
+    """
+    solve one scenario spec on instance (default: the instance of this worker process)
+    Output:
+        dict with the spec, CP-SAT status, number of matched children, wall time and
+        the assignment {Child.id: Daycare.id}
+    """
+    children_dic, daycares_dic, families_dic = (
+        _instance if instance is None else instance
+    )
+    params = dict(SCENARIO_DEFAULTS)
+    params.update(spec)
+    seed = params["seed"]
+    if seed is None:
+        seed = scenario_seed(spec["name"])
+    if params["recruiting_numbers"] is not None:
+        daycares_dic = copy.deepcopy(daycares_dic)
+        for d_id, numbers in params["recruiting_numbers"].items():
+            daycares_dic[int(d_id)]["recruiting_numbers_list"] = list(numbers)
+
+    time_sta = time.time()
+    model, problem, xfp, xcd, beta, bp_index = load_or_create_model(
+        children_dic,
+        daycares_dic,
+        families_dic,
+        params["share_bool"],
+        params["bp_num"],
+        params["exclude_bool"],
+        params["search_depth"],
+    )
+    solver, status, solve_time = solve_model(
+        model,
+        params["solver_time"],
+        SolverConfig(num_search_workers=num_search_workers, random_seed=seed),
+    )
+    assignment = None
+    matched = None
+    if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        outcome_fp = {f_p: solver.Value(x) for f_p, x in xfp.items()}
+        outcome_children_dic = problem.outcome_children_dic(outcome_fp)
+        assignment = {
+            str(c_id): outcome["CP"] for c_id, outcome in outcome_children_dic.items()
+        }
+        matched = int(round(solver.ObjectiveValue()))
+    return {
+        "name": spec["name"],
+        "spec": spec,
+        "seed": seed,
+        "num_search_workers": num_search_workers,
+        "status": solver.StatusName(status),
+        "matched": matched,
+        "solve_time": solve_time,
+        "wall_time": time.time() - time_sta,
+        "assignment": assignment,
+    }
+
+
+def failed_result(spec, error):
+    """
+    return the result recorded for a scenario spec whose run raised error
+    """
+    return {
+        "name": spec["name"],
+        "spec": spec,
+        "status": "ERROR",
+        "error": repr(error),
+        "matched": None,
+        "assignment": None,
+    }
+
+
+def scenario_seed(name):
+    """
+    return a deterministic CP-SAT random_seed for a scenario name
+    """
+    return zlib.crc32(str(name).encode()) % (2**31)
+
+
+def load_results(output_path):
+    """
+    return the results already written to output_path (ignoring a truncated last line)
+    """
+    results = []
+    if not os.path.exists(output_path):
+        return results
+    with open(output_path) as fp:
+        for line in fp:
+            try:
+                results.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+    return results
+
+
+def _init_worker(children_dic, daycares_dic, families_dic):
+    global _instance
+    _instance = (children_dic, daycares_dic, families_dic)
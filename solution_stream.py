@@ -0,0 +1,85 @@
+from ortools.sat.python import cp_model
+
+
+class IntermediateSolution:
+    """
+    an improving solution found by CP-SAT before the end of the search
+
+    Attributes
+    ----------
+    outcome_children_dic, outcome_fp:
+        the solution, as returned by CP
+
+    objective: float
+        number of matched children
+
+    bound: float
+        best upper bound on the number of matched children known at that time
+
+    wall_time: float
+        seconds since the start of the solve
+    """
+
+    def __init__(self, outcome_children_dic, outcome_fp, objective, bound, wall_time):
+        self.outcome_children_dic = outcome_children_dic
+        self.outcome_fp = outcome_fp
+        self.objective = objective
+        self.bound = bound
+        self.wall_time = wall_time
+
+    def __str__(self):
+        return (
+            f"solution at {self.wall_time:.2f} s: {self.objective} matched, "
+            f"bound {self.bound}, gap {self.gap:.2%}"
+        )
+
+    def __repr__(self):
+        return self.__str__()
+
+    @property
+    def gap(self):
+        """
+        relative gap between the bound and the objective
+        """
+        return abs(self.bound - self.objective) / max(1.0, abs(self.objective))
+
+
+class SolutionStreamer(cp_model.CpSolverSolutionCallback):
+    """
+    CP-SAT solution callback passing each improving solution as an IntermediateSolution
+    to on_solution; the search stops when on_solution returns True, or when stop() is
+    called (from any thread). CP attaches the problem and xfp of its model
+    """
+
+    def __init__(self, on_solution, problem=None, xfp=None):
+        cp_model.CpSolverSolutionCallback.__init__(self)
+        self.on_solution = on_solution
+        self.problem = problem
+        self.xfp = xfp
+        self.number_of_solutions = 0
+        self.stopped = False
+
+    def OnSolutionCallback(self):
+        if self.stopped is True:
+            self.StopSearch()
+            return
+        self.number_of_solutions += 1
+        outcome_fp = {f_p: self.Value(x) for f_p, x in self.xfp.items()}
+        solution = IntermediateSolution(
+            self.problem.outcome_children_dic(outcome_fp),
+            outcome_fp,
+            self.ObjectiveValue(),
+            self.BestObjectiveBound(),
+            self.WallTime(),
+        )
+        if self.on_solution(solution) is True:
+            self.StopSearch()
+
+    def attach(self, problem, xfp):
+        self.problem = problem
+        self.xfp = xfp
+
+    def stop(self):
+        # also stops a search that has not started yet, at its first solution
+        self.stopped = True
+        self.StopSearch()
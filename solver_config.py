@@ -0,0 +1,79 @@
+class SolverConfig:
+    """
+    CP-SAT parameters used by CP
+
+    Attributes
+    ----------
+    num_search_workers: int
+        number of parallel workers (default 8)
+
+    random_seed: int
+        CP-SAT random seed (default: CP-SAT default)
+
+    relative_gap_limit: float
+        stop once |objective - bound| / |objective| <= relative_gap_limit
+
+    log_callback: callable(str)
+        receives the CP-SAT search log line by line (enables log_search_progress)
+
+    linearization_level: int
+        0: no linear relaxation, 1 (CP-SAT default): basic, 2: full
+
+    symmetry_level: int
+        0: no symmetry detection, up to 4 (CP-SAT default 2)
+
+    parameters: dict
+        any other CP-SAT parameters, e.g. {"cp_model_presolve": False}
+    """
+
+    def __init__(
+        self,
+        num_search_workers=8,
+        random_seed=None,
+        relative_gap_limit=None,
+        log_callback=None,
+        linearization_level=None,
+        symmetry_level=None,
+        parameters=None,
+    ):
+        self.num_search_workers = num_search_workers
+        self.random_seed = random_seed
+        self.relative_gap_limit = relative_gap_limit
+        self.log_callback = log_callback
+        self.linearization_level = linearization_level
+        self.symmetry_level = symmetry_level
+        self.parameters = {} if parameters is None else dict(parameters)
+
+    def __str__(self):
+        return f"solver config {self.to_dict()}"
+
+    def __repr__(self):
+        return self.__str__()
+
+    def to_dict(self):
+        """
+        return the CP-SAT parameters set by this config (without log_callback)
+        """
+        params = {"num_search_workers": self.num_search_workers}
+        if self.random_seed is not None:
+            params["random_seed"] = self.random_seed
+        if self.relative_gap_limit is not None:
+            params["relative_gap_limit"] = self.relative_gap_limit
+        if self.linearization_level is not None:
+            params["linearization_level"] = self.linearization_level
+        if self.symmetry_level is not None:
+            params["symmetry_level"] = self.symmetry_level
+        params.update(self.parameters)
+        return params
+
+    def apply(self, solver, solver_time):
+        """
+        set the parameters of a CpSolver, with max_time_in_seconds = solver_time
+        """
+        solver.parameters.max_time_in_seconds = solver_time
+        for name, value in self.to_dict().items():
+            setattr(solver.parameters, name, value)
+        if self.log_callback is not None:
+            solver.parameters.log_search_progress = True
+            solver.parameters.log_to_stdout = False
+            solver.log_callback = self.log_callback
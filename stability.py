@@ -0,0 +1,124 @@
+import numpy as np
+from problem_arrays import concat_ranges
+
+
+def check_blocking_coalitions(
+    problem, outcome_fp, share_bool=False, exclude_bool=True, capacity=None
+):
+    """
+    find all blocking coalitions of an assignment
+
+    Input:
+        problem: ProblemArrays
+        outcome_fp: dict[(Family.id, position), 0 / 1] as returned by CP
+        share_bool: whether priorities / quotas are shared within age groups
+        exclude_bool: whether siblings are excluded from the children with higher priority
+        capacity: (daycares, 6) capacities, default problem.capacity(share_bool), the
+            capacities of the CP model; check_bp of submission_code.ipynb passes
+            problem.recruiting_numbers
+    Output:
+        bp_dic: dict[Family.id, list[position]]
+            positions p, prior to the assignment of family f, such that every daycare d
+            in D(f, p) can accept C(f, p, d, g) for every age g, i.e.
+            |{better children assigned to d}| + |C(f, p, d, g)| <= capacity[d, g]
+    """
+    capacity = (
+        problem.capacity(share_bool) if capacity is None else np.asarray(capacity)
+    )
+    n_daycares = len(problem.daycare_ids)
+    pos_ptr = problem.family_pos_ptr
+    n_pos = np.diff(pos_ptr)
+
+    # assignment of each family (n_pos means unmatched) and of each child (-1 unmatched)
+    assignment = problem.family_assignment(outcome_fp)
+    child_assigned = problem.assigned_daycares(assignment)
+
+    # prefix counts of children assigned to d over each priority list (d, g)
+    ptr = problem.age_priority_ptr[share_bool]
+    lists = problem.age_priority_child[share_bool]
+    seg = np.repeat(np.arange(n_daycares * 6), np.diff(ptr))
+    cum = np.concatenate(([0], np.cumsum(child_assigned[lists] == seg // 6)))
+    # positions p prior to the assignment of each family
+    candidate_families = np.repeat(np.arange(len(n_pos)), assignment)
+    candidates = concat_ranges(pos_ptr[:-1], pos_ptr[:-1] + assignment)
+    lengths = problem.pref_ptr[candidates + 1] - problem.pref_ptr[candidates]
+    entry_pos = np.repeat(np.arange(len(candidates)), lengths)
+    entries = concat_ranges(
+        problem.pref_ptr[candidates], problem.pref_ptr[candidates + 1]
+    )
+    entry_child = problem.pref_child[entries].astype(np.int64)
+    entry_daycare = problem.pref_daycare[entries].astype(np.int64)
+    entry_age = problem.child_age[entry_child].astype(np.int64)
+    # C(f, p, d, g): every sibling counts for the ages related to its own age
+    related = _related_ages(problem, share_bool)[entry_daycare, entry_age]
+    e, g = np.nonzero(related)
+    group_keys = (entry_pos[e] * n_daycares + entry_daycare[e]) * 6 + g
+    group_keys, group = np.unique(group_keys, return_inverse=True)
+    group_pos = group_keys // (n_daycares * 6)
+    group_seg = group_keys % (n_daycares * 6)
+    group_daycare = group_seg // 6
+
+    flat = problem.age_priority_rank(share_bool, group_seg[group], entry_child[e])
+    if (flat < 0).any():
+        raise ValueError("a sibling does not appear in the priority list it applies to")
+    # C_{worst}(f, p, d, g) is the sibling at the largest flat position
+    worst = np.full(len(group_keys), -1, dtype=np.int64)
+    np.maximum.at(worst, group, flat)
+    number_fpdg = np.bincount(group, minlength=len(group_keys))
+    better = cum[worst] - cum[ptr[group_seg]]
+
+    if exclude_bool is True:
+        # remove siblings assigned to d with higher priority than C_{worst}(f, p, d, g)
+        group_family = candidate_families[group_pos]
+        sizes = (
+            problem.family_child_ptr[group_family + 1]
+            - problem.family_child_ptr[group_family]
+        )
+        sib_group = np.repeat(np.arange(len(group_keys)), sizes)
+        siblings = problem.family_child[
+            concat_ranges(
+                problem.family_child_ptr[group_family],
+                problem.family_child_ptr[group_family + 1],
+            )
+        ].astype(np.int64)
+        sib_flat = problem.age_priority_rank(share_bool, group_seg[sib_group], siblings)
+        sib_better = (
+            (child_assigned[siblings] == group_daycare[sib_group])
+            & (sib_flat >= 0)
+            & (sib_flat < worst[sib_group])
+        )
+        better -= np.bincount(sib_group[sib_better], minlength=len(group_keys)).astype(
+            better.dtype
+        )
+
+    full = better + number_fpdg > capacity[group_daycare, group_seg % 6]
+    blocked = np.bincount(group_pos[full], minlength=len(candidates)) == 0
+
+    bp_dic = {f_id: [] for f_id in problem.family_ids.tolist()}
+    family_ids = problem.family_ids
+    for f_row, p in zip(
+        candidate_families[blocked].tolist(),
+        (candidates[blocked] - pos_ptr[candidate_families[blocked]]).tolist(),
+    ):
+        bp_dic[int(family_ids[f_row])].append(p)
+    return bp_dic
+
+
+def count_blocking_coalitions(bp_dic):
+    """
+    return the total number of blocking coalitions in bp_dic
+    """
+    return sum(len(positions) for positions in bp_dic.values())
+
+
+def _related_ages(problem, share_bool):
+    """
+    return a (daycares, 6, 6) boolean matrix: [d, a, g] iff a child of age a counts toward age g at d
+    """
+    related = np.zeros((len(problem.daycare_ids), 6, 6), dtype=bool)
+    related[:, np.arange(6), np.arange(6)] = True
+    if share_bool is True:
+        for row, share_ages_list in enumerate(problem.share_ages_list):
+            for ages in share_ages_list:
+                related[row][np.ix_(ages, ages)] = True
+    return related
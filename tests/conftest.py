@@ -0,0 +1,73 @@
+import copy
+import os
+import pickle
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from instance_generator import generate_instance  # noqa: E402
+
+with open(os.path.join(ROOT, "example_data.pkl"), "rb") as fp:
+    EXAMPLE = pickle.load(fp)
+
+
+@pytest.fixture
+def example_instance():
+    """
+    (children_dic, daycares_dic, families_dic) of example_data.pkl
+    """
+    return copy.deepcopy(EXAMPLE)
+
+
+@pytest.fixture
+def small_instance():
+    """
+    a generated instance of 300 children in 3 districts of 10 daycares, with siblings,
+    ties, transfers and shared quotas
+    """
+    return generate_instance(300, n_daycares=30, district_size=10, seed=1)
+
+
+@pytest.fixture
+def tiny_instance():
+    """
+    a generated instance of 120 children in 2 districts of 6 daycares, small enough to
+    be solved many times with bp_num > 0
+    """
+    return generate_instance(120, n_daycares=12, district_size=6, seed=2)
+
+
+@pytest.fixture
+def cross_transfer_instance(small_instance):
+    """
+    small_instance where the children of one transfer family attend a daycare of
+    another district that the family does not apply to
+    """
+    children_dic, daycares_dic, families_dic = small_instance
+    family, initial = cross_transfer(*small_instance)
+    for c_id in family["children"]:
+        children_dic[c_id]["initial_daycare_id"] = initial
+    return small_instance
+
+
+def cross_transfer(children_dic, daycares_dic, families_dic):
+    """
+    return the first transfer family of a generated instance and a daycare of another
+    district (districts are consecutive blocks of 10 daycares) it does not apply to
+    """
+    family = next(
+        f
+        for f in families_dic.values()
+        if children_dic[f["children"][0]]["initial_daycare_id"] is not None
+    )
+    listed = set()
+    for tup_p in family["pref"]:
+        listed.update(tup_p if isinstance(tup_p, (tuple, list)) else (tup_p,))
+    district = min(listed) // 10
+    initial = next(
+        d_id for d_id in daycares_dic if d_id // 10 != district and d_id not in listed
+    )
+    return family, initial
@@ -0,0 +1,103 @@
+from helper_functions import create_agent_registry
+
+
+def baseline_priority_age_dics(daycare, children_dic):
+    """
+    priority_age_dic and priority_age_share_dic as built by the original
+    update_priority_age_dic / update_priority_age_share_dic
+    """
+    priority_age_dic = {age: [] for age in range(6)}
+    for c_id in daycare.priority:
+        age = children_dic[c_id]["age"]
+        if c_id not in priority_age_dic[age]:
+            priority_age_dic[age].append(c_id)
+    if daycare.share_ages_list is None:
+        return priority_age_dic, priority_age_dic
+    priority_age_share_dic = {age: [] for age in range(6)}
+    for c_id in daycare.priority:
+        c_age = children_dic[c_id]["age"]
+        if c_age in daycare.all_shared_ages:
+            for ages in daycare.share_ages_list:
+                if c_age in ages:
+                    for age in ages:
+                        if c_id not in priority_age_share_dic[age]:
+                            priority_age_share_dic[age].append(c_id)
+        elif c_id not in priority_age_share_dic[c_age]:
+            priority_age_share_dic[c_age].append(c_id)
+    return priority_age_dic, priority_age_share_dic
+
+
+def test_priority_age_dics_equal_baseline(example_instance, small_instance):
+    for instance in (example_instance, small_instance):
+        children_dic = instance[0]
+        registry = create_agent_registry(*instance)
+        for d in registry.daycares.values():
+            priority_age_dic, priority_age_share_dic = baseline_priority_age_dics(
+                d, children_dic
+            )
+            assert {
+                age: list(ids) for age, ids in d.priority_age_dic.items()
+            } == priority_age_dic
+            assert {
+                age: list(ids) for age, ids in d.priority_age_share_dic.items()
+            } == priority_age_share_dic
+            for share_bool, dic in (
+                (False, d.priority_age_dic),
+                (True, d.priority_age_share_dic),
+            ):
+                for age, ids in dic.items():
+                    assert d.rank_index[share_bool][age].ids.tolist() == list(ids)
+
+
+def baseline_siblings(f, p, d_id, g, share_bool, registry):
+    """
+    C(f, p, d, g, bool) and C_{worst}(f, p, d, g, bool) as computed by the original
+    return_siblings_for_certain_position_daycare_age /
+    return_lowest_sibling_for_certain_position_daycare_age
+    """
+    daycare = registry.daycares[d_id]
+    used_ages = daycare.return_related_ages(g) if share_bool is True else [g]
+    siblings = []
+    for c_id, applied in zip(f.children, f.pref[p]):
+        if applied == d_id and registry.age_of[c_id] in used_ages:
+            if c_id not in siblings:
+                siblings.append(c_id)
+    rank_dic = (
+        daycare.priority_age_share_dic
+        if share_bool is True
+        else daycare.priority_age_dic
+    )
+    worst_index, worst_id = -1, -1
+    for c_id in siblings:
+        if list(rank_dic[g]).index(c_id) > worst_index:
+            worst_index = list(rank_dic[g]).index(c_id)
+            worst_id = c_id
+    return siblings, worst_id
+
+
+def test_sibling_tables_equal_baseline(example_instance, small_instance):
+    for instance in (example_instance, small_instance):
+        registry = create_agent_registry(*instance)
+        families = [f for f in registry.families.values() if f.has_siblings]
+        assert len(families) > 0
+        for f in families:
+            assert f.sibling_table is not None
+            for p in range(len(f.pref)):
+                for d_id in f.return_daycare_id_for_certain_position(p):
+                    for share_bool in (True, False):
+                        for g in range(6):
+                            siblings, worst_id = baseline_siblings(
+                                f, p, d_id, g, share_bool, registry
+                            )
+                            assert (
+                                f.return_siblings_for_certain_position_daycare_age(
+                                    p, d_id, g, share_bool, registry
+                                )
+                                == siblings
+                            )
+                            assert (
+                                f.return_lowest_sibling_for_certain_position_daycare_age(
+                                    p, d_id, g, share_bool, registry
+                                )
+                                == worst_id
+                            )
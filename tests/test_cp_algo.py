@@ -0,0 +1,161 @@
+import pytest
+from ortools.sat.python import cp_model
+
+from CP_algo import ALPHA_ENCODINGS, CP, CP_lazy, CP_sweep, create_model, set_bp_num
+from deferred_acceptance import deferred_acceptance
+from problem_arrays import create_problem_arrays
+
+
+def matched(outcome_children_dic):
+    return sum(outcome["CP"] != 9999 for outcome in outcome_children_dic.values())
+
+
+def test_sweep_equals_standalone_solves(tiny_instance):
+    bp_values = [0, 1, 2, 4, 8]
+    pareto_table, outcomes = CP_sweep(*tiny_instance, True, bp_values, 60)
+    assert [row["bp_num"] for row in pareto_table] == bp_values
+    assert all(row["status"] == "OPTIMAL" for row in pareto_table)
+    objectives = [row["matched"] for row in pareto_table]
+    assert objectives == sorted(objectives)
+    assert objectives[0] < objectives[-1]
+    for row in pareto_table:
+        outcome_children_dic, outcome_fp = outcomes[row["bp_num"]]
+        assert matched(outcome_children_dic) == row["matched"]
+        standalone = CP(*tiny_instance, True, row["bp_num"], 60)[0]
+        assert matched(standalone) == row["matched"]
+
+
+def infeasible_instance():
+    """
+    a transfer child applying only to a daycare without seats for its age
+    """
+    children_dic = {
+        0: {
+            "id": 0,
+            "age": 1,
+            "family_id": 0,
+            "initial_daycare_id": 1,
+            "actual_daycare_id": None,
+            "preference_list": [0],
+        }
+    }
+    daycares_dic = {
+        d_id: {
+            "id": d_id,
+            "recruiting_numbers_list": [0, 0, 0, 0, 0, 0],
+            "share_ages_list": [],
+            "priority_child_id_list": priority,
+            "priority_score_list": [1] * len(priority),
+        }
+        for d_id, priority in [(0, [0]), (1, [])]
+    }
+    families_dic = {0: {"id": 0, "children": [0], "pref": [0]}}
+    return children_dic, daycares_dic, families_dic
+
+
+def test_infeasible_status_raises():
+    with pytest.raises(ValueError, match="INFEASIBLE"):
+        CP(*infeasible_instance(), True, 0, 60)
+    with pytest.raises(ValueError, match="INFEASIBLE"):
+        CP_lazy(*infeasible_instance(), True, 0, 60)
+
+
+def test_unknown_status_falls_back(tiny_instance):
+    outcome_children_dic, outcome_fp = CP(*tiny_instance, True, 0, 0)
+    problem = create_problem_arrays(*tiny_instance)
+    assert outcome_fp == deferred_acceptance(problem, True)
+
+
+@pytest.mark.parametrize("share_bool", [True, False])
+def test_presolve_keeps_the_optimum(small_instance, tiny_instance, share_bool):
+    for instance, bp_num in [(small_instance, 0), (tiny_instance, 2)]:
+        expected = matched(CP(*instance, share_bool, bp_num, 60)[0])
+        presolved = CP(*instance, share_bool, bp_num, 60, presolve=True)[0]
+        assert matched(presolved) == expected
+
+
+@pytest.fixture
+def overlapping_share_instance(tiny_instance):
+    """
+    tiny_instance where three daycares share quotas in the overlapping groups [0, 1]
+    and [1, 2], with three more seats of each age
+    """
+    children_dic, daycares_dic, families_dic = tiny_instance
+    for d_id in list(daycares_dic)[:3]:
+        daycare = daycares_dic[d_id]
+        daycare["share_ages_list"] = [[0, 1], [1, 2]]
+        daycare["recruiting_numbers_list"] = [
+            x + 3 for x in daycare["recruiting_numbers_list"]
+        ]
+    return tiny_instance
+
+
+def blocking_coalitions_in_model(instance, outcome_fp, **kwargs):
+    """
+    sum(beta) of the CP model with xfp fixed to outcome_fp
+    """
+    model, problem, xfp, xcd, beta, bp_index = create_model(*instance, True, **kwargs)
+    for f_p, x in xfp.items():
+        model.Add(x == outcome_fp[f_p])
+    set_bp_num(model, bp_index, len(beta))
+    solver = cp_model.CpSolver()
+    assert solver.Solve(model) == cp_model.OPTIMAL
+    return sum(solver.Value(x) for x in beta.values())
+
+
+@pytest.mark.parametrize("share_bool", [True, False])
+def test_shared_prefix_keeps_the_optimum(small_instance, share_bool):
+    expected = matched(CP(*small_instance, share_bool, 0, 60)[0])
+    for presolve in (False, True):
+        outcome_children_dic, outcome_fp = CP(
+            *small_instance,
+            share_bool,
+            0,
+            60,
+            presolve=presolve,
+            shared_prefix=True,
+        )
+        assert matched(outcome_children_dic) == expected
+
+
+def test_shared_prefix_with_overlapping_share_groups(overlapping_share_instance):
+    problem = create_problem_arrays(*overlapping_share_instance)
+    outcome_fp = deferred_acceptance(problem, True)
+    assert blocking_coalitions_in_model(
+        overlapping_share_instance, outcome_fp
+    ) == blocking_coalitions_in_model(
+        overlapping_share_instance, outcome_fp, shared_prefix=True
+    )
+    expected = matched(CP(*overlapping_share_instance, True, 5, 60)[0])
+    prefix = CP(*overlapping_share_instance, True, 5, 60, shared_prefix=True)[0]
+    assert matched(prefix) == expected
+
+
+@pytest.mark.parametrize("share_bool", [True, False])
+def test_lazy_keeps_the_optimum(small_instance, tiny_instance, share_bool):
+    for instance, bp_num in [(small_instance, 0), (tiny_instance, 2)]:
+        expected = matched(CP(*instance, share_bool, bp_num, 60)[0])
+        for shared_prefix in (False, True):
+            outcome_children_dic, outcome_fp = CP_lazy(
+                *instance, share_bool, bp_num, 60, shared_prefix=shared_prefix
+            )
+            assert matched(outcome_children_dic) == expected
+
+
+@pytest.mark.parametrize("share_bool", [True, False])
+@pytest.mark.parametrize("alpha_encoding", ALPHA_ENCODINGS)
+def test_alpha_encoding_keeps_the_optimum(
+    small_instance, tiny_instance, share_bool, alpha_encoding
+):
+    for instance, bp_num in [(small_instance, 0), (tiny_instance, 2)]:
+        expected = matched(CP(*instance, share_bool, bp_num, 60)[0])
+        for presolve in (False, True):
+            outcome_children_dic, outcome_fp = CP(
+                *instance,
+                share_bool,
+                bp_num,
+                60,
+                presolve=presolve,
+                alpha_encoding=alpha_encoding,
+            )
+            assert matched(outcome_children_dic) == expected
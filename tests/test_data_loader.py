@@ -0,0 +1,99 @@
+import json
+import os
+
+import pytest
+
+from data_loader import load_instance, save_instance
+from problem_arrays import create_problem_arrays
+
+
+def _normalized(instance):
+    children_dic, daycares_dic, families_dic = instance
+    families_dic = {
+        f_id: dict(
+            family,
+            pref=[
+                tuple(tup_p) if isinstance(tup_p, (tuple, list)) else tup_p
+                for tup_p in family["pref"]
+            ],
+        )
+        for f_id, family in families_dic.items()
+    }
+    return children_dic, daycares_dic, families_dic
+
+
+@pytest.mark.parametrize("file_format", ["jsonl", "csv"])
+def test_round_trip(tmp_path, small_instance, file_format):
+    paths = save_instance(*small_instance, str(tmp_path), file_format)
+    assert load_instance(*paths) == _normalized(small_instance)
+
+
+def _edit_line(path, line, edit):
+    """
+    apply edit to the JSON record at line (1-based) of a JSONL file
+    """
+    with open(path) as fp:
+        lines = fp.readlines()
+    record = json.loads(lines[line - 1])
+    edit(record)
+    lines[line - 1] = json.dumps(record) + "\n"
+    with open(path, "w") as fp:
+        fp.writelines(lines)
+
+
+def test_unknown_preference_daycare(tmp_path, small_instance):
+    paths = save_instance(*small_instance, str(tmp_path))
+    _edit_line(paths[2], 3, lambda record: record["pref"].append(12345))
+    with pytest.raises(ValueError, match=r"families\.jsonl:3: daycare 12345"):
+        load_instance(*paths)
+
+
+def test_unknown_initial_daycare(tmp_path, small_instance):
+    paths = save_instance(*small_instance, str(tmp_path))
+    _edit_line(paths[0], 5, lambda record: record.update(initial_daycare_id=12345))
+    with pytest.raises(ValueError, match=r"children\.jsonl:5: daycare 12345"):
+        load_instance(*paths)
+
+
+def test_unknown_priority_child(tmp_path, small_instance):
+    paths = save_instance(*small_instance, str(tmp_path))
+
+    def edit(record):
+        record["priority_child_id_list"].append(123456)
+        record["priority_score_list"].append(0)
+
+    _edit_line(paths[1], 2, edit)
+    with pytest.raises(ValueError, match=r"daycares\.jsonl:2: .*child 123456"):
+        load_instance(*paths)
+
+
+def test_unranked_applicant(tmp_path, small_instance):
+    paths = save_instance(*small_instance, str(tmp_path))
+
+    def edit(record):
+        del record["priority_child_id_list"][0]
+        del record["priority_score_list"][0]
+
+    _edit_line(paths[1], 1, edit)
+    with pytest.raises(ValueError, match=r"families\.jsonl:\d+: .*does not rank it"):
+        load_instance(*paths)
+
+
+def test_share_ages_list_none(tmp_path, small_instance):
+    paths = save_instance(*small_instance, str(tmp_path))
+    _edit_line(paths[1], 1, lambda record: record.update(share_ages_list=None))
+    children_dic, daycares_dic, families_dic = load_instance(*paths)
+    assert next(iter(daycares_dic.values()))["share_ages_list"] == []
+    create_problem_arrays(children_dic, daycares_dic, families_dic)
+
+
+def test_csv_location(tmp_path, small_instance):
+    paths = save_instance(*small_instance, str(tmp_path), "csv")
+    with open(paths[2]) as fp:
+        lines = fp.readlines()
+    # header on line 1, first family on line 2
+    lines[1] = lines[1].replace("[", "[12345, ", 1)
+    with open(paths[2], "w") as fp:
+        fp.writelines(lines)
+    with pytest.raises(ValueError, match=os.path.basename(paths[2]) + ":2: "):
+        load_instance(*paths)
@@ -0,0 +1,27 @@
+from CP_algo import CP
+from decomposition import CP_decomposed, find_components
+
+
+def matched(outcome_children_dic):
+    return sum(outcome["CP"] != 9999 for outcome in outcome_children_dic.values())
+
+
+def test_transfer_daycare_in_family_component(cross_transfer_instance):
+    children_dic, daycares_dic, families_dic = cross_transfer_instance
+    components = find_components(*cross_transfer_instance)
+    assert len(components) > 1
+    for f_ids, d_ids in components:
+        for f_id in f_ids:
+            for c_id in families_dic[f_id]["children"]:
+                initial = children_dic[c_id]["initial_daycare_id"]
+                assert initial is None or initial in d_ids
+
+
+def test_decomposed_equals_CP(cross_transfer_instance):
+    outcome_children_dic, outcome_fp = CP(*cross_transfer_instance, True, 0, 60)
+    decomposed_children_dic, decomposed_fp = CP_decomposed(
+        *cross_transfer_instance, True, 0, 60, processes=1, cores=1, min_children=1
+    )
+    assert matched(decomposed_children_dic) == matched(outcome_children_dic)
+    assert list(decomposed_children_dic) == list(outcome_children_dic)
+    assert list(decomposed_fp) == list(outcome_fp)
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from deferred_acceptance import deferred_acceptance, unmatched_transfer_families
+from problem_arrays import create_problem_arrays
+
+
+@pytest.mark.parametrize("share_bool", [True, False])
+def test_outcome_is_feasible(example_instance, small_instance, share_bool):
+    for instance in (example_instance, small_instance):
+        problem = create_problem_arrays(*instance)
+        outcome_fp = deferred_acceptance(problem, share_bool)
+        # at most one position per family, exactly one for transfer families
+        assigned = np.zeros(len(problem.family_ids), dtype=np.int64)
+        for (f_id, p), x in outcome_fp.items():
+            assigned[problem.family_index[f_id]] += x
+        assert (assigned <= 1).all()
+        assert (assigned[problem.transfer_families()] == 1).all()
+        # capacities of every (daycare, age) priority list
+        child_assigned = problem.assigned_daycares(
+            problem.family_assignment(outcome_fp)
+        )
+        capacity = problem.capacity(share_bool)
+        for d_row in range(len(problem.daycare_ids)):
+            for g in range(6):
+                rank_g = problem.age_priority(d_row, g, share_bool)
+                if len(rank_g) > 0:
+                    occupied = (child_assigned[rank_g] == d_row).sum()
+                    assert occupied <= capacity[d_row, g]
+        assert (child_assigned >= 0).sum() > 0
+
+
+def test_unmatched_transfer_families(small_instance):
+    problem = create_problem_arrays(*small_instance)
+    outcome_fp = deferred_acceptance(problem, True)
+    assert unmatched_transfer_families(problem, outcome_fp) == []
+    transfer = problem.family_ids[problem.transfer_families()].tolist()
+    unmatched = {f_p: 0 for f_p in outcome_fp}
+    assert unmatched_transfer_families(problem, unmatched) == transfer
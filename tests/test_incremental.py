@@ -0,0 +1,57 @@
+from CP_algo import CP
+from conftest import cross_transfer
+from incremental import InstanceDelta, rematch
+
+
+def matched(outcome_children_dic):
+    return sum(outcome["CP"] != 9999 for outcome in outcome_children_dic.values())
+
+
+def test_rematch_moved_transfer_child(small_instance):
+    previous = CP(*small_instance, True, 0, 60)
+    # the family applies again, its children now attending a daycare of another
+    # district: the components of the new instance are joined through that daycare
+    family, initial = cross_transfer(*small_instance)
+    children = [
+        dict(small_instance[0][c_id], initial_daycare_id=initial)
+        for c_id in family["children"]
+    ]
+    # removed children leave the priority lists: insert them again with their score
+    priority_updates = {}
+    for d_id, daycare in small_instance[1].items():
+        for c_id, score in zip(
+            daycare["priority_child_id_list"], daycare["priority_score_list"]
+        ):
+            if c_id in family["children"]:
+                priority_updates.setdefault(d_id, []).append((c_id, score))
+    delta = InstanceDelta(
+        add_children=children,
+        add_families=[family],
+        remove_families=[family["id"]],
+        priority_updates=priority_updates,
+    )
+    instance, outcome_children_dic, outcome_fp = rematch(
+        *small_instance, previous, delta, True, solver_time=60
+    )
+    assert instance[0][family["children"][0]]["initial_daycare_id"] == initial
+    expected_children_dic, expected_fp = CP(*instance, True, 0, 60)
+    assert matched(outcome_children_dic) == matched(expected_children_dic)
+    assert list(outcome_children_dic) == list(expected_children_dic)
+    assert list(outcome_fp) == list(expected_fp)
+
+
+def test_rematch_cross_component_transfer(cross_transfer_instance):
+    previous = CP(*cross_transfer_instance, True, 0, 60)
+    # a capacity change in the district the transfer family applies to only
+    family, _ = cross_transfer(*cross_transfer_instance)
+    d_id = family["pref"][0]
+    d_id = d_id[0] if isinstance(d_id, (tuple, list)) else d_id
+    recruiting_numbers = cross_transfer_instance[1][d_id]["recruiting_numbers_list"]
+    delta = InstanceDelta(
+        recruiting_numbers={d_id: [x + 1 for x in recruiting_numbers]}
+    )
+    instance, outcome_children_dic, outcome_fp = rematch(
+        *cross_transfer_instance, previous, delta, True, solver_time=60
+    )
+    expected_children_dic, expected_fp = CP(*instance, True, 0, 60)
+    assert matched(outcome_children_dic) == matched(expected_children_dic)
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from deferred_acceptance import deferred_acceptance
+from instance_store import load_problem_arrays, save_problem_arrays
+from problem_arrays import create_problem_arrays
+
+
+def assert_same_problem(problem, loaded):
+    for name, value in vars(problem).items():
+        if name.startswith("_"):
+            continue
+        other = getattr(loaded, name)
+        if isinstance(value, np.ndarray):
+            assert np.array_equal(value, other), name
+            assert value.dtype == other.dtype, name
+        elif name.startswith("age_priority_"):
+            for share_bool in (True, False):
+                assert np.array_equal(value[share_bool], other[share_bool]), name
+        else:
+            assert value == other, name
+
+
+@pytest.mark.parametrize("mmap_mode", ["r", None])
+def test_round_trip(tmp_path, example_instance, small_instance, mmap_mode):
+    for instance in (example_instance, small_instance):
+        problem = create_problem_arrays(*instance)
+        path = str(tmp_path / "instance.bin")
+        save_problem_arrays(problem, path)
+        loaded = load_problem_arrays(path, mmap_mode)
+        assert_same_problem(problem, loaded)
+        for share_bool in (True, False):
+            assert deferred_acceptance(loaded, share_bool) == deferred_acceptance(
+                problem, share_bool
+            )
@@ -0,0 +1,61 @@
+import asyncio
+
+from instance_generator import generate_instance
+from matching_service import LocalClient, MatchingService
+
+INSTANCE = generate_instance(60, seed=2)
+
+
+def test_invalid_instance_is_rejected():
+    children_dic, daycares_dic, families_dic = INSTANCE
+    family = next(iter(families_dic.values()))
+    families_dic = dict(families_dic)
+    families_dic[family["id"]] = dict(family, pref=list(family["pref"]) + [12345])
+
+    async def main():
+        async with MatchingService(processes=1, cores=1) as service:
+            client = LocalClient(service)
+            code, answer = await client.submit(children_dic, daycares_dic, families_dic)
+            return code, answer, len(service.jobs)
+
+    code, answer, n_jobs = asyncio.run(main())
+    assert code == 400
+    assert "daycare 12345 does not exist" in answer["error"]
+    assert n_jobs == 0
+
+
+def test_finished_jobs_are_evicted():
+    async def main():
+        async with MatchingService(processes=1, cores=1, job_ttl=1) as service:
+            client = LocalClient(service)
+            code, job = await client.submit(*INSTANCE, {"solver_time": 20})
+            assert code == 202
+            code, result = await client.result(job["id"])
+            assert code == 200
+            assert result["status"] == "OPTIMAL"
+            await asyncio.sleep(1.1)
+            # the next request after job_ttl evicts the job
+            code, _ = await client.status(job["id"])
+            assert code == 404
+            assert len(service.jobs) == 0
+            assert len(service.jobs_by_key) == 0
+            # an identical submission is solved again
+            code, again = await client.submit(*INSTANCE, {"solver_time": 20})
+            assert again["id"] != job["id"]
+            code, result = await client.result(again["id"])
+            assert result["status"] == "OPTIMAL"
+
+    asyncio.run(main())
+
+
+def test_finished_jobs_are_kept_until_expiry():
+    async def main():
+        async with MatchingService(processes=1, cores=1) as service:
+            client = LocalClient(service)
+            code, job = await client.submit(*INSTANCE, {"solver_time": 20})
+            await client.result(job["id"])
+            code, status = await client.status(job["id"])
+            assert code == 200
+            assert status["status"] == "done"
+
+    asyncio.run(main())
@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+import CP_algo
+import model_cache
+from CP_algo import CP, create_model
+from model_cache import ModelCache, instance_fingerprint
+
+
+@pytest.fixture
+def count_builds(monkeypatch):
+    """
+    list of the share_bool of each create_model call of CP
+    """
+    builds = []
+
+    def counting_create_model(*args, **kwargs):
+        builds.append(args[3])
+        return create_model(*args, **kwargs)
+
+    monkeypatch.setattr(CP_algo, "create_model", counting_create_model)
+    return builds
+
+
+def test_cache_hit(tmp_path, small_instance, count_builds):
+    cache = ModelCache(str(tmp_path))
+    first = CP(*small_instance, False, 0, 60, cache=cache)
+    second = CP(*small_instance, False, 0, 60, cache=cache)
+    assert count_builds == [False]
+    assert first == second
+    # another share_bool is another model
+    CP(*small_instance, True, 0, 60, cache=cache)
+    assert count_builds == [False, True]
+
+
+def test_cache_version_mismatch(tmp_path, monkeypatch, small_instance, count_builds):
+    cache = ModelCache(str(tmp_path))
+    key = instance_fingerprint(*small_instance, False, True, 5)
+    CP(*small_instance, False, 0, 60, cache=cache)
+    assert cache.load(key) is not None
+    monkeypatch.setattr(model_cache, "CACHE_VERSION", model_cache.CACHE_VERSION + 1)
+    assert instance_fingerprint(*small_instance, False, True, 5) != key
+    CP(*small_instance, False, 0, 60, cache=cache)
+    assert count_builds == [False, False]
+
+
+def test_lru_eviction(tmp_path, small_instance):
+    cache = ModelCache(str(tmp_path))
+    built = create_model(*small_instance, False)
+    cache.store("a", *built)
+    cache.store("b", *built)
+    entry_size = cache.size() // 2
+    for t, key in enumerate(["a", "b"]):
+        for path in cache._paths(key):
+            os.utime(path, (1000 + t, 1000 + t))
+    # loading "a" makes "b" the least recently used entry
+    assert cache.load("a") is not None
+    cache.max_bytes = 2 * entry_size
+    cache.store("c", *built)
+    assert cache.load("b") is None
+    assert cache.load("a") is not None
+    assert cache.load("c") is not None
+    assert cache.size() <= cache.max_bytes
@@ -0,0 +1,76 @@
+from CP_algo import CP
+from helper_functions import create_agent_registry
+from problem_arrays import create_problem_arrays, daycare_capacities
+
+
+def matched(outcome_children_dic):
+    return sum(outcome["CP"] != 9999 for outcome in outcome_children_dic.values())
+
+
+def assert_same_capacities(instance):
+    problem = create_problem_arrays(*instance)
+    registry = create_agent_registry(*instance)
+    for d_row, d_id in enumerate(problem.daycare_ids.tolist()):
+        d = registry.daycares[d_id]
+        assert tuple(problem.total_numbers[d_row].tolist()) == d.total_numbers
+        assert tuple(problem.total_numbers_share[d_row].tolist()) == (
+            d.total_numbers_share
+        )
+
+
+def test_capacities_match_agents(example_instance, small_instance):
+    assert_same_capacities(example_instance)
+    assert_same_capacities(small_instance)
+
+
+def test_share_ages_list_none(small_instance):
+    children_dic, daycares_dic, families_dic = small_instance
+    for daycare in daycares_dic.values():
+        if len(daycare["share_ages_list"]) == 0:
+            daycare["share_ages_list"] = None
+    assert_same_capacities(small_instance)
+    problem = create_problem_arrays(*small_instance)
+    assert all(
+        share_ages_list is not None for share_ages_list in problem.share_ages_list
+    )
+
+
+def test_daycare_capacities():
+    recruiting_numbers = [3, 2, 1, 0, 4, 5]
+    transfers = [0, 1, 0, 2, 0, 0]
+    assert daycare_capacities(recruiting_numbers, transfers, [[0, 1], [4, 5]]) == (
+        (3, 3, 1, 2, 4, 5),
+        (6, 6, 1, 2, 9, 9),
+    )
+    # overlapping groups are summed in turn, as in the original agents
+    assert daycare_capacities(recruiting_numbers, transfers, [[0, 1], [1, 2]]) == (
+        (3, 3, 1, 2, 4, 5),
+        (6, 7, 7, 2, 4, 5),
+    )
+    assert daycare_capacities(recruiting_numbers, transfers, None) == (
+        (3, 3, 1, 2, 4, 5),
+        (3, 3, 1, 2, 4, 5),
+    )
+
+
+def test_capacities_without_shared_quotas(small_instance):
+    # with share_bool=False, ages of a shared group keep their own capacities
+    children_dic, daycares_dic, families_dic = small_instance
+    problem = create_problem_arrays(*small_instance)
+    transfers = problem.total_numbers - problem.recruiting_numbers
+    assert (transfers[:-1] >= 0).all()
+    for d_row, d_id in enumerate(problem.daycare_ids.tolist()[:-1]):
+        n_transfers = [0] * 6
+        for child in children_dic.values():
+            if child["initial_daycare_id"] == d_id:
+                n_transfers[child["age"]] += 1
+        assert transfers[d_row].tolist() == n_transfers
+    shared = [
+        d_row
+        for d_row, d_id in enumerate(problem.daycare_ids.tolist())
+        if len(daycares_dic.get(d_id, {}).get("share_ages_list") or []) > 0
+    ]
+    assert len(shared) > 0
+    assert (problem.capacity(False)[shared] < problem.capacity(True)[shared]).any()
+    # 211 children were matched when shared ages had the group totals
+    assert matched(CP(*small_instance, False, 0, 60)[0]) == 207
@@ -0,0 +1,70 @@
+import json
+import time
+
+import pytest
+from ortools.sat.python import cp_model
+
+from CP_algo import CP
+from run_report import RunReport, phase
+
+SOLVER_KEYS = {
+    "status",
+    "objective",
+    "bound",
+    "gap",
+    "branches",
+    "conflicts",
+    "wall_time",
+    "user_time",
+}
+
+
+def test_phase_timings():
+    run_report = RunReport()
+    model = cp_model.CpModel()
+    for _ in range(2):
+        with run_report.phase("sleep", model):
+            time.sleep(0.05)
+            x = model.NewBoolVar("x")
+            model.Add(x == 1)
+    with pytest.raises(RuntimeError):
+        with run_report.phase("error"):
+            raise RuntimeError
+    with phase(None, "ignored"):
+        pass
+    assert list(run_report.phases) == ["sleep", "error"]
+    stats = run_report.phases["sleep"]
+    assert stats["wall"] >= 0.1
+    assert stats["cpu"] >= 0
+    assert stats["peak_rss"] > 0
+    assert stats["variables"] == 2
+    assert stats["constraints"] == 2
+    assert "variables" not in run_report.phases["error"]
+
+
+def test_report_of_CP(tmp_path, tiny_instance):
+    path = str(tmp_path / "report.json")
+    run_report = RunReport(path)
+    CP(*tiny_instance, True, 0, 60, run_report=run_report)
+    with open(path) as fp:
+        report = json.load(fp)
+    assert report == json.loads(json.dumps(run_report.to_dict()))
+    assert set(report) == {"phases", "solver"}
+    for name in (
+        "create_agents",
+        "create_problem_arrays",
+        "creat_variables_xfp",
+        "creat_variables_xcd",
+        "creat_variables_alpha",
+        "creat_variables_gamma",
+        "creat_variables_beta",
+        "feasibility_constraints",
+        "objective",
+        "solve",
+        "outcome",
+    ):
+        assert {"wall", "cpu", "peak_rss"} <= set(report["phases"][name])
+    assert report["phases"]["creat_variables_xfp"]["variables"] > 0
+    assert set(report["solver"][-1]) == SOLVER_KEYS
+    assert report["solver"][-1]["status"] == "OPTIMAL"
+    assert report["solver"][-1]["gap"] == 0
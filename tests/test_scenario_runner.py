@@ -0,0 +1,49 @@
+import json
+
+from instance_generator import generate_instance
+from scenario_runner import load_results, run_scenarios
+
+INSTANCE = generate_instance(60, seed=2)
+SCENARIOS = [
+    {"name": "base", "solver_time": 20},
+    # unknown daycare: run_scenario raises KeyError
+    {"name": "broken", "recruiting_numbers": {12345: [1] * 6}},
+    {"name": "no_share", "share_bool": False, "solver_time": 20},
+]
+
+
+def test_failed_scenario_is_recorded(tmp_path):
+    output_path = str(tmp_path / "results.jsonl")
+    results = run_scenarios(*INSTANCE, SCENARIOS, output_path, processes=1, cores=1)
+    status = {result["name"]: result["status"] for result in results}
+    assert status["base"] == "OPTIMAL"
+    assert status["no_share"] == "OPTIMAL"
+    assert status["broken"] == "ERROR"
+    assert "12345" in next(r for r in results if r["name"] == "broken")["error"]
+    assert len(load_results(output_path)) == 3
+
+
+def test_resume_keeps_finished_results(tmp_path):
+    output_path = str(tmp_path / "results.jsonl")
+    run_scenarios(*INSTANCE, SCENARIOS[:1], output_path, processes=1, cores=1)
+    with open(output_path) as fp:
+        finished = fp.readline()
+    # a crash while writing a second result
+    with open(output_path, "a") as fp:
+        fp.write('{"name": "no_sh')
+    results = run_scenarios(*INSTANCE, SCENARIOS, output_path, processes=1, cores=1)
+    assert [result["name"] for result in results][0] == "base"
+    assert sorted(result["name"] for result in results) == [
+        "base",
+        "broken",
+        "no_share",
+    ]
+    with open(output_path) as fp:
+        lines = fp.readlines()
+    assert lines[0] == finished
+    assert len(lines) == 3
+    assert all(json.loads(line)["name"] for line in lines)
+    # failed scenarios are run again on resume
+    results = run_scenarios(*INSTANCE, SCENARIOS, output_path, processes=1, cores=1)
+    assert [result["name"] for result in results][-1] == "broken"
+    assert len(load_results(output_path)) == 3
@@ -0,0 +1,97 @@
+import asyncio
+import contextlib
+import threading
+import time
+
+from CP_algo import CP, CP_stream, CP_stream_async, _StreamedRun
+from solver_config import SolverConfig
+
+
+def matched(outcome_children_dic):
+    return sum(outcome["CP"] != 9999 for outcome in outcome_children_dic.values())
+
+
+def improving(objectives):
+    return all(a < b for a, b in zip(objectives, objectives[1:]))
+
+
+def streamed_runs():
+    return [t for t in threading.enumerate() if isinstance(t, _StreamedRun)]
+
+
+def stream_kwargs(bp_num):
+    # one worker finds a sequence of improving solutions for bp_num > 0
+    return {
+        "bp_num": bp_num,
+        "solver_time": 60,
+        "solver_config": SolverConfig(num_search_workers=1),
+    }
+
+
+def test_generator_yields_improving_solutions(tiny_instance):
+    solutions = []
+    stream = CP_stream(*tiny_instance, True, **stream_kwargs(2))
+    while True:
+        try:
+            solutions.append(next(stream))
+        except StopIteration as stop:
+            outcome_children_dic, outcome_fp = stop.value
+            break
+    objectives = [solution.objective for solution in solutions]
+    assert len(objectives) > 0
+    assert improving(objectives)
+    for solution in solutions:
+        assert matched(solution.outcome_children_dic) == solution.objective
+        assert solution.bound >= solution.objective
+    assert solutions[-1].outcome_fp == outcome_fp
+    assert matched(outcome_children_dic) == matched(CP(*tiny_instance, True, 2, 60)[0])
+    assert streamed_runs() == []
+
+
+def test_generator_stops_the_solver_on_break(small_instance):
+    time_sta = time.time()
+    objectives = []
+    for solution in CP_stream(*small_instance, True, **stream_kwargs(8)):
+        objectives.append(solution.objective)
+        if len(objectives) == 3:
+            break
+    assert improving(objectives)
+    # closing the generator stopped and joined the solver thread
+    assert streamed_runs() == []
+    assert time.time() - time_sta < 30
+
+
+def test_callback_stops_the_search(small_instance):
+    solutions = []
+
+    def first_solution(solution):
+        solutions.append(solution)
+        return True
+
+    outcome_children_dic, outcome_fp = CP(
+        *small_instance, True, **stream_kwargs(8), solution_callback=first_solution
+    )
+    assert len(solutions) == 1
+    assert outcome_fp == solutions[0].outcome_fp
+
+
+def test_async_stream(tiny_instance, small_instance):
+    async def collect(instance, bp_num, limit=None):
+        objectives = []
+        stream = CP_stream_async(*instance, True, **stream_kwargs(bp_num))
+        async with contextlib.aclosing(stream):
+            async for solution in stream:
+                objectives.append(solution.objective)
+                if len(objectives) == limit:
+                    break
+        return objectives
+
+    objectives = asyncio.run(collect(tiny_instance, 2))
+    assert len(objectives) > 0
+    assert improving(objectives)
+    assert objectives[-1] == matched(CP(*tiny_instance, True, 2, 60)[0])
+    time_sta = time.time()
+    objectives = asyncio.run(collect(small_instance, 8, 3))
+    assert len(objectives) == 3
+    assert streamed_runs() == []
+    assert time.time() - time_sta < 30
@@ -0,0 +1,67 @@
+from ortools.sat.python import cp_model
+
+from CP_algo import CP, add_hint, create_model
+from solver_config import SolverConfig
+
+
+def matched(outcome_children_dic):
+    return sum(outcome["CP"] != 9999 for outcome in outcome_children_dic.values())
+
+
+def test_apply_sets_parameters():
+    config = SolverConfig(
+        num_search_workers=2,
+        random_seed=7,
+        relative_gap_limit=0.01,
+        linearization_level=2,
+        symmetry_level=0,
+        parameters={"cp_model_presolve": False},
+    )
+    solver = cp_model.CpSolver()
+    config.apply(solver, 12)
+    assert solver.parameters.max_time_in_seconds == 12
+    assert solver.parameters.num_search_workers == 2
+    assert solver.parameters.random_seed == 7
+    assert abs(solver.parameters.relative_gap_limit - 0.01) < 1e-12
+    assert solver.parameters.linearization_level == 2
+    assert solver.parameters.symmetry_level == 0
+    assert solver.parameters.cp_model_presolve is False
+    assert solver.parameters.log_search_progress is False
+
+
+def test_config_reaches_the_solver_of_CP(tiny_instance):
+    lines = []
+    config = SolverConfig(
+        num_search_workers=1, random_seed=7, log_callback=lines.append
+    )
+    CP(*tiny_instance, True, 0, 60, solver_config=config)
+    parameters = next(line for line in lines if line.startswith("Parameters:"))
+    assert "random_seed: 7" in parameters
+    assert "num_search_workers: 1" in parameters
+
+
+def test_hint_forms(tiny_instance):
+    outcome_children_dic, outcome_fp = CP(*tiny_instance, True, 0, 60)
+    assignment = {c_id: outcome["CP"] for c_id, outcome in outcome_children_dic.items()}
+    hints = []
+    for hint in (outcome_fp, assignment):
+        model, problem, xfp, xcd, beta, bp_index = create_model(*tiny_instance, True)
+        add_hint(model, problem, xfp, hint)
+        solution_hint = model.Proto().solution_hint
+        values = dict(zip(solution_hint.vars, solution_hint.values))
+        assert values == {x.Index(): outcome_fp[f_p] for f_p, x in xfp.items()}
+        hints.append(values)
+    assert hints[0] == hints[1]
+
+
+def test_hint_is_applied(tiny_instance):
+    # a solution of bp_num=0 is feasible but not optimal for bp_num=4; fixing the
+    # hinted variables keeps it
+    outcome_children_dic, outcome_fp = CP(*tiny_instance, True, 0, 60)
+    assignment = {c_id: outcome["CP"] for c_id, outcome in outcome_children_dic.items()}
+    optimum = matched(CP(*tiny_instance, True, 4, 60)[0])
+    assert matched(outcome_children_dic) < optimum
+    config = SolverConfig(parameters={"fix_variables_to_their_hinted_value": True})
+    for hint in (outcome_fp, assignment):
+        hinted = CP(*tiny_instance, True, 4, 60, solver_config=config, hint=hint)
+        assert hinted[1] == outcome_fp
@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+
+from helper_functions import create_agent_registry
+from problem_arrays import create_problem_arrays
+from stability import check_blocking_coalitions, count_blocking_coalitions
+
+
+def baseline_check_bp(
+    children_dic,
+    daycares_dic,
+    families_dic,
+    outcome_fp,
+    share_bool=False,
+    exclude_bool=True,
+    recruiting_numbers=False,
+):
+    """
+    check_bp of submission_code.ipynb (share_bool=False, exclude_bool=True,
+    recruiting_numbers=True), with the capacities of the CP model by default
+    """
+    registry = create_agent_registry(children_dic, daycares_dic, families_dic)
+    assigned = {}
+    assignment = {}
+    for f in registry.families.values():
+        assignment[f.id] = len(f.pref)
+        for p in range(len(f.pref)):
+            if outcome_fp[f.id, p] == 1:
+                assignment[f.id] = p
+                for c_id in f.children:
+                    assigned[c_id] = registry.children[c_id].projected_pref[p]
+    bp_dic = {f_id: [] for f_id in registry.families}
+    for f in registry.families.values():
+        for p in range(assignment[f.id]):
+            accepted = True
+            for d_id in f.return_daycare_id_for_certain_position(p):
+                daycare = registry.daycares[d_id]
+                if recruiting_numbers is True:
+                    capacity = daycare.recruiting_numbers
+                elif share_bool is True:
+                    capacity = daycare.total_numbers_share
+                else:
+                    capacity = daycare.total_numbers
+                for g, siblings, worst_id in f.return_sibling_groups(
+                    p, d_id, share_bool, registry
+                ):
+                    better = daycare.return_weak_better_children_than_child_excluding_siblings(
+                        worst_id, registry, share_bool, exclude_bool, 0
+                    )
+                    occupied = sum(assigned.get(c_id) == d_id for c_id in better)
+                    if occupied + len(siblings) > capacity[g]:
+                        accepted = False
+            if accepted is True:
+                bp_dic[f.id].append(p)
+    return bp_dic
+
+
+def random_assignment(families_dic, seed):
+    """
+    outcome_fp assigning each family to a random position, or leaving it unmatched
+    """
+    rng = np.random.default_rng(seed)
+    outcome_fp = {}
+    for f_id, family in families_dic.items():
+        n_pos = len(family["pref"])
+        assigned = rng.integers(n_pos + 1)
+        for p in range(n_pos):
+            outcome_fp[f_id, p] = int(p == assigned)
+    return outcome_fp
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_recruiting_numbers_equal_notebook(example_instance, small_instance, seed):
+    for instance in (example_instance, small_instance):
+        outcome_fp = random_assignment(instance[2], seed)
+        problem = create_problem_arrays(*instance)
+        bp_dic = check_blocking_coalitions(
+            problem, outcome_fp, capacity=problem.recruiting_numbers
+        )
+        assert count_blocking_coalitions(bp_dic) > 0
+        assert bp_dic == baseline_check_bp(
+            *instance, outcome_fp, recruiting_numbers=True
+        )
+
+
+@pytest.mark.parametrize("share_bool", [True, False])
+@pytest.mark.parametrize("exclude_bool", [True, False])
+@pytest.mark.parametrize("seed", [0, 1])
+def test_default_capacity_equals_baseline(
+    small_instance, share_bool, exclude_bool, seed
+):
+    outcome_fp = random_assignment(small_instance[2], seed)
+    problem = create_problem_arrays(*small_instance)
+    bp_dic = check_blocking_coalitions(problem, outcome_fp, share_bool, exclude_bool)
+    assert count_blocking_coalitions(bp_dic) > 0
+    assert bp_dic == baseline_check_bp(
+        *small_instance, outcome_fp, share_bool, exclude_bool
+    )
+
+
+def test_shared_quotas_change_blocking_coalitions(small_instance):
+    # the generated instance has shared quotas, so that both modes differ
+    outcome_fp = random_assignment(small_instance[2], 0)
+    problem = create_problem_arrays(*small_instance)
+    assert check_blocking_coalitions(
+        problem, outcome_fp, True
+    ) != check_blocking_coalitions(problem, outcome_fp, False)
@@ -0,0 +1,139 @@
+import pytest
+
+import CP_algo
+from CP_agents import RankIndex
+from CP_algo import CP_lazy, create_model
+from helper_functions import create_agent_registry
+from instance_generator import generate_instance
+from model_cache import instance_fingerprint
+
+TOLERANCE = 0.00001
+
+
+def baseline_weak_better(d, child_id, registry, allow_share_bool, exclude_bool, depth):
+    """
+    C^{weak}_{better}(d, c, bool) as computed by the original
+    return_weak_better_children_than_child_excluding_siblings: the children ranked
+    before child_id, then those of the next depth positions (from child_id) whose score
+    is equal to the score of child_id
+    """
+    rank_dic = d.priority_age_share_dic if allow_share_bool else d.priority_age_dic
+    child = registry.children[child_id]
+    ranked = list(rank_dic[child.age])
+    pos = ranked.index(child_id)
+    end = min(pos + depth, len(ranked))
+    score = d.score_list[d.priority.index(child_id)]
+    better = []
+    for index in range(end):
+        c = registry.children[ranked[index]]
+        if exclude_bool and c.family == child.family:
+            continue
+        if index >= pos:
+            c_score = d.score_list[d.priority.index(c.id)]
+            if abs(c_score / score - 1) > TOLERANCE or c.id == child.id:
+                continue
+        if c.id not in better:
+            better.append(c.id)
+    return better
+
+
+def long_ties_instance():
+    # most consecutive families share their score: tie runs of tens of children
+    instance = generate_instance(
+        400, n_daycares=8, district_size=8, tie_rate=0.97, seed=3
+    )
+    # positive scores, which the baseline divides by
+    for daycare in instance[1].values():
+        scores = daycare["priority_score_list"]
+        daycare["priority_score_list"] = [score - min(scores) + 1 for score in scores]
+    return instance
+
+
+def near_ties_instance():
+    # the scores of each tie run of long_ties_instance decrease by 0.6 * TOLERANCE
+    # (relative) from one child to the next: consecutive children are tied, but not
+    # the children two positions apart
+    instance = long_ties_instance()
+    for daycare in instance[1].values():
+        scores = daycare["priority_score_list"]
+        perturbed = []
+        for pos, score in enumerate(scores):
+            run = 0
+            while run < pos and scores[pos - run - 1] == score:
+                run += 1
+            perturbed.append(score * (1 - 0.6 * TOLERANCE * run))
+        daycare["priority_score_list"] = perturbed
+    return instance
+
+
+@pytest.mark.parametrize("search_depth", [0, 5, 20, None])
+@pytest.mark.parametrize("allow_share_bool", [True, False])
+@pytest.mark.parametrize("exclude_bool", [True, False])
+@pytest.mark.parametrize("near_ties", [False, True])
+def test_weak_better_equals_baseline(
+    search_depth, allow_share_bool, exclude_bool, near_ties
+):
+    instance = near_ties_instance() if near_ties else long_ties_instance()
+    registry = create_agent_registry(*instance)
+    longest = 0
+    for d in registry.daycares.values():
+        if d.id == 9999:
+            continue
+        rank_dic = d.priority_age_share_dic if allow_share_bool else d.priority_age_dic
+        for age in range(6):
+            index = d.return_rank_index(age, allow_share_bool, registry)
+            longest = max(longest, max(index.tie_end - range(len(index)), default=0))
+            for c_id in rank_dic[age]:
+                depth = len(rank_dic[age]) if search_depth is None else search_depth
+                expected = baseline_weak_better(
+                    d, c_id, registry, allow_share_bool, exclude_bool, depth
+                )
+                assert (
+                    d.return_weak_better_children_than_child_excluding_siblings(
+                        c_id, registry, allow_share_bool, exclude_bool, search_depth
+                    )
+                    == expected
+                )
+                index, end, excluded = d.return_weak_better_prefix(
+                    c_id, registry, allow_share_bool, exclude_bool, search_depth
+                )
+                prefix = set(index.ids[:end].tolist()) - set(excluded)
+                assert prefix == set(expected)
+    if near_ties:
+        # near-equal scores are not chained into one tie class
+        assert longest == 2
+    else:
+        # the tie runs are longer than the default search depth
+        assert longest > 20
+
+
+def test_tie_end_compares_with_the_anchor_score():
+    near = [1, 1 - 0.8 * TOLERANCE, 1 - 1.6 * TOLERANCE]
+    for scores, tolerance, tie_end in (
+        (near + [0.5, 0.5], TOLERANCE, [2, 3, 3, 5, 5]),
+        ([0.5, 0.5] + near[::-1], TOLERANCE, [2, 2, 4, 5, 5]),
+        ([3, 3] + near[::-1][1:] + [4], TOLERANCE, [2, 2, 4, 4, 5]),
+        (near + [0.5, 0.5], 0, [1, 2, 3, 5, 5]),
+    ):
+        ids = list(range(len(scores)))
+        index = RankIndex(ids, dict(zip(ids, scores)), dict(zip(ids, ids)), tolerance)
+        assert index.tie_end.tolist() == tie_end
+
+
+def test_tie_tolerance_reaches_the_registry(monkeypatch, tiny_instance):
+    tolerances = []
+
+    def spy(*args):
+        tolerances.append(args[3])
+        return create_agent_registry(*args)
+
+    monkeypatch.setattr(CP_algo, "create_agent_registry", spy)
+    create_model(*tiny_instance, True, tie_tolerance=0.01)
+    CP_lazy(*tiny_instance, True, 0, 60, tie_tolerance=0.02)
+    assert tolerances == [0.01, 0.02]
+    assert instance_fingerprint(*tiny_instance, True, True, 5) != instance_fingerprint(
+        *tiny_instance, True, True, 5, tie_tolerance=0.01
+    )
+    assert instance_fingerprint(*tiny_instance, True, True, 5) == instance_fingerprint(
+        *tiny_instance, True, True, 5, tie_tolerance=TOLERANCE
+    )